@@ -0,0 +1,137 @@
+# api/accounts/authentication.py
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from utils.cache_versions import bump_version, get_version
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def user_version_name(user_id):
+    return f"auth-user:{user_id}"
+
+
+def invalidate_user(user_id):
+    """
+    Gọi khi User thay đổi (lưu / khóa / xóa): version nằm trong cache
+    CACHE_VERSIONS_ALIAS dùng chung giữa các process, nên bản cache cũ của
+    mọi process không còn được đọc vì key chứa version.
+    """
+    bump_version(user_version_name(user_id))
+
+
+# ==========================
+# LRU + TTL trong process
+# ==========================
+class UserCache:
+    """
+    Tối đa `size` user, mỗi user sống `ttl` giây. Key = (user_id, version):
+    khi version tăng, entry cũ không còn trúng và bị đẩy ra theo LRU.
+    """
+
+    def __init__(self, size=10000, ttl=60):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_user_cache = None
+_user_cache_lock = threading.Lock()
+
+
+def get_user_cache():
+    global _user_cache
+    if _user_cache is None:
+        with _user_cache_lock:
+            if _user_cache is None:
+                _user_cache = UserCache(
+                    size=_setting('AUTH_USER_CACHE_SIZE', 10000),
+                    ttl=_setting('AUTH_USER_CACHE_TTL', 60),
+                )
+    return _user_cache
+
+
+# ==========================
+# Authentication classes
+# ==========================
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Như JWTAuthentication nhưng User lấy từ UserCache thay vì SELECT theo
+    primary key ở mỗi request. Chỉ cache user hợp lệ (tồn tại, đang active);
+    User được lưu / xóa thì version tăng (api/accounts/signals.py) và mọi
+    process đọc version mới ở request tiếp theo (kể cả đổi mật khẩu: bản cũ
+    với password hash cũ không còn được dùng để kiểm tra revoke).
+
+    Giới hạn độ trễ là AUTH_USER_CACHE_TTL với thay đổi không qua signal
+    (QuerySet.update) hoặc khi CACHE_VERSIONS_ALIAS là cache riêng từng
+    process (locmem).
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        cache = get_user_cache()
+        key = (user_id, get_version(user_version_name(user_id)))
+        user = cache.get(key)
+        if user is None:
+            # Không tìm thấy / bị khóa: super() raise, không cache kết quả lỗi
+            user = super().get_user(validated_token)
+            cache.set(key, user)
+        elif api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            # Token cấp trước khi đổi mật khẩu (cùng kiểm tra với super())
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        # Bản sao: request không sửa được object dùng chung
+        return copy.copy(user)
+
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Không đọc User: request.user là TokenUser dựng từ claim trong token
+    (user_id, username do MyTokenObtainPairSerializer thêm vào). Dùng cho
+    endpoint chỉ cần biết "ai" gọi, không cần email / quyền / trạng thái mới nhất:
+
+        authentication_classes = [ClaimsJWTAuthentication]
+    """
@@ -0,0 +1,34 @@
+# api/accounts/jobs.py
+# Handler việc nền của accounts (đăng ký với api/jobs, chạy bởi `run_workers`)
+
+import random
+
+from django.utils import timezone
+
+from api.jobs.queue import register
+from utils.email_utils import send_otp_email
+from .models import RegistrationOTP
+
+SEND_OTP_EMAIL = 'accounts.send_otp_email'
+
+
+@register(SEND_OTP_EMAIL)
+def send_registration_otp(payload):
+    """
+    payload: {"user_id": ...}. Đọc OTP hiện tại lúc gửi (không lưu OTP trong
+    payload); user đã xác thực / bị xóa thì bỏ qua. OTP đã hết hạn (job chờ
+    lâu / thử lại nhiều lần) thì tạo mã mới: không gửi mã không dùng được.
+    """
+    otp = (
+        RegistrationOTP.objects.select_related('user')
+        .filter(user_id=payload['user_id'], user__is_active=False)
+        .first()
+    )
+    if otp is None:
+        return
+    if not otp.is_valid():
+        otp.otp = str(random.randint(1000, 9999))
+        otp.created_at = timezone.now()
+        otp.save(update_fields=['otp', 'created_at'])
+    # Lỗi SMTP -> exception -> job được thử lại theo backoff
+    send_otp_email(otp.user.email, otp.otp)
@@ -0,0 +1,152 @@
+# api/accounts/management/commands/bench_concurrency.py
+import asyncio
+import importlib.util
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.products.models import Category, Product
+from utils.endpoint_bench import run_load, save_results
+
+SERVERS = {
+    # gunicorn: mỗi worker N thread, mỗi request giữ một thread trong lúc chờ database
+    'wsgi': lambda port, workers, threads: [
+        sys.executable, '-m', 'gunicorn', 'electronics_store_vku_backend.wsgi:application',
+        '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+        '--log-level', 'warning',
+    ],
+    # uvicorn: asgi.py bật ASYNC_CATALOG_VIEWS
+    'asgi': lambda port, workers, threads: [
+        sys.executable, '-m', 'uvicorn', 'electronics_store_vku_backend.asgi:application',
+        '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+        '--no-access-log', '--log-level', 'warning',
+    ],
+}
+SERVER_MODULES = {'wsgi': 'gunicorn', 'asgi': 'uvicorn'}
+
+
+def catalog_paths(seed, sample=200):
+    """
+    Các URL đọc catalog được load test (xoay vòng): category cha, listing
+    theo category / parent, chi tiết sản phẩm.
+    """
+    rng = random.Random(seed)
+    product_ids = list(Product.objects.filter(is_available=True).order_by('id').values_list('id', flat=True)[:20000])
+    category_ids = list(
+        Product.objects.filter(is_available=True).order_by('category_id')
+        .values_list('category_id', flat=True).distinct()[:200]
+    )
+    parent_ids = list(Category.objects.filter(parent__isnull=True).order_by('id').values_list('id', flat=True)[:50])
+    if not product_ids:
+        raise CommandError('No catalog data (run seed_catalog first).')
+
+    paths = ['/api/products/categories-parents/']
+    paths += [f'/api/products/categories/{cid}/' for cid in rng.sample(category_ids, min(20, len(category_ids)))]
+    paths += [f'/api/products/parent-categories/{pid}/' for pid in rng.sample(parent_ids, min(10, len(parent_ids)))]
+    paths += [f'/api/products/{pid}/' for pid in rng.sample(product_ids, min(sample, len(product_ids)))]
+    rng.shuffle(paths)
+    return paths
+
+
+def _wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f'Server on port {port} did not start within {timeout}s.')
+
+
+class Command(BaseCommand):
+    help = 'So sánh requests/giây và latency đuôi giữa triển khai WSGI và ASGI khi có nhiều request đồng thời'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', help='Server WSGI đang chạy, vd http://127.0.0.1:8000')
+        parser.add_argument('--asgi-url', help='Server ASGI đang chạy, vd http://127.0.0.1:8001')
+        parser.add_argument('--spawn', action='store_true',
+                            help='Tự chạy gunicorn (WSGI) và uvicorn (ASGI) trên --port-base, --port-base+1')
+        parser.add_argument('--port-base', type=int, default=8100)
+        parser.add_argument('--workers', type=int, default=2, help='Số process mỗi server (--spawn)')
+        parser.add_argument('--threads', type=int, default=8, help='Số thread mỗi worker gunicorn (--spawn)')
+        parser.add_argument('--concurrency', type=int, default=200, help='Số kết nối đồng thời')
+        parser.add_argument('--duration', type=float, default=15, help='Số giây đo cho mỗi server')
+        parser.add_argument('--warmup', type=float, default=3, help='Số giây chạy trước (không đo)')
+        parser.add_argument('--response-cache', action='store_true',
+                            help='Cho phép response cache (mặc định gửi Authorization để bỏ qua cache)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Ghi kết quả ra file JSON')
+
+    def handle(self, *args, **options):
+        targets = {name: options[f'{name}_url'] for name in SERVERS if options[f'{name}_url']}
+        processes = []
+        try:
+            if options['spawn']:
+                for offset, name in enumerate(SERVERS):
+                    port = options['port_base'] + offset
+                    processes.append(self.spawn(name, port, options))
+                    targets[name] = f'http://127.0.0.1:{port}'
+                for offset, _ in enumerate(SERVERS):
+                    _wait_for_port(options['port_base'] + offset)
+            if not targets:
+                raise CommandError('Nothing to benchmark: pass --wsgi-url / --asgi-url or --spawn.')
+            results = self.run(targets, options)
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+        if options['output']:
+            save_results(options['output'], results)
+            self.stdout.write(f"Saved results to {options['output']}.")
+
+    def spawn(self, name, port, options):
+        module = SERVER_MODULES[name]
+        if importlib.util.find_spec(module) is None:
+            raise CommandError(f'{module} is not installed (pip install {module}).')
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)}
+        command = SERVERS[name](port, options['workers'], options['threads'])
+        self.stdout.write(f"Starting {name}: {' '.join(command[1:])}")
+        return subprocess.Popen(command, env=env, cwd=settings.BASE_DIR)
+
+    def run(self, targets, options):
+        paths = catalog_paths(options['seed'])
+        # Request có Authorization không dùng response cache: đo đường xử lý thật
+        headers = {} if options['response_cache'] else {'Authorization': 'Bench'}
+        summaries = {}
+        for name, url in targets.items():
+            if options['warmup']:
+                asyncio.run(run_load(url, paths, options['concurrency'], options['warmup'], headers))
+            summary = asyncio.run(run_load(url, paths, options['concurrency'], options['duration'], headers))
+            summaries[name] = summary
+            self.stdout.write(
+                f"{name:<5} {url:<28} rps={summary['requests_per_sec']:>9} "
+                f"p50={summary.get('p50_ms', 0):8.2f}ms p95={summary.get('p95_ms', 0):8.2f}ms "
+                f"p99={summary.get('p99_ms', 0):8.2f}ms errors={summary['errors']}"
+            )
+        if 'wsgi' in summaries and 'asgi' in summaries and summaries['wsgi']['requests_per_sec']:
+            ratio = summaries['asgi']['requests_per_sec'] / summaries['wsgi']['requests_per_sec']
+            self.stdout.write(f"ASGI / WSGI throughput: x{ratio:.2f}")
+
+        return {
+            'meta': {
+                'created': int(time.time()),
+                'concurrency': options['concurrency'],
+                'duration': options['duration'],
+                'paths': len(paths),
+                'response_cache': options['response_cache'],
+                'workers': options['workers'],
+                'threads': options['threads'],
+            },
+            'targets': summaries,
+        }
@@ -0,0 +1,170 @@
+# api/accounts/management/commands/bench_endpoints.py
+import platform
+import random
+import time
+import uuid
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from api.accounts.jobs import SEND_OTP_EMAIL
+from api.accounts.models import RegistrationOTP
+from api.jobs.models import Job
+from api.products.models import Category, Product, Review
+from api.products.seeding import CatalogSeeder
+from utils.endpoint_bench import EndpointCase, compare_results, load_results, run_case, save_results
+
+BENCH_PASSWORD = 'bench-Passw0rd!'
+BENCH_OTP = '1234'
+
+
+# ==========================
+# Dữ liệu dùng chung cho các request
+# ==========================
+def bench_context(seed, sample=200):
+    rng = random.Random(seed)
+    product_ids = list(Product.objects.filter(is_available=True).order_by('id').values_list('id', flat=True)[:20000])
+    category_ids = list(
+        Product.objects.filter(is_available=True).order_by('category_id')
+        .values_list('category_id', flat=True).distinct()[:500]
+    )
+    parent_ids = list(
+        Category.objects.filter(parent__isnull=True, children__isnull=False)
+        .order_by('id').values_list('id', flat=True).distinct()
+    )
+    if not product_ids or not parent_ids:
+        raise CommandError('No catalog data (run seed_catalog or use --seed-products N).')
+    return {
+        'run': uuid.uuid4().hex[:8],
+        'product_ids': rng.sample(product_ids, min(sample, len(product_ids))),
+        'category_ids': category_ids,
+        'parent_ids': parent_ids,
+        'users': [],
+    }
+
+
+def _pick(values, i):
+    return values[i % len(values)]
+
+
+def _email(ctx, kind, i):
+    return f"bench-{kind}-{ctx['run']}-{i}@example.com"
+
+
+def _setup_login(ctx, count):
+    email = _email(ctx, 'login', 0)
+    ctx['users'].append(User.objects.create_user(username=email, email=email, password=BENCH_PASSWORD).id)
+
+
+def _setup_verify_otp(ctx, count):
+    # User chưa kích hoạt + OTP đã biết, mỗi request dùng một user
+    for i in range(count):
+        email = _email(ctx, 'otp', i)
+        user = User.objects.create_user(username=email, email=email, is_active=False)
+        RegistrationOTP.objects.create(user=user, otp=BENCH_OTP)
+        ctx['users'].append(user.id)
+
+
+ENDPOINT_CASES = [
+    EndpointCase('category_parents', lambda ctx, i: (reverse('category-parents'), {})),
+    EndpointCase('category_products', lambda ctx, i: (
+        reverse('category-products', args=[_pick(ctx['category_ids'], i)]), {})),
+    EndpointCase('parent_category_products', lambda ctx, i: (
+        reverse('parent-category-products', args=[_pick(ctx['parent_ids'], i)]), {})),
+    EndpointCase('product_detail', lambda ctx, i: (
+        reverse('product-detail', args=[_pick(ctx['product_ids'], i)]), {})),
+    EndpointCase('login', lambda ctx, i: (
+        reverse('api-login'), {'username': _email(ctx, 'login', 0), 'password': BENCH_PASSWORD}),
+        method='post', setup=_setup_login),
+    EndpointCase('register', lambda ctx, i: (
+        reverse('api-register'), {'email': _email(ctx, 'register', i), 'password': BENCH_PASSWORD}),
+        method='post', expected_status=(201,)),
+    EndpointCase('verify_otp', lambda ctx, i: (
+        reverse('verify-otp'), {'email': _email(ctx, 'otp', i), 'otp': BENCH_OTP}),
+        method='post', setup=_setup_verify_otp),
+]
+CASE_NAMES = [case.name for case in ENDPOINT_CASES]
+
+
+class Command(BaseCommand):
+    help = 'Đo p50/p95/p99, số query, số bytes của từng endpoint public; lưu JSON để so sánh giữa các lần chạy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Số request đo cho mỗi endpoint')
+        parser.add_argument('--warmup', type=int, default=20, help='Số request chạy trước (không đo)')
+        parser.add_argument('--only', action='append', choices=CASE_NAMES, help='Chỉ đo endpoint này (lặp lại được)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--seed-products', type=int, default=0,
+                            help='Tạo tạm catalog N sản phẩm (rollback sau khi đo) thay vì dùng dữ liệu hiện có')
+        parser.add_argument('--response-cache', action='store_true',
+                            help='Giữ ResponseCacheMiddleware (mặc định tắt để đo đường xử lý thật)')
+        parser.add_argument('--output', help='Ghi kết quả ra file JSON')
+        parser.add_argument('--compare', help='File JSON của lần chạy trước: báo regression')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Ngưỡng regression (tỉ lệ, mặc định 20%%)')
+
+    def handle(self, *args, **options):
+        if options['seed_products']:
+            with transaction.atomic():
+                CatalogSeeder(products=options['seed_products'], seed=options['seed']).run()
+                results = self.run(options)
+                transaction.set_rollback(True)
+        else:
+            results = self.run(options)
+
+        if options['output']:
+            save_results(options['output'], results)
+            self.stdout.write(f"Saved results to {options['output']}.")
+        if options['compare']:
+            regressions = compare_results(load_results(options['compare']), results, threshold=options['threshold'])
+            for message in regressions:
+                self.stdout.write(self.style.ERROR(f"REGRESSION {message}"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}.")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}."))
+
+    def run(self, options):
+        middleware = list(settings.MIDDLEWARE)
+        if not options['response_cache']:
+            middleware = [m for m in middleware if m != 'utils.response_cache.ResponseCacheMiddleware']
+        cases = [case for case in ENDPOINT_CASES if not options['only'] or case.name in options['only']]
+
+        with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=['testserver']):
+            ctx = bench_context(options['seed'])
+            client = Client()
+            endpoints = {}
+            try:
+                for case in cases:
+                    summary = run_case(client, case, ctx, options['iterations'], options['warmup'])
+                    endpoints[case.name] = summary
+                    self.stdout.write(
+                        f"{case.name:<26} p50={summary['p50_ms']:8.2f}ms p95={summary['p95_ms']:8.2f}ms "
+                        f"p99={summary['p99_ms']:8.2f}ms queries={summary['queries_avg']:5.1f} "
+                        f"bytes={summary['bytes_avg']:>8} errors={summary['errors']}"
+                    )
+            finally:
+                registered = list(
+                    User.objects.filter(email__startswith=f"bench-register-{ctx['run']}-").values_list('id', flat=True)
+                )
+                # Job gửi mail OTP của register: xóa trước khi worker gửi ra ngoài
+                Job.objects.filter(name=SEND_OTP_EMAIL, payload__user_id__in=registered).delete()
+                User.objects.filter(id__in=ctx['users']).delete()
+                User.objects.filter(id__in=registered).delete()
+
+        return {
+            'meta': {
+                'created': int(time.time()),
+                'database': connection.vendor,
+                'products': Product.objects.count(),
+                'reviews': Review.objects.count(),
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'response_cache': options['response_cache'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'endpoints': endpoints,
+        }
@@ -0,0 +1,82 @@
+# api/accounts/management/commands/bench_serializers.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from api.products.fast_serializers import ProductDetailFastSerializer, ProductFEFastSerializer
+from api.products.models import Product
+from api.products.query_plans import seed_plan_dataset
+from api.products.serializers import ProductDetailSerializer, ProductFESerializer
+
+
+def _best_of(repeat, func):
+    # Lấy lần nhanh nhất: ít bị nhiễu bởi GC / process khác
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None or elapsed < best else best
+    return best, result
+
+
+class Command(BaseCommand):
+    help = 'So sánh chi phí mỗi dòng giữa serializer DRF và serializer values() (ProductFE, ProductDetail)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help='Số sản phẩm cho listing')
+        parser.add_argument('--details', type=int, default=50, help='Số sản phẩm cho chi tiết')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed-products', type=int, default=0,
+                            help='Tạo tạm N sản phẩm (rollback sau khi đo) thay vì dùng dữ liệu hiện có')
+
+    def handle(self, *args, **options):
+        if options['seed_products']:
+            with transaction.atomic():
+                seed_plan_dataset(products=options['seed_products'])
+                self.run(options)
+                transaction.set_rollback(True)
+        else:
+            self.run(options)
+
+    def run(self, options):
+        repeat = options['repeat']
+        renderer = JSONRenderer()
+        ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:options['rows']])
+        if not ids:
+            raise CommandError('No products (use --seed-products N).')
+
+        def drf_listing():
+            products = ProductFESerializer.setup_eager_loading(Product.objects.filter(id__in=ids).order_by('id'))
+            return renderer.render(ProductFESerializer(products, many=True).data)
+
+        def fast_listing():
+            return renderer.render(ProductFEFastSerializer().serialize_ids(ids))
+
+        detail_ids = ids[:options['details']]
+
+        # Chi tiết: mỗi request một sản phẩm, như ProductDetailAPIView
+        def drf_detail():
+            return [
+                renderer.render(ProductDetailSerializer(
+                    ProductDetailSerializer.setup_eager_loading(Product.objects.filter(id=pid)).first()
+                ).data)
+                for pid in detail_ids
+            ]
+
+        def fast_detail():
+            serializer = ProductDetailFastSerializer()
+            return [renderer.render(serializer.serialize(pid)) for pid in detail_ids]
+
+        for name, rows, drf, fast in (
+            ('ProductFE listing', len(ids), drf_listing, fast_listing),
+            ('ProductDetail', len(detail_ids), drf_detail, fast_detail),
+        ):
+            drf_time, drf_body = _best_of(repeat, drf)
+            fast_time, fast_body = _best_of(repeat, fast)
+            same = 'identical' if drf_body == fast_body else 'DIFFERENT'
+            self.stdout.write(
+                f"{name:<18} rows={rows:<5} drf={drf_time / rows * 1e6:8.1f} us/row  "
+                f"fast={fast_time / rows * 1e6:8.1f} us/row  x{drf_time / fast_time:4.1f}  output {same}"
+            )
@@ -0,0 +1,11 @@
+# api/accounts/management/commands/build_search_index.py
+from django.core.management.base import BaseCommand
+from api.products.search import get_search_engine
+
+class Command(BaseCommand):
+    help = 'Build lại toàn bộ index tìm kiếm sản phẩm và lưu ra SEARCH_INDEX_PATH'
+
+    def handle(self, *args, **options):
+        engine = get_search_engine()
+        count = engine.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} products into {engine.path}.'))
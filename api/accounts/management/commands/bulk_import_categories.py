@@ -0,0 +1,34 @@
+# api/accounts/management/commands/bulk_import_categories.py
+import json
+from django.core.management.base import BaseCommand, CommandError
+from api.products.category_import import import_category_tree
+from api.products.models import Category
+
+class Command(BaseCommand):
+    help = 'Import cây category từ file JSON (bulk_create theo lô)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='File JSON: [{"name": "...", "slug": "...", "image": "...", "children": [...]}]')
+        parser.add_argument('--parent', default=None, help='Slug của category có sẵn để gắn cả cây vào')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['file'], encoding='utf-8') as f:
+                nodes = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise CommandError(f"Cannot read {options['file']}: {e}")
+        if isinstance(nodes, dict):
+            nodes = [nodes]
+
+        parent = None
+        if options['parent']:
+            parent = Category.objects.filter(slug=options['parent']).first()
+            if not parent:
+                raise CommandError(f"Parent category not found: {options['parent']}")
+
+        try:
+            created = import_category_tree(nodes, parent=parent, batch_size=options['batch_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Imported {created} categories.'))
@@ -0,0 +1,36 @@
+# api/accounts/management/commands/check_query_plans.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api.products.query_plans import check_query_plans, seed_plan_dataset
+
+class Command(BaseCommand):
+    help = 'Chạy EXPLAIN cho các query của catalog, báo lỗi nếu có full scan / filesort ngoài dự kiến'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-products', type=int, default=0,
+                            help='Tạo tạm N sản phẩm (rollback sau khi kiểm tra) thay vì dùng dữ liệu hiện có')
+        parser.add_argument('--show-plans', action='store_true', help='In toàn bộ plan')
+
+    def handle(self, *args, **options):
+        if options['seed_products']:
+            with transaction.atomic():
+                self.stdout.write(f"Seeding {options['seed_products']} products...")
+                seed_plan_dataset(products=options['seed_products'])
+                results = check_query_plans()
+                transaction.set_rollback(True)
+        else:
+            results = check_query_plans()
+
+        failed = []
+        for result in results:
+            if result.ok:
+                self.stdout.write(f"OK    {result.name}")
+            else:
+                failed.append(result)
+                self.stdout.write(self.style.ERROR(f"FAIL  {result.name}: {', '.join(result.regressions)}"))
+            if options['show_plans'] or not result.ok:
+                self.stdout.write(result.plan)
+
+        if failed:
+            raise CommandError(f"{len(failed)} query plan(s) regressed.")
+        self.stdout.write(self.style.SUCCESS(f"All {len(results)} query plans use indexes."))
@@ -1,12 +1,13 @@
 import random
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from django.db import connection
-from django.utils.text import slugify
 from api.products.models import (
     Brand, Category, Product, ProductVariant, Document, ProductDocument,
     Review, ShippingInfo, ReturnPolicy, Notification
 )
+from api.products.seeding import truncate_catalog
+from api.products.slugs import allocate_slugs
 
 BRANDS = [
     "Apple", "Samsung", "Sony", "LG", "Dell", "HP", "Lenovo", "Asus", "Acer", "Microsoft"
@@ -34,16 +35,7 @@ class Command(BaseCommand):
 
     def truncate_tables(self):
         self.stdout.write("Truncating related tables...")
-        with connection.cursor() as cursor:
-            cursor.execute("SET FOREIGN_KEY_CHECKS=0;")
-            tables = [
-                "product_documents", "documents", "product_variants", "reviews",
-                "shipping_info", "return_policy", "notifications", "products",
-                "brands", "categories"
-            ]
-            for table in tables:
-                cursor.execute(f"TRUNCATE TABLE {table};")
-            cursor.execute("SET FOREIGN_KEY_CHECKS=1;")
+        truncate_catalog()
         self.stdout.write("Tables truncated.")
 
     def handle(self, *args, **kwargs):
@@ -59,14 +51,8 @@ class Command(BaseCommand):
 
         # --- Categories ---
         categories = []
-        for name in CATEGORIES:
-            # tạo slug duy nhất
-            base_slug = slugify(name)
-            slug = base_slug
-            counter = 1
-            while Category.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
+        # tạo slug duy nhất cho cả lô
+        for name, slug in zip(CATEGORIES, allocate_slugs(CATEGORIES)):
             category = Category.objects.create(name=name, slug=slug)
             categories.append(category)
 
@@ -90,8 +76,6 @@ class Command(BaseCommand):
                 discount_price=discount_price,
                 brand=random.choice(brands),
                 category=random.choice(categories),
-                rating=round(random.uniform(1, 5), 2),
-                num_reviews=random.randint(0, 50),
                 is_available=random.choice([True, True, False]),
                 is_popular=random.choice([True, False]),
                 is_sale=discount_price is not None,
@@ -155,4 +139,6 @@ class Command(BaseCommand):
                 notified=False
             )
 
+        call_command("refresh_rankings", full=True, stdout=self.stdout)
+
         self.stdout.write(self.style.SUCCESS("Real fake data created successfully!"))
\ No newline at end of file
@@ -0,0 +1,21 @@
+# api/accounts/management/commands/notify_back_in_stock.py
+from django.core.management.base import BaseCommand
+from api.products.back_in_stock import schedule_back_in_stock
+from api.products.models import Notification
+
+class Command(BaseCommand):
+    help = ('Thêm job gửi thông báo có hàng cho các sản phẩm đang có hàng và còn đăng ký chưa gửi '
+            '(stock cập nhật bằng import / QuerySet.update không qua signal)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='*', type=int, help='Mặc định: mọi sản phẩm')
+
+    def handle(self, *args, **options):
+        products = (
+            Notification.objects.filter(notified=False, product__variants__stock__gt=0)
+            .order_by('product_id').values_list('product_id', flat=True).distinct()
+        )
+        if options['product_ids']:
+            products = products.filter(product_id__in=options['product_ids'])
+        scheduled = sum(schedule_back_in_stock(product_id) is not None for product_id in products.iterator())
+        self.stdout.write(self.style.SUCCESS(f'Scheduled back-in-stock notifications for {scheduled} products.'))
@@ -0,0 +1,13 @@
+# api/accounts/management/commands/rebuild_category_paths.py
+from django.core.management.base import BaseCommand
+from api.products.category_tree import rebuild_category_paths
+
+class Command(BaseCommand):
+    help = 'Tính lại materialized path / depth cho toàn bộ category (sau khi import bằng bulk_create...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = rebuild_category_paths(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated paths for {updated} categories.'))
@@ -0,0 +1,13 @@
+# api/accounts/management/commands/recompute_review_aggregates.py
+from django.core.management.base import BaseCommand
+from api.products.review_stats import recompute_review_aggregates
+
+class Command(BaseCommand):
+    help = 'Tính lại rating / num_reviews của mọi sản phẩm từ bảng reviews (1 query GROUP BY, xử lý theo lô)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        fixed = recompute_review_aggregates(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Fixed review aggregates for {fixed} products.'))
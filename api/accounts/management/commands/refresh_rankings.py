@@ -0,0 +1,18 @@
+# api/accounts/management/commands/refresh_rankings.py
+from django.core.management.base import BaseCommand
+from api.products.rankings import get_ranking_size, refresh_rankings
+
+class Command(BaseCommand):
+    help = 'Tính lại bảng xếp hạng popular / sale / best sale (chạy định kỳ, ví dụ bằng cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=None, help='Số sản phẩm giữ lại cho mỗi rail (mặc định PRODUCT_RANKING_SIZE)')
+        parser.add_argument('--full', action='store_true', help='Tính lại toàn bộ thay vì chỉ các category có thay đổi')
+
+    def handle(self, *args, **options):
+        size = options['size'] or get_ranking_size()
+        scopes = refresh_rankings(size=size, full=options['full'])
+        if scopes:
+            self.stdout.write(self.style.SUCCESS(f'Refreshed {scopes} ranking scope(s), top {size} per rail.'))
+        else:
+            self.stdout.write('No product changes since the last refresh.')
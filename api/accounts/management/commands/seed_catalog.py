@@ -0,0 +1,76 @@
+# api/accounts/management/commands/seed_catalog.py
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from api.products.cache_tags import BRANDS, CATEGORIES, DETAILS, PRODUCTS, RANKINGS
+from api.products.category_tree import invalidate_category_tree
+from api.products.conditional import bump_catalog_version
+from api.products.detail_cache import invalidate_all_products
+from api.products.facets import get_facet_engine
+from api.products.search import get_search_engine
+from api.products.seeding import CatalogSeeder, truncate_catalog
+from utils.response_cache import invalidate_tags
+
+class Command(BaseCommand):
+    help = 'Sinh catalog lớn cho load test (bulk_create theo lô, Zipf, có seed), vd: --products 1000000'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--categories', type=int, default=300)
+        parser.add_argument('--brands', type=int, default=50)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--reviews-per-product', type=float, default=3.0, help='Trung bình, phân bố theo Zipf')
+        parser.add_argument('--max-reviews-per-product', type=int, default=5000)
+        parser.add_argument('--variants-per-product', type=int, default=2)
+        parser.add_argument('--images-per-product', type=int, default=2)
+        parser.add_argument('--notifications-per-product', type=float, default=0.1)
+        parser.add_argument('--no-policies', action='store_true', help='Không tạo shipping info / return policy')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Số mũ Zipf (lớn hơn = lệch hơn)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--flush', action='store_true', help='Xóa toàn bộ catalog trước khi sinh')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='Không tính lại bảng xếp hạng / search index sau khi sinh')
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            self.stdout.write("Truncating catalog tables...")
+            truncate_catalog()
+
+        started = time.monotonic()
+        seeder = CatalogSeeder(
+            products=options['products'],
+            categories=options['categories'],
+            brands=options['brands'],
+            users=options['users'],
+            reviews_per_product=options['reviews_per_product'],
+            max_reviews_per_product=options['max_reviews_per_product'],
+            variants_per_product=options['variants_per_product'],
+            images_per_product=options['images_per_product'],
+            notifications_per_product=options['notifications_per_product'],
+            policies=not options['no_policies'],
+            zipf=options['zipf'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        counts = seeder.run()
+        for model, count in counts.items():
+            self.stdout.write(f"  {model:<16} {count:>12,}")
+
+        # bulk_create không gửi signal: tự làm mới cây category, facet, cache response
+        invalidate_category_tree()
+        get_facet_engine().invalidate()
+        bump_catalog_version()
+        tags = [PRODUCTS, CATEGORIES, BRANDS, RANKINGS]
+        if options['flush']:
+            # id được dùng lại sau truncate: bỏ mọi document / response chi tiết cũ
+            # bằng một version chung, không ghi cache theo từng id
+            invalidate_all_products()
+            tags.append(DETAILS)
+        invalidate_tags(tags)
+        if not options['skip_derived']:
+            call_command("refresh_rankings", full=True, stdout=self.stdout)
+            self.stdout.write(f"Indexed {get_search_engine().rebuild()} products for search.")
+        self.stdout.write(self.style.SUCCESS(f"Seeded catalog in {time.monotonic() - started:.1f}s."))
@@ -0,0 +1,20 @@
+# api/accounts/signals.py
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user
+
+
+# ==========================
+# Cache user của CachedJWTAuthentication
+# ==========================
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Tăng version ngay và một lần nữa sau commit: request khác có thể đã
+    # cache lại bản cũ (chưa commit) dưới version vừa tăng
+    user_id = instance.pk
+    invalidate_user(user_id)
+    transaction.on_commit(lambda: invalidate_user(user_id))
@@ -1,3 +1,358 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import json
+import os
+import smtplib
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import StreamRequestHandler, ThreadingTCPServer
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from unittest import mock
+
+from api.products.seeding import CatalogSeeder
+from .authentication import CachedJWTAuthentication, ClaimsJWTAuthentication, UserCache, get_user_cache
+from .serializers import MyTokenObtainPairSerializer
+from utils.email_utils import send_email
+from utils.endpoint_bench import compare_results, percentile, run_load, summarize
+from utils.smtp_pool import close_pools, pool_stats
+
+# Thuật toán hash nhanh: test không đo chi phí PBKDF2
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def clear_caches():
+    # Document chi tiết / cây category còn trong cache sẽ làm số query = 0
+    for backend in caches.all():
+        backend.clear()
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class EndpointBenchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        CatalogSeeder(products=60, categories=20, brands=4, users=5, batch_size=50).run()
+
+    def setUp(self):
+        clear_caches()
+
+    def run_bench(self, *args):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        call_command('bench_endpoints', '--iterations', '4', '--warmup', '1', '--output', path, *args,
+                     stdout=io.StringIO())
+        with open(path) as f:
+            return path, json.load(f)
+
+    def test_reports_every_public_endpoint(self):
+        _, results = self.run_bench()
+        self.assertEqual(set(results['endpoints']), {
+            'category_parents', 'category_products', 'parent_category_products', 'product_detail',
+            'login', 'register', 'verify_otp',
+        })
+        for name, summary in results['endpoints'].items():
+            self.assertEqual(summary['errors'], 0, (name, summary['status']))
+            self.assertEqual(summary['requests'], 4)
+            self.assertLessEqual(summary['p50_ms'], summary['p95_ms'])
+            self.assertLessEqual(summary['p95_ms'], summary['p99_ms'])
+            self.assertGreater(summary['bytes_avg'], 0)
+        self.assertGreater(results['endpoints']['product_detail']['queries_max'], 0)
+        self.assertEqual(results['meta']['products'], 60)
+
+    def test_compare_flags_regressions(self):
+        path, results = self.run_bench('--only', 'product_detail')
+        baseline = json.loads(json.dumps(results))
+        baseline['endpoints']['product_detail']['queries_max'] -= 1
+        with open(path, 'w') as f:
+            json.dump(baseline, f)
+        clear_caches()
+        with self.assertRaises(CommandError):
+            self.run_bench('--only', 'product_detail', '--compare', path)
+
+    def test_percentiles_and_compare(self):
+        values = sorted(float(v) for v in range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        before = {'endpoints': {'x': summarize([10.0] * 20, [3] * 20, [100] * 20, {200: 20})}}
+        slower = {'endpoints': {'x': summarize([10.0] * 18 + [30.0] * 2, [3] * 20, [100] * 20, {200: 20})}}
+        self.assertEqual(compare_results(before, before), [])
+        self.assertEqual(len(compare_results(before, slower)), 1)
+
+
+class LoadGeneratorTests(TestCase):
+    def test_run_load_keeps_connections_alive(self):
+        connections = set()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                connections.add(self.client_address)
+                body = b'{"path":"%s"}' % self.path.encode()
+                self.send_response(404 if self.path.endswith('/missing/') else 200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        summary = asyncio.run(run_load(url, ['/a/', '/missing/'], concurrency=4, duration=0.3))
+        self.assertGreater(summary['requests'], 8)
+        self.assertEqual(summary['transport_errors'], 0)
+        self.assertEqual(summary['errors'], summary['status']['404'])
+        self.assertLessEqual(len(connections), 4)
+        self.assertGreater(summary['requests_per_sec'], 0)
+
+
+class FakeSMTPServer(ThreadingTCPServer):
+    """
+    SMTP tối thiểu cho test (EHLO, AUTH PLAIN, MAIL, RCPT, DATA, NOOP, RSET, QUIT).
+    drop_after: ngắt kết nối sau mỗi N message (mô phỏng server / mạng cắt kết nối).
+    busy: từ chối kết nối mới bằng 421.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, drop_after=None):
+        self.messages = []
+        self.connections = 0
+        self.logins = []
+        self.drop_after = drop_after
+        self.busy = False
+        self.lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+
+
+class FakeSMTPHandler(StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        sent = 0
+        envelope = {}
+        if server.busy:
+            self.reply('421 busy')
+            return
+        self.reply('220 fake ESMTP')
+        while True:
+            line = self.rfile.readline().decode().rstrip('\r\n')
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+            if command == 'EHLO':
+                self.reply('250-fake')
+                self.reply('250 AUTH PLAIN')
+            elif command == 'AUTH':
+                _, user, password = base64.b64decode(line.split()[2]).decode().split('\0')
+                with server.lock:
+                    server.logins.append(user)
+                self.reply('235 ok')
+            elif command == 'MAIL':
+                envelope = {'from': line.split(':', 1)[1].strip('<> '), 'to': []}
+                self.reply('250 ok')
+            elif command == 'RCPT':
+                envelope['to'].append(line.split(':', 1)[1].strip('<> '))
+                self.reply('250 ok')
+            elif command == 'DATA':
+                self.reply('354 go')
+                data = []
+                while (chunk := self.rfile.readline()) not in (b'.\r\n', b''):
+                    data.append(chunk)
+                envelope['data'] = b''.join(data).decode()
+                with server.lock:
+                    server.messages.append(envelope)
+                self.reply('250 queued')
+                sent += 1
+                if server.drop_after and sent >= server.drop_after:
+                    return
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+class PooledEmailBackendTests(TestCase):
+    def start_server(self, drop_after=None, **overrides):
+        server = FakeSMTPServer(drop_after)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        settings = override_settings(
+            EMAIL_BACKEND='utils.smtp_pool.PooledEmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.server_address[1],
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER='shop@example.com', EMAIL_HOST_PASSWORD='secret',
+            EMAIL_TIMEOUT=5, **overrides,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        close_pools()
+        self.addCleanup(close_pools)
+        return server
+
+    def stats(self):
+        stats, = pool_stats().values()
+        return stats
+
+    def test_reuses_one_authenticated_connection(self):
+        server = self.start_server()
+        for i in range(5):
+            mail.send_mail(f'Subject {i}', 'Body', 'shop@example.com', [f'user{i}@example.com'])
+        self.assertTrue(send_email('html@example.com', 'Hello', '<b>Hi</b>'))
+
+        self.assertEqual(len(server.messages), 6)
+        self.assertEqual(server.messages[0]['to'], ['user0@example.com'])
+        self.assertIn('text/html', server.messages[-1]['data'])
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(server.logins, ['shop@example.com'])
+        stats = self.stats()
+        self.assertEqual(stats['messages_sent'], 6)
+        self.assertEqual(stats['connections_opened'], 1)
+        self.assertEqual(stats['idle_connections'], 1)
+        self.assertGreater(stats['messages_per_sec'], 0)
+
+    def test_batches_are_sent_over_several_connections(self):
+        server = self.start_server(EMAIL_POOL_SIZE=3, EMAIL_POOL_BATCH_SIZE=4)
+        messages = [
+            mail.EmailMessage('Bulk', f'Body {i}', 'shop@example.com', [f'user{i}@example.com'])
+            for i in range(10)
+        ]
+        self.assertEqual(mail.get_connection().send_messages(messages), 10)
+        self.assertEqual(
+            sorted(m['to'][0] for m in server.messages), sorted(f'user{i}@example.com' for i in range(10)),
+        )
+        stats = self.stats()
+        self.assertEqual(stats['batches'], 3)
+        self.assertLessEqual(stats['connections_opened'], 3)
+        self.assertEqual(server.connections, stats['connections_opened'])
+
+    def test_reconnects_when_connection_drops(self):
+        server = self.start_server(drop_after=2)
+        for i in range(5):
+            mail.send_mail('Subject', 'Body', 'shop@example.com', [f'user{i}@example.com'])
+        self.assertEqual([m['to'][0] for m in server.messages], [f'user{i}@example.com' for i in range(5)])
+        stats = self.stats()
+        self.assertEqual(stats['messages_sent'], 5)
+        self.assertEqual(stats['messages_failed'], 0)
+        self.assertEqual(stats['reconnects'], 2)
+        self.assertEqual(server.connections, 3)
+
+    def test_failed_reconnect_does_not_return_dead_connection_to_pool(self):
+        server = self.start_server(drop_after=1)
+        mail.send_mail('Subject', 'Body', 'shop@example.com', ['first@example.com'])
+        server.busy = True
+        with self.assertRaises(smtplib.SMTPConnectError):
+            mail.send_mail('Subject', 'Body', 'shop@example.com', ['second@example.com'])
+        server.busy = False
+        mail.send_mail('Subject', 'Body', 'shop@example.com', ['third@example.com'])
+        self.assertEqual([m['to'][0] for m in server.messages], ['first@example.com', 'third@example.com'])
+        stats = self.stats()
+        self.assertEqual(stats['messages_failed'], 1)
+        self.assertEqual(stats['idle_connections'], 1)
+
+    def test_idle_connection_is_checked_before_reuse(self):
+        # Kết nối rảnh được NOOP trước khi dùng: kết nối đã bị server ngắt được thay mới
+        server = self.start_server(drop_after=1, EMAIL_POOL_CHECK_IDLE=0)
+        for i in range(3):
+            mail.send_mail('Subject', 'Body', 'shop@example.com', [f'user{i}@example.com'])
+        self.assertEqual(len(server.messages), 3)
+        stats = self.stats()
+        self.assertEqual(stats['reconnects'], 0)
+        self.assertEqual(stats['connections_opened'], 3)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer@example.com', email='buyer@example.com')
+
+    def setUp(self):
+        get_user_cache().clear()
+
+    def request(self, user=None):
+        token = MyTokenObtainPairSerializer.get_token(user or self.user).access_token
+        return RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_user_is_loaded_once(self):
+        request = self.request()
+        with self.assertNumQueries(1):
+            first, _ = CachedJWTAuthentication().authenticate(request)
+        with self.assertNumQueries(0):
+            second, _ = CachedJWTAuthentication().authenticate(request)
+        self.assertEqual(second, self.user)
+        self.assertEqual(second.email, 'buyer@example.com')
+        # Mỗi request một bản sao
+        self.assertIsNot(first, second)
+
+    def test_saving_user_invalidates_cache(self):
+        request = self.request()
+        CachedJWTAuthentication().authenticate(request)
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        with self.assertNumQueries(1):
+            user, _ = CachedJWTAuthentication().authenticate(request)
+        self.assertEqual(user.first_name, 'Renamed')
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            CachedJWTAuthentication().authenticate(request)
+
+    def test_change_in_other_process_invalidates_cache(self):
+        request = self.request()
+        CachedJWTAuthentication().authenticate(request)
+        # Process khác khóa user: signal chạy ở process đó, ở đây chỉ thấy
+        # version trong cache dùng chung (backend riêng, như ở worker khác)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        other_process = caches.create_connection(settings.CACHE_VERSIONS_ALIAS)
+        other_process.incr(f'version:auth-user:{self.user.pk}')
+        with self.assertRaises(AuthenticationFailed):
+            CachedJWTAuthentication().authenticate(request)
+
+    def test_deleted_user_is_rejected(self):
+        other = User.objects.create_user(username='gone@example.com')
+        request = self.request(other)
+        CachedJWTAuthentication().authenticate(request)
+        other.delete()
+        with self.assertRaises(AuthenticationFailed):
+            CachedJWTAuthentication().authenticate(request)
+
+    def test_cache_is_bounded_and_expires(self):
+        cache = UserCache(size=2, ttl=10)
+        with mock.patch('api.accounts.authentication.time.monotonic', return_value=100):
+            cache.set((1, 1), 'a')
+            cache.set((2, 1), 'b')
+            self.assertEqual(cache.get((1, 1)), 'a')
+            cache.set((3, 1), 'c')
+            # (2, 1) ít được dùng nhất
+            self.assertIsNone(cache.get((2, 1)))
+            self.assertEqual(len(cache), 2)
+        with mock.patch('api.accounts.authentication.time.monotonic', return_value=111):
+            self.assertIsNone(cache.get((1, 1)))
+
+    def test_claims_authentication_does_not_query(self):
+        with self.assertNumQueries(0):
+            user, _ = ClaimsJWTAuthentication().authenticate(self.request())
+        self.assertEqual(str(user.id), str(self.user.id))
+        self.assertEqual(user.username, 'buyer@example.com')
+        self.assertTrue(user.is_authenticated)
@@ -1,10 +1,10 @@
 # api/accounts/views.py
 
 import random
-import threading
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.core.mail import send_mail
+from django.db import transaction
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -14,7 +14,8 @@ from rest_framework_simplejwt.tokens import RefreshToken
 
 from .serializers import MyTokenObtainPairSerializer
 from .models import RegistrationOTP
-from utils.email_utils import send_otp_email
+from .jobs import SEND_OTP_EMAIL
+from api.jobs.queue import enqueue
 
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
@@ -40,12 +41,17 @@ class RegisterView(APIView):
         if User.objects.filter(email=email).exists():
             return Response({"detail": "Email is already registered."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # username chính là email
-        user = User.objects.create_user(username=email, email=email, password=password, is_active=False)
+        # User, OTP và job gửi mail commit cùng nhau: không có user thiếu mail
+        with transaction.atomic():
+            # username chính là email
+            user = User.objects.create_user(username=email, email=email, password=password, is_active=False)
 
-        # Tạo OTP
-        otp_code = str(random.randint(1000, 9999))
-        RegistrationOTP.objects.create(user=user, otp=otp_code)
+            # Tạo OTP
+            otp_code = str(random.randint(1000, 9999))
+            RegistrationOTP.objects.create(user=user, otp=otp_code)
+
+            # Gửi mail ở background (run_workers), tự thử lại khi SMTP lỗi
+            enqueue(SEND_OTP_EMAIL, {"user_id": user.id})
 
         # Trả phản hồi cho client ngay
         response = Response({
@@ -53,9 +59,6 @@ class RegisterView(APIView):
             "email": user.email,
         }, status=status.HTTP_201_CREATED)
 
-        # Gửi mail ở background
-        threading.Thread(target=send_otp_email, args=(email, otp_code)).start()
-
         return response
 
 class VerifyOTPView(APIView):
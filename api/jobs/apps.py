@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'api.jobs'
+
+    def ready(self):
+        # Đăng ký handler: module jobs.py của từng app (vd api/accounts/jobs.py)
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('jobs')
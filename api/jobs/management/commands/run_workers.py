@@ -0,0 +1,51 @@
+# api/jobs/management/commands/run_workers.py
+from django.core.management.base import BaseCommand
+
+from api.jobs.queue import purge_succeeded_jobs, requeue_dead_jobs
+from api.jobs.worker import Worker
+from utils.smtp_pool import close_pools, pool_stats
+
+
+class Command(BaseCommand):
+    help = 'Chạy worker xử lý hàng đợi việc nền (api/jobs): gửi email OTP, ...'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', default='default')
+        parser.add_argument('--concurrency', type=int, default=4, help='Số job chạy đồng thời (số thread)')
+        parser.add_argument('--batch-size', type=int, default=10, help='Số job tối đa mỗi lần claim')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Số giây chờ khi hàng đợi trống')
+        parser.add_argument('--once', action='store_true', help='Xử lý hết job đang đến hạn rồi thoát')
+        parser.add_argument('--requeue-dead', action='store_true', help='Đưa job dead-letter về hàng đợi trước khi chạy')
+        parser.add_argument('--purge-succeeded-days', type=int,
+                            help='Xóa job đã xong cũ hơn N ngày trước khi chạy')
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            self.stdout.write(f"Requeued {requeue_dead_jobs()} dead jobs.")
+        if options['purge_succeeded_days'] is not None:
+            self.stdout.write(f"Purged {purge_succeeded_jobs(options['purge_succeeded_days'])} succeeded jobs.")
+
+        worker = Worker(
+            queue=options['queue'],
+            concurrency=options['concurrency'],
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+        )
+        if not options['once']:
+            worker.install_signal_handlers()
+            self.stdout.write(
+                f"Worker {worker.worker_id} on queue '{worker.queue}' "
+                f"(concurrency={worker.concurrency}). Ctrl+C to stop."
+            )
+        try:
+            processed = worker.run(once=options['once'])
+        finally:
+            # Bộ đếm của pool SMTP (email gửi bởi các job) rồi đóng kết nối
+            for server, stats in pool_stats().items():
+                self.stdout.write(
+                    f"SMTP {server}: sent={stats['messages_sent']} failed={stats['messages_failed']} "
+                    f"connections={stats['connections_opened']} reconnects={stats['reconnects']} "
+                    f"rate={stats['messages_per_sec']}/s"
+                )
+            close_pools()
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs."))
@@ -0,0 +1,44 @@
+from django.db import models
+from django.utils import timezone
+
+
+# ==========================
+# JOBS (hàng đợi việc nền, xem api/jobs/queue.py)
+# ==========================
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    DEAD = 'dead'  # hết số lần thử: dead-letter, chờ xử lý tay
+
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (DEAD, 'Dead'),
+    ]
+
+    queue = models.CharField(max_length=50, default='default')
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, null=True, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'jobs'
+        indexes = [
+            # Lấy job đến hạn: WHERE queue = ? AND status = 'pending' AND run_at <= ? ORDER BY run_at
+            models.Index(fields=['queue', 'status', 'run_at'], name='jobs_queue_status_run_idx'),
+            # Tìm job RUNNING bị treo (worker chết giữa chừng)
+            models.Index(fields=['status', 'locked_at'], name='jobs_status_locked_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
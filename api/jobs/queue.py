@@ -0,0 +1,174 @@
+# api/jobs/queue.py
+
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+_handlers = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==========================
+# Đăng ký handler
+# ==========================
+def register(name, max_attempts=None):
+    """
+    @register('accounts.send_otp_email')
+    def send_otp_email(payload): ...
+
+    Handler nhận payload (dict) và raise exception để báo lỗi (sẽ retry).
+    Job có thể chạy lại nhiều lần (at-least-once): handler nên idempotent.
+    """
+    def decorator(func):
+        _handlers[name] = (func, max_attempts)
+        return func
+    return decorator
+
+
+def get_handler(name):
+    return _handlers.get(name, (None, None))[0]
+
+
+def enqueue(name, payload=None, queue='default', run_at=None, max_attempts=None):
+    """
+    Thêm job vào hàng đợi. Gọi trong transaction: job chỉ tồn tại khi
+    transaction commit (không mất job, không chạy job cho dữ liệu bị rollback).
+    """
+    if name not in _handlers:
+        raise ValueError(f"Unknown job: {name}")
+    default_attempts = _handlers[name][1] or _setting('JOB_MAX_ATTEMPTS', 5)
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        queue=queue,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or default_attempts,
+    )
+
+
+# ==========================
+# Nhận job (claim)
+# ==========================
+def claim_jobs(worker_id, queue='default', limit=10):
+    """
+    Chuyển tối đa `limit` job đến hạn sang RUNNING cho worker này và trả về chúng.
+
+    - Database có SELECT ... FOR UPDATE SKIP LOCKED (MySQL 8, PostgreSQL):
+      khóa các dòng ứng viên, worker khác bỏ qua dòng đang bị khóa.
+    - Còn lại (SQLite): UPDATE ... WHERE id IN (...) AND status = 'pending'
+      là atomic từng dòng; chỉ job mang claim token của lần gọi này là của mình.
+    """
+    now = timezone.now()
+    token = f"{worker_id}:{uuid.uuid4().hex[:12]}"
+    due = Job.objects.filter(queue=queue, status=Job.PENDING, run_at__lte=now).order_by('run_at', 'id')
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        Job.objects.filter(id__in=ids, status=Job.PENDING).update(
+            status=Job.RUNNING, locked_by=token, locked_at=now, attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(locked_by=token, status=Job.RUNNING).order_by('run_at', 'id'))
+
+
+# ==========================
+# Kết quả
+# ==========================
+def backoff_delay(attempts):
+    """
+    Exponential backoff có jitter: base * 2^(attempts-1), tối đa JOB_BACKOFF_MAX giây.
+    """
+    base = _setting('JOB_BACKOFF_BASE', 5)
+    delay = min(base * 2 ** max(attempts - 1, 0), _setting('JOB_BACKOFF_MAX', 3600))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _owned(job):
+    # Chỉ cập nhật khi job vẫn đang thuộc lần claim này (chưa bị reclaim)
+    return Job.objects.filter(id=job.id, status=Job.RUNNING, locked_by=job.locked_by)
+
+
+def complete_job(job):
+    return _owned(job).update(status=Job.SUCCEEDED, finished_at=timezone.now(), locked_by=None, locked_at=None)
+
+
+def fail_job(job, error):
+    """
+    Lỗi: thử lại sau backoff_delay, hoặc chuyển sang DEAD khi hết số lần thử.
+    Trả về status mới.
+    """
+    now = timezone.now()
+    message = error if isinstance(error, str) else ''.join(traceback.format_exception(error))
+    if job.attempts >= job.max_attempts:
+        _owned(job).update(status=Job.DEAD, finished_at=now, last_error=message, locked_by=None, locked_at=None)
+        return Job.DEAD
+    _owned(job).update(
+        status=Job.PENDING, run_at=now + timedelta(seconds=backoff_delay(job.attempts)),
+        last_error=message, locked_by=None, locked_at=None,
+    )
+    return Job.PENDING
+
+
+def run_job(job):
+    """
+    Chạy một job đã claim và ghi kết quả. Trả về status mới.
+    """
+    handler = get_handler(job.name)
+    if handler is None:
+        # Không có handler (code cũ / mới hơn): không retry được, đưa vào dead-letter
+        job.attempts = job.max_attempts
+        return fail_job(job, f"No handler registered for {job.name!r}")
+    try:
+        handler(job.payload)
+    except Exception as exc:
+        return fail_job(job, exc)
+    complete_job(job)
+    return Job.SUCCEEDED
+
+
+# ==========================
+# Bảo trì
+# ==========================
+def reclaim_stale_jobs(timeout=None):
+    """
+    Job RUNNING quá JOB_LOCK_TIMEOUT giây (worker bị kill / restart): trả lại
+    hàng đợi, hoặc DEAD nếu đã hết số lần thử. Trả về số job được xử lý.
+    """
+    timeout = timeout if timeout is not None else _setting('JOB_LOCK_TIMEOUT', 300)
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=timeout))
+    dead = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.DEAD, finished_at=now, last_error='Worker lock expired', locked_by=None, locked_at=None,
+    )
+    retried = stale.update(status=Job.PENDING, run_at=now, locked_by=None, locked_at=None)
+    return dead + retried
+
+
+def requeue_dead_jobs(ids=None, name=None):
+    """
+    Đưa job trong dead-letter về hàng đợi (reset số lần thử).
+    """
+    dead = Job.objects.filter(status=Job.DEAD)
+    if ids:
+        dead = dead.filter(id__in=ids)
+    if name:
+        dead = dead.filter(name=name)
+    return dead.update(status=Job.PENDING, attempts=0, run_at=timezone.now(), finished_at=None)
+
+
+def purge_succeeded_jobs(older_than_days=7):
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return Job.objects.filter(status=Job.SUCCEEDED, finished_at__lt=cutoff).delete()[0]
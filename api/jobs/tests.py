@@ -0,0 +1,182 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from api.accounts.jobs import SEND_OTP_EMAIL
+from api.accounts.models import RegistrationOTP
+from .models import Job
+from .queue import (
+    claim_jobs, enqueue, reclaim_stale_jobs, register, requeue_dead_jobs, run_job,
+)
+
+calls = []
+
+
+@register('tests.record')
+def record(payload):
+    calls.append(payload)
+
+
+@register('tests.fail', max_attempts=3)
+def always_fail(payload):
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_unknown_job(self):
+        with self.assertRaises(ValueError):
+            enqueue('tests.missing')
+
+    def test_claim_marks_running_and_skips_claimed_or_future_jobs(self):
+        first = enqueue('tests.record', {'n': 1})
+        second = enqueue('tests.record', {'n': 2})
+        enqueue('tests.record', {'n': 3}, run_at=timezone.now() + timedelta(hours=1))
+        enqueue('tests.record', {'n': 4}, queue='other')
+
+        claimed = claim_jobs('worker-a', limit=10)
+        self.assertEqual([job.id for job in claimed], [first.id, second.id])
+        self.assertTrue(all(job.status == Job.RUNNING and job.attempts == 1 for job in claimed))
+        self.assertTrue(claimed[0].locked_by.startswith('worker-a:'))
+        # Job đã được claim không được claim lần nữa
+        self.assertEqual(claim_jobs('worker-b', limit=10), [])
+
+    def test_claim_respects_limit(self):
+        for n in range(5):
+            enqueue('tests.record', {'n': n})
+        self.assertEqual(len(claim_jobs('w', limit=2)), 2)
+        self.assertEqual(len(claim_jobs('w', limit=10)), 3)
+
+    def test_success(self):
+        enqueue('tests.record', {'n': 1})
+        job, = claim_jobs('w')
+        self.assertEqual(run_job(job), Job.SUCCEEDED)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(job.locked_by)
+        self.assertEqual(calls, [{'n': 1}])
+
+    @override_settings(JOB_BACKOFF_BASE=10, JOB_BACKOFF_MAX=3600)
+    def test_failure_retries_with_backoff_then_dead_letters(self):
+        job = enqueue('tests.fail')
+        self.assertEqual(job.max_attempts, 3)
+        delays = []
+        for attempt in range(1, 4):
+            # Đưa job về đến hạn để claim lại ngay
+            Job.objects.filter(id=job.id).update(run_at=timezone.now())
+            claimed, = claim_jobs('w')
+            self.assertEqual(claimed.attempts, attempt)
+            before = timezone.now()
+            status = run_job(claimed)
+            claimed.refresh_from_db()
+            self.assertIn('boom', claimed.last_error)
+            if attempt < 3:
+                self.assertEqual(status, Job.PENDING)
+                delays.append((claimed.run_at - before).total_seconds())
+            else:
+                self.assertEqual(status, Job.DEAD)
+                self.assertEqual(claimed.status, Job.DEAD)
+        # 10s, 20s (+-20% jitter)
+        self.assertTrue(8 <= delays[0] <= 12.5, delays)
+        self.assertTrue(16 <= delays[1] <= 24.5, delays)
+
+        self.assertEqual(requeue_dead_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 0))
+
+    def test_unknown_handler_dead_letters(self):
+        job = Job.objects.create(name='tests.removed')
+        claimed, = claim_jobs('w')
+        self.assertEqual(run_job(claimed), Job.DEAD)
+        job.refresh_from_db()
+        self.assertIn('No handler', job.last_error)
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_reclaim_stale_jobs(self):
+        enqueue('tests.record')
+        enqueue('tests.record', max_attempts=1)
+        stale_retry, stale_dead = claim_jobs('crashed-worker')
+        Job.objects.update(locked_at=timezone.now() - timedelta(minutes=5))
+        enqueue('tests.record')
+        fresh, = claim_jobs('live-worker')
+
+        self.assertEqual(reclaim_stale_jobs(), 2)
+        statuses = dict(Job.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[stale_retry.id], Job.PENDING)
+        self.assertEqual(statuses[stale_dead.id], Job.DEAD)
+        self.assertEqual(statuses[fresh.id], Job.RUNNING)
+        # Worker cũ không ghi đè kết quả của job đã bị reclaim
+        run_job(stale_retry)
+        self.assertEqual(Job.objects.get(id=stale_retry.id).status, Job.PENDING)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class OTPEmailJobTests(TransactionTestCase):
+    # Worker chạy job trong thread riêng: cần dữ liệu đã commit
+
+    def test_register_enqueues_email_and_worker_sends_it(self):
+        with mock.patch('threading.Thread') as thread:
+            response = self.client.post(
+                reverse('api-register'), {'email': 'new@example.com', 'password': 'Passw0rd!'},
+            )
+        self.assertEqual(response.status_code, 201)
+        thread.assert_not_called()
+        self.assertEqual(len(mail.outbox), 0)
+        user = User.objects.get(email='new@example.com')
+        job = Job.objects.get(name=SEND_OTP_EMAIL)
+        self.assertEqual(job.payload, {'user_id': user.id})
+
+        out = io.StringIO()
+        call_command('run_workers', '--once', '--concurrency', '2', stdout=out)
+        self.assertIn('Processed 1 jobs', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['new@example.com'])
+        self.assertIn(RegistrationOTP.objects.get(user=user).otp, mail.outbox[0].body)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+
+    def test_expired_otp_is_regenerated_before_sending(self):
+        user = User.objects.create_user(username='late@example.com', email='late@example.com', is_active=False)
+        otp = RegistrationOTP.objects.create(user=user, otp='1234')
+        RegistrationOTP.objects.filter(pk=otp.pk).update(created_at=timezone.now() - timedelta(minutes=10))
+        enqueue(SEND_OTP_EMAIL, {'user_id': user.id})
+
+        call_command('run_workers', '--once', stdout=io.StringIO())
+        otp.refresh_from_db()
+        self.assertTrue(otp.is_valid())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(otp.otp, mail.outbox[0].body)
+
+    def test_register_rolls_back_job_with_user(self):
+        with mock.patch('api.accounts.views.enqueue', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse('api-register'), {'email': 'x@example.com', 'password': 'Passw0rd!'})
+        self.assertFalse(User.objects.filter(email='x@example.com').exists())
+
+    def test_worker_processes_many_jobs_with_bounded_pool(self):
+        users = [
+            User.objects.create_user(username=f'u{i}@example.com', email=f'u{i}@example.com', is_active=False)
+            for i in range(7)
+        ]
+        for user in users:
+            RegistrationOTP.objects.create(user=user, otp='1234')
+            enqueue(SEND_OTP_EMAIL, {'user_id': user.id})
+        # User đã kích hoạt: job chạy xong nhưng không gửi mail
+        User.objects.filter(id=users[0].id).update(is_active=True)
+
+        call_command('run_workers', '--once', '--concurrency', '3', '--batch-size', '2', stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 6)
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED).count(), 7)
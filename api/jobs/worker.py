@@ -0,0 +1,92 @@
+# api/jobs/worker.py
+
+import logging
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.db import DatabaseError, close_old_connections
+
+from .queue import claim_jobs, reclaim_stale_jobs, run_job
+
+logger = logging.getLogger(__name__)
+
+
+def _run_with_connection(job):
+    # Mỗi thread trong pool có connection riêng: đóng connection hỏng / quá hạn
+    close_old_connections()
+    try:
+        return run_job(job)
+    except Exception:
+        # Lỗi khi ghi kết quả (mất kết nối database...): job vẫn RUNNING,
+        # reclaim_stale_jobs sẽ trả lại hàng đợi sau JOB_LOCK_TIMEOUT
+        logger.exception("Job %s #%s crashed", job.name, job.id)
+        return None
+    finally:
+        close_old_connections()
+
+
+class Worker:
+    """
+    Vòng lặp claim / chạy job với số thread cố định (`concurrency`).
+
+    Chỉ claim tối đa số slot đang rảnh nên job không nằm chờ trong bộ nhớ của
+    worker (worker khác có thể nhận). Dừng êm khi nhận SIGTERM / SIGINT: không
+    claim thêm, chờ các job đang chạy xong.
+    """
+
+    def __init__(self, queue='default', concurrency=4, batch_size=10, poll_interval=1.0):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.processed = 0
+        self._stop = threading.Event()
+
+    def stop(self, *args):
+        self._stop.set()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def run(self, once=False):
+        """
+        once=True: xử lý hết job đang đến hạn rồi dừng (cron, test).
+        Trả về số job đã chạy.
+        """
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job-worker') as pool:
+            while not self._stop.is_set():
+                finished = {future for future in running if future.done()}
+                running -= finished
+                self.processed += len(finished)
+                free = min(self.concurrency - len(running), self.batch_size)
+                try:
+                    reclaim_stale_jobs()
+                    jobs = claim_jobs(self.worker_id, self.queue, free) if free > 0 else []
+                except DatabaseError:
+                    # Mất kết nối / database bận: thử lại ở vòng sau
+                    logger.exception("Claiming jobs failed")
+                    close_old_connections()
+                    jobs = []
+                    if once and not running:
+                        raise
+                running.update(pool.submit(_run_with_connection, job) for job in jobs)
+
+                if once and not jobs and not running:
+                    # Không còn job đến hạn và không còn job đang chạy
+                    break
+                if running and (free <= len(jobs) or once):
+                    # Hết slot (hoặc đang xả hàng đợi): chờ một job xong rồi claim tiếp
+                    done, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    self.processed += len(done)
+                elif not jobs:
+                    self._stop.wait(self.poll_interval)
+            # Dừng: không claim thêm, chờ các job đang chạy (with pool -> shutdown(wait=True))
+            self.processed += len(running)
+        close_old_connections()
+        return self.processed
@@ -0,0 +1,144 @@
+# api/products/async_views.py
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.renderers import JSONRenderer
+
+from .models import Category
+from .serializers import ProductsByCategoryFESerializer
+from .detail_cache import aget_product_document, aget_product_version
+from .conditional import catalog_state, make_etag, not_modified_response, request_origin, set_validators
+from .category_tree import get_category_tree
+from .pagination import CategoryProductsPagination
+from .rankings import RAIL_BY_TYPE
+from . import cache_tags
+from utils.response_cache import tag_response
+
+
+# ======================================================
+# View async cho các endpoint đọc catalog (chạy dưới ASGI, xem asgi.py)
+# ------------------------------------------------------
+# Cùng URL, cùng output JSON với các APIView trong views.py. Event loop
+# không bị giữ trong lúc chờ database: các query chạy trong thread
+# (sync_to_async / async ORM), document chi tiết sản phẩm build bằng các
+# query song song (ProductDetailFastSerializer.aserialize).
+# ======================================================
+
+def _json_response(data, status_code=status.HTTP_200_OK):
+    # Cùng renderer với DRF (compact, UTF-8)
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status_code)
+
+
+def _error_response(exc):
+    # Cùng body với exception handler của DRF ở view đồng bộ
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return _json_response(data, exc.status_code)
+
+
+def _listing_data(category, context):
+    return ProductsByCategoryFESerializer(category, context=context).data
+
+
+class AsyncCategoryParentsView(View):
+    response_cache_timeout = 60 * 10
+
+    async def get(self, request):
+        tree = await sync_to_async(get_category_tree)()
+        not_modified = get_conditional_response(request, etag=tree.etag)
+        if not_modified is not None:
+            return not_modified
+        response = HttpResponse(tree.body, content_type='application/json', status=status.HTTP_200_OK)
+        response.headers['ETag'] = tree.etag
+        return tag_response(response, cache_tags.CATEGORIES)
+
+
+class AsyncCategoryListingView(View):
+    """
+    Phần chung của listing theo category / theo parent.
+    """
+    response_cache_timeout = 60
+    etag_prefix = None
+    mode = None
+    not_found = None
+
+    async def get(self, request, category_id):
+        version, modified = await sync_to_async(catalog_state)()
+        etag = make_etag(self.etag_prefix, version, request_origin(request), request.get_full_path())
+        not_modified = not_modified_response(request, etag, modified)
+        if not_modified is not None:
+            return not_modified
+
+        try:
+            # ?cursor= / ?sort= sai: View thường không có exception handler của DRF
+            paginator = CategoryProductsPagination(request)
+        except (NotFound, ValidationError) as exc:
+            return _error_response(exc)
+        context = {
+            'type': request.GET.get('type', None),
+            'paginator': paginator,
+        }
+        if category_id == 0:
+            category = Category(id=0, name='All Products', slug='all')
+        else:
+            category = await Category.objects.filter(id=category_id).afirst()
+            if not category:
+                return _json_response({'detail': self.not_found}, status.HTTP_404_NOT_FOUND)
+            if self.mode:
+                context['mode'] = self.mode
+
+        # Query products + ảnh chính phụ thuộc nhau: một lần chuyển sang thread
+        data = await sync_to_async(_listing_data)(category, context)
+        response = set_validators(_json_response(data), etag, modified)
+        return tag_response(
+            response,
+            cache_tags.category_tag(category_id) if category_id else cache_tags.PRODUCTS,
+            *self.extra_tags(),
+            cache_tags.RANKINGS if context['type'] in RAIL_BY_TYPE else None,
+            *cache_tags.listing_tags(data['products']),
+        )
+
+    def extra_tags(self):
+        return ()
+
+
+class AsyncCategoryProductsView(AsyncCategoryListingView):
+    etag_prefix = 'category-products'
+    not_found = 'Category not found'
+
+
+class AsyncParentCategoryProductsView(AsyncCategoryListingView):
+    etag_prefix = 'parent-category-products'
+    mode = 'parent'
+    not_found = 'Parent category not found'
+
+    def extra_tags(self):
+        return (cache_tags.CATEGORIES,)
+
+    async def get(self, request, parent_id):
+        return await super().get(request, parent_id)
+
+
+class AsyncProductDetailView(View):
+    response_cache_timeout = 60 * 5
+
+    async def get(self, request, product_id):
+        version = await aget_product_version(product_id)
+        etag = make_etag('product', product_id, version, request_origin(request))
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        document = await aget_product_document(product_id, request=request, version=version)
+        if not document:
+            return _json_response({"detail": "Product not found"}, status.HTTP_404_NOT_FOUND)
+
+        not_modified = not_modified_response(request, etag, document['last_modified'])
+        if not_modified is not None:
+            return not_modified
+        response = HttpResponse(document['body'], content_type='application/json', status=status.HTTP_200_OK)
+        set_validators(response, etag, document['last_modified'])
+        return tag_response(response, cache_tags.product_tag(product_id), cache_tags.DETAILS)
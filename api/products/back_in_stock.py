@@ -0,0 +1,139 @@
+# api/products/back_in_stock.py
+
+import logging
+import smtplib
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from api.jobs.models import Job
+from api.jobs.queue import enqueue
+from .models import Notification, Product, ProductVariant
+
+logger = logging.getLogger(__name__)
+
+BACK_IN_STOCK_JOB = 'products.back_in_stock'
+BACK_IN_STOCK_QUEUE = 'default'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==========================
+# Phát hiện hết hàng -> có hàng
+# ==========================
+def variant_saved(variant):
+    """
+    Gọi sau khi lưu ProductVariant: stock từ 0 lên > 0 thì thêm job gửi
+    thông báo. Job ghi trong cùng transaction với stock mới, nên không mất
+    job và không gửi cho thay đổi bị rollback.
+    """
+    old = variant.loaded_stock
+    variant.loaded_stock = variant.stock
+    if old != 0 or not variant.stock:
+        return
+    schedule_back_in_stock(variant.product_id)
+
+
+def schedule_back_in_stock(product_id):
+    # Đã có job chờ cho sản phẩm này: job đó sẽ gửi cả các đăng ký mới.
+    # Job RUNNING không tính (có thể đã qua lô cuối): thêm job mới, job trùng
+    # chỉ gửi các đăng ký chưa notified. queue + status: dùng index
+    # jobs_queue_status_run_idx thay vì quét mọi job theo payload.
+    pending = Job.objects.filter(
+        queue=BACK_IN_STOCK_QUEUE, status=Job.PENDING, name=BACK_IN_STOCK_JOB, payload__product_id=product_id,
+    )
+    if pending.exists() or not Notification.objects.filter(product_id=product_id, notified=False).exists():
+        return None
+    return enqueue(BACK_IN_STOCK_JOB, {'product_id': product_id}, queue=BACK_IN_STOCK_QUEUE)
+
+
+# ==========================
+# Fan-out
+# ==========================
+def pending_notification_chunks(product_id, after_id=0, chunk_size=500):
+    """
+    Các đăng ký chưa gửi theo từng lô [(id, email), ...], phân trang keyset
+    theo id (index notifications_pending_idx): không OFFSET, không load hết
+    danh sách vào bộ nhớ.
+    """
+    while True:
+        chunk = list(
+            Notification.objects.filter(product_id=product_id, notified=False, id__gt=after_id)
+            .order_by('id')
+            .values_list('id', 'email')[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        after_id = chunk[-1][0]
+
+
+def build_message(product, email):
+    price = product.discount_price or product.price
+    return EmailMessage(
+        f"{product.name} is back in stock",
+        f"Good news! {product.name} is available again at {price}. Order now before it sells out.",
+        settings.DEFAULT_FROM_EMAIL,
+        [email],
+    )
+
+
+def _send_chunk(connection, product, chunk):
+    """
+    Gửi từng message của lô (mỗi lần send_messages một message: biết chính
+    xác message nào đã gửi, không gửi lại cả lô khi một địa chỉ bị từ chối).
+    Trả về id các đăng ký đã xử lý xong; lỗi kết nối giữa chừng: đánh dấu
+    phần đã gửi rồi raise để job thử lại phần còn lại.
+    """
+    ids_by_email = {}
+    for pk, email in chunk:
+        ids_by_email.setdefault(email.lower(), []).append(pk)
+
+    done = []
+    try:
+        for email, ids in ids_by_email.items():
+            try:
+                connection.send_messages([build_message(product, email)])
+            except smtplib.SMTPRecipientsRefused:
+                # Địa chỉ bị từ chối: gửi lại cũng vô ích, bỏ qua
+                logger.warning("Back-in-stock email refused: %s", email)
+            done.extend(ids)
+    except Exception:
+        Notification.objects.filter(id__in=done).update(notified=True)
+        raise
+    return done
+
+
+def fan_out_back_in_stock(product_id, after_id=0, chunk_size=None, time_budget=None):
+    """
+    Gửi email cho các đăng ký chưa gửi của sản phẩm, mỗi lô:
+    gửi qua backend email (kết nối SMTP dùng lại giữa các message) rồi
+    đánh dấu notified bằng một câu UPDATE ... WHERE id IN (...).
+
+    Dừng sau `time_budget` giây và trả về id cuối đã xử lý để job tiếp theo
+    chạy tiếp (None: đã xong). Lỗi kết nối SMTP: exception, job thử lại từ
+    các đăng ký chưa đánh dấu (message đã gửi trong lô dở đã được đánh dấu).
+    """
+    chunk_size = chunk_size or _setting('BACK_IN_STOCK_CHUNK_SIZE', 500)
+    time_budget = _setting('BACK_IN_STOCK_JOB_SECONDS', 60) if time_budget is None else time_budget
+    product = Product.objects.filter(pk=product_id).only('name', 'price', 'discount_price').first()
+    if product is None:
+        return None
+    if not ProductVariant.objects.filter(product_id=product_id, stock__gt=0).exists():
+        # Hết hàng lại trước khi job chạy: giữ đăng ký cho lần có hàng sau
+        return None
+
+    deadline = time.monotonic() + time_budget
+    with get_connection() as connection:
+        for chunk in pending_notification_chunks(product_id, after_id, chunk_size):
+            Notification.objects.filter(id__in=_send_chunk(connection, product, chunk)).update(notified=True)
+            after_id = chunk[-1][0]
+            if len(chunk) < chunk_size:
+                # Lô cuối: không cần thêm một SELECT rỗng
+                break
+            if time.monotonic() >= deadline:
+                return after_id
+    return None
@@ -0,0 +1,34 @@
+# api/products/cache_tags.py
+
+from utils.response_cache import invalidate_tags_on_commit
+
+# Tag của response cache (utils/response_cache.py) cho các endpoint products
+PRODUCTS = 'products'        # mọi sản phẩm: listing id=0, tìm kiếm, facet
+CATEGORIES = 'categories'    # cây category: categories-parents, listing theo parent
+BRANDS = 'brands'            # nhãn brand trong tìm kiếm / facet
+RANKINGS = 'rankings'        # bảng xếp hạng popular / sale / best sale
+DETAILS = 'product-details'  # chi tiết / review mọi sản phẩm: chỉ khi thay toàn bộ catalog
+
+
+def product_tag(product_id):
+    return f"product:{product_id}"
+
+
+def category_tag(category_id):
+    return f"category:{category_id}"
+
+
+def category_path_tags(path):
+    # "/1/5/12/" -> category:1, category:5, category:12
+    return [category_tag(part) for part in (path or '').strip('/').split('/') if part]
+
+
+def listing_tags(products):
+    return [product_tag(p['id']) for p in products]
+
+
+# ==========================
+# Invalidate (gọi từ signals / sau khi tính lại dữ liệu)
+# ==========================
+def invalidate_products(product_ids, *extra):
+    invalidate_tags_on_commit([product_tag(pid) for pid in product_ids if pid is not None] + list(extra))
@@ -0,0 +1,93 @@
+# api/products/category_import.py
+
+from django.db import transaction
+
+from .category_tree import invalidate_category_tree
+from .models import Category
+from .slugs import allocate_slugs
+
+
+def _explicit_slugs(nodes):
+    """
+    Slug khai báo sẵn trong cả cây; trùng nhau (trong file hoặc với database)
+    thì báo lỗi trước khi ghi.
+    """
+    slugs = set()
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        slug = node.get('slug')
+        if slug:
+            if slug in slugs:
+                raise ValueError(f"Duplicate slug in import: {slug}")
+            slugs.add(slug)
+        stack.extend(node.get('children') or [])
+    if slugs:
+        existing = sorted(Category.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+        if existing:
+            raise ValueError(f"Slug already exists: {', '.join(existing)}")
+    return slugs
+
+
+def _create_batch(batch, reserved=()):
+    """
+    Tạo một lô category cùng cấp: 1 query cấp slug, 1 INSERT, 1 UPDATE path
+    (thêm 1 query lấy id trên database không trả id từ bulk_create, ví dụ MySQL).
+    `reserved`: slug khai báo sẵn trong file, slug tự sinh không được trùng.
+    """
+    names_without_slug = [node['name'] for node, _ in batch if not node.get('slug')]
+    allocated = iter(allocate_slugs(names_without_slug, reserved=reserved))
+
+    categories = [
+        Category(
+            name=node['name'],
+            slug=node.get('slug') or next(allocated),
+            image=node.get('image'),
+            parent_id=parent[0] if parent else None,
+        )
+        for node, parent in batch
+    ]
+    Category.objects.bulk_create(categories)
+
+    if any(c.pk is None for c in categories):
+        ids = dict(
+            Category.objects.filter(slug__in=[c.slug for c in categories]).values_list('slug', 'id')
+        )
+        for category in categories:
+            category.pk = ids[category.slug]
+
+    for category, (_, parent) in zip(categories, batch):
+        if parent:
+            category.path = f"{parent[1]}{category.pk}/"
+            category.depth = parent[2] + 1
+        else:
+            category.path = f"/{category.pk}/"
+            category.depth = 0
+    Category.objects.bulk_update(categories, ['path', 'depth'])
+    return [(c.pk, c.path, c.depth) for c in categories]
+
+
+def import_category_tree(nodes, parent=None, batch_size=1000):
+    """
+    Import cây category dạng lồng nhau:
+        [{"name": "Laptops", "slug": "...", "image": "...", "children": [...]}, ...]
+    theo từng cấp, mỗi cấp bulk_create theo lô `batch_size`.
+    `parent`: category có sẵn để gắn cả cây vào (None = gốc).
+    Trả về số category đã tạo. Slug khai báo bị trùng: ValueError.
+    """
+    reserved = _explicit_slugs(nodes)
+    root = (parent.pk, parent.path, parent.depth) if parent else None
+    level = [(node, root) for node in nodes]
+    created = 0
+    with transaction.atomic():
+        while level:
+            next_level = []
+            for start in range(0, len(level), batch_size):
+                batch = level[start:start + batch_size]
+                for (node, _), info in zip(batch, _create_batch(batch, reserved)):
+                    next_level.extend((child, info) for child in node.get('children') or [])
+                created += len(batch)
+            level = next_level
+        # bulk_create không gửi signal
+        transaction.on_commit(invalidate_category_tree)
+    return created
@@ -0,0 +1,156 @@
+# api/products/category_tree.py
+
+import hashlib
+import threading
+
+from rest_framework.renderers import JSONRenderer
+
+from utils.cache_versions import bump_version, get_version
+from utils.response_cache import invalidate_tags
+from . import cache_tags
+from .conditional import bump_catalog_version
+from .models import Category
+
+VERSION_KEY = 'category-tree'
+
+
+class CategoryTree:
+    """
+    Cây category dựng trong bộ nhớ từ 1 query duy nhất trên bảng `categories`.
+    """
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        self.nodes = {row['id']: row for row in rows}
+        self.children = {}
+        self.roots = []
+        for row in rows:
+            parent_id = row['parent_id']
+            if parent_id is None or parent_id not in self.nodes:
+                self.roots.append(row)
+            else:
+                self.children.setdefault(parent_id, []).append(row)
+        self._body = None
+        self._etag = None
+
+    @classmethod
+    def load(cls, version=None):
+        rows = list(
+            Category.objects.order_by('id').values('id', 'name', 'slug', 'image', 'parent_id', 'path')
+        )
+        return cls(rows, version=version)
+
+    def get_children(self, category_id):
+        return self.children.get(category_id, [])
+
+    def get_descendant_ids(self, category_id):
+        ids, stack = [], [category_id]
+        while stack:
+            for child in self.get_children(stack.pop()):
+                ids.append(child['id'])
+                stack.append(child['id'])
+        return ids
+
+    # Cùng cấu trúc với CategoryParentFESerializer
+    def as_parents_payload(self):
+        return [
+            {
+                "id": root['id'],
+                "name": root['name'],
+                "svgSrc": None,
+                "slug": root['slug'],
+                "subCategories": [
+                    {
+                        "id": c['id'],
+                        "name": c['name'],
+                        "svgSrc": None,
+                        "slug": c['slug'],
+                    }
+                    for c in self.get_children(root['id'])
+                ],
+            }
+            for root in self.roots
+        ]
+
+    @property
+    def body(self):
+        if self._body is None:
+            self._body = JSONRenderer().render(self.as_parents_payload())
+        return self._body
+
+    @property
+    def etag(self):
+        if self._etag is None:
+            self._etag = '"%s"' % hashlib.sha1(self.body).hexdigest()
+        return self._etag
+
+
+_lock = threading.Lock()
+_current = None
+
+
+def get_category_tree():
+    """
+    Trả về cây category của process hiện tại, chỉ load lại khi version
+    (được tăng bởi signal save/delete của Category ở bất kỳ process nào, lưu
+    trong cache dùng chung CACHE_VERSIONS_ALIAS) thay đổi.
+    """
+    global _current
+    version = get_version(VERSION_KEY, create=True)
+    tree = _current
+    if tree is not None and tree.version == version:
+        return tree
+    with _lock:
+        if _current is None or _current.version != version:
+            _current = CategoryTree.load(version=version)
+        return _current
+
+
+def invalidate_category_tree():
+    bump_version(VERSION_KEY)
+    # Listing theo category / parent cũng đổi theo cây
+    bump_catalog_version()
+    invalidate_tags([cache_tags.CATEGORIES])
+
+
+def compute_paths(rows):
+    """
+    Tính materialized path / depth cho toàn bộ cây từ các dòng (id, parent_id).
+    Trả về dict {id: (path, depth)}; category nằm trong vòng lặp parent
+    (không đi tới được từ gốc) được coi là gốc.
+    """
+    tree = CategoryTree(rows)
+    paths = {}
+    pending = list(tree.nodes)
+    stack = [(root['id'], f"/{root['id']}/", 0) for root in tree.roots]
+    while stack or pending:
+        if not stack:
+            category_id = pending.pop()
+            if category_id in paths:
+                continue
+            stack.append((category_id, f"/{category_id}/", 0))
+        category_id, path, depth = stack.pop()
+        if category_id in paths:
+            continue
+        paths[category_id] = (path, depth)
+        for child in tree.get_children(category_id):
+            stack.append((child['id'], f"{path}{child['id']}/", depth + 1))
+    return paths
+
+
+def rebuild_category_paths(batch_size=1000):
+    """
+    Tính lại path / depth của mọi category (1 query đọc + bulk_update theo lô).
+    Trả về số category đã được cập nhật.
+    """
+    rows = list(Category.objects.values('id', 'parent_id', 'path', 'depth'))
+    paths = compute_paths(rows)
+    changed = [
+        Category(id=row['id'], path=paths[row['id']][0], depth=paths[row['id']][1])
+        for row in rows
+        if (row['path'], row['depth']) != paths[row['id']]
+    ]
+    Category.objects.bulk_update(changed, ['path', 'depth'], batch_size=batch_size)
+    if changed:
+        invalidate_category_tree()
+    return len(changed)
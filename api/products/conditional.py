@@ -0,0 +1,67 @@
+# api/products/conditional.py
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from utils.cache_versions import bump_version, get_version
+
+# Version chung của dữ liệu hiển thị trên các listing (sản phẩm, ảnh chính,
+# brand, category, bảng xếp hạng): tăng khi bất kỳ dữ liệu nào trong số đó đổi
+CATALOG_VERSION_KEY = 'catalog'
+CATALOG_MODIFIED_KEY = 'catalog-modified'
+
+
+def _cache():
+    # Cùng cache với version (dùng chung giữa các process): mọi worker trả về
+    # cùng Last-Modified, không trả 304 theo mốc cũ của riêng process
+    return caches[getattr(settings, 'CACHE_VERSIONS_ALIAS', 'default')]
+
+
+def bump_catalog_version():
+    version = bump_version(CATALOG_VERSION_KEY)
+    _cache().set(CATALOG_MODIFIED_KEY, int(time.time()), timeout=None)
+    return version
+
+
+def catalog_state():
+    """
+    (version, last_modified) của catalog, không query database.
+    """
+    version = get_version(CATALOG_VERSION_KEY, create=True)
+    cache = _cache()
+    modified = cache.get(CATALOG_MODIFIED_KEY)
+    if modified is None:
+        # Chưa biết lần đổi gần nhất (cache mới / bị evict): coi như vừa đổi
+        cache.add(CATALOG_MODIFIED_KEY, int(time.time()), timeout=None)
+        modified = cache.get(CATALOG_MODIFIED_KEY)
+    return version, modified
+
+
+def request_origin(request):
+    # URL ảnh trong body được build tuyệt đối theo scheme + host của request
+    return f"{request.scheme}://{request.get_host()}" if request else ''
+
+
+def make_etag(*parts):
+    # Strong ETag: cùng version + cùng URL (kèm origin) => cùng body
+    return '"%s"' % hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def not_modified_response(request, etag, last_modified=None):
+    """
+    304 (hoặc 412 với If-Match) nếu client đã có bản mới nhất, ngược lại None.
+    Gọi trước khi query / serialize.
+    """
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified=None):
+    response.headers['ETag'] = etag
+    if last_modified:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    return response
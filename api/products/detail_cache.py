@@ -0,0 +1,132 @@
+# api/products/detail_cache.py
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from utils.cache_versions import MISSING_VERSION, bump_version, bump_versions, get_version, get_versions
+from .conditional import request_origin
+from .models import Product
+from .fast_serializers import ProductDetailFastSerializer
+
+# Tăng số này khi thay đổi cấu trúc payload chi tiết sản phẩm:
+# toàn bộ document cũ sẽ tự động bị bỏ qua.
+SCHEMA_VERSION = 3
+
+# Version chung của mọi document: tăng khi dữ liệu bị thay toàn bộ (seed --flush)
+NAMESPACE = 'product-detail'
+
+
+def _cache():
+    return caches[getattr(settings, 'PRODUCT_DETAIL_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'PRODUCT_DETAIL_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def version_key(product_id):
+    return f"product:{product_id}"
+
+
+def get_product_version(product_id):
+    # Version nằm trong cache dùng chung (CACHE_VERSIONS_ALIAS): document ở
+    # PRODUCT_DETAIL_CACHE_ALIAS có thể riêng từng process mà vẫn không cũ.
+    # Namespace và version sản phẩm lấy trong một lần gọi cache. Version sản
+    # phẩm chưa có thì là MISSING_VERSION (không tạo key cho id chỉ được đọc);
+    # namespace thì được tạo, để store bị xóa không làm document cũ hợp lệ lại.
+    versions = get_versions([NAMESPACE, version_key(product_id)])
+    namespace = versions[NAMESPACE]
+    if namespace == MISSING_VERSION:
+        namespace = get_version(NAMESPACE, create=True)
+    return f"{namespace}.{versions[version_key(product_id)]}"
+
+
+def invalidate_products(product_ids):
+    """
+    Đánh dấu document của các sản phẩm là cũ (tăng version).
+    Document sẽ được build lại ở lần đọc tiếp theo.
+    """
+    bump_versions(version_key(pid) for pid in product_ids if pid is not None)
+
+
+def invalidate_all_products():
+    """
+    Đánh dấu document của mọi sản phẩm là cũ (một lần ghi, không theo từng id).
+    """
+    bump_version(NAMESPACE)
+
+
+def _document_key(product_id, version, request):
+    # URL ảnh tương đối được build thành tuyệt đối theo host của request
+    return f"product-detail:{SCHEMA_VERSION}:{product_id}:{version}:{request_origin(request)}"
+
+
+def _document(data, version):
+    built_at = timezone.now()
+    return {
+        'version': version,
+        'built_at': built_at.isoformat(),
+        # Last-Modified: thời điểm build version này (sau mọi thay đổi đã bump
+        # version, kể cả xóa review / ảnh - những thay đổi không làm tăng updated_at)
+        'last_modified': int(built_at.timestamp()),
+        'body': JSONRenderer().render(data),
+    }
+
+
+def build_product_document(product_id, request=None, version=None):
+    """
+    Build document JSON (đã render) cho một sản phẩm.
+    Trả về None nếu sản phẩm không tồn tại hoặc không còn bán.
+    """
+    # values() + dict dựng sẵn, cùng output với ProductDetailSerializer
+    data = ProductDetailFastSerializer(request).serialize(
+        product_id, Product.objects.filter(is_available=True)
+    )
+    return None if data is None else _document(data, version)
+
+
+def get_product_document(product_id, request=None, version=None):
+    """
+    Lấy document chi tiết sản phẩm từ cache, build lại khi version thay đổi.
+    """
+    if version is None:
+        version = get_product_version(product_id)
+    key = _document_key(product_id, version, request)
+    cache = _cache()
+    document = cache.get(key)
+    if document is None:
+        document = build_product_document(product_id, request=request, version=version)
+        if document is None:
+            return None
+        cache.set(key, document, timeout=_timeout())
+    return document
+
+
+# ==========================
+# Bản async (view ASGI)
+# ==========================
+async def aget_product_version(product_id):
+    return await sync_to_async(get_product_version)(product_id)
+
+
+async def aget_product_document(product_id, request=None, version=None):
+    """
+    Như get_product_document(); khi phải build lại, các query chạy đồng thời.
+    """
+    if version is None:
+        version = await aget_product_version(product_id)
+    key = _document_key(product_id, version, request)
+    cache = _cache()
+    document = await cache.aget(key)
+    if document is None:
+        data = await ProductDetailFastSerializer(request).aserialize(
+            product_id, Product.objects.filter(is_available=True)
+        )
+        if data is None:
+            return None
+        document = _document(data, version)
+        await cache.aset(key, document, timeout=_timeout())
+    return document
@@ -0,0 +1,330 @@
+# api/products/facets.py
+
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from utils.cache_versions import bump_version, get_version
+from .models import Brand, Category, Product, ProductVariant
+
+VERSION_KEY = 'facets'
+
+BRAND = 'brand'
+CATEGORY = 'category'
+PRICE = 'price'
+COLOR = 'color'
+SIZE = 'size'
+FACETS = (BRAND, CATEGORY, PRICE, COLOR, SIZE)
+
+
+def _change_log_max():
+    return getattr(settings, 'FACET_CHANGE_LOG_MAX', 1000)
+
+
+def _change_log_timeout():
+    return getattr(settings, 'FACET_CHANGE_LOG_TIMEOUT', 60 * 60)
+
+
+def get_price_bands():
+    # Mốc giá: [0, 100), [100, 500), ..., [2000, +∞)
+    return getattr(settings, 'FACET_PRICE_BANDS', [0, 100, 500, 1000, 2000])
+
+
+def price_band(price, bands=None):
+    bands = bands or get_price_bands()
+    if price is None:
+        return None
+    band = None
+    for i, low in enumerate(bands):
+        if price >= low:
+            high = bands[i + 1] if i + 1 < len(bands) else None
+            band = f"{low}-{high}" if high is not None else f"{low}-"
+    return band
+
+
+def iter_bits(bitmap, limit=None):
+    """
+    Các product id (bit = 1) theo thứ tự id giảm dần.
+    """
+    count = 0
+    while bitmap and (limit is None or count < limit):
+        bit = bitmap.bit_length() - 1
+        yield bit
+        bitmap ^= 1 << bit
+        count += 1
+
+
+def bitmap_from_ids(product_ids, size):
+    """
+    Dựng bitmap từ danh sách id trong một lượt: set bit trên bytearray rồi
+    đổi sang int một lần (OR từng bit vào int sẽ copy cả bitmap mỗi lần).
+    `size`: số byte, >= max id // 8 + 1.
+    """
+    buffer = bytearray(size)
+    for product_id in product_ids:
+        buffer[product_id >> 3] |= 1 << (product_id & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+class FacetIndex:
+    """
+    Posting set dạng bitmap (int Python, bit thứ i = product id i) cho từng
+    giá trị facet. Lọc = AND giữa các facet, OR trong cùng một facet; đếm
+    bằng popcount.
+
+    Bộ nhớ: mỗi bitmap dài (max product id) bit bất kể số phần tử, tức
+    ~125 KB cho mỗi giá trị facet ở id 1M.
+    """
+
+    def __init__(self):
+        self.available = 0
+        self.postings = {facet: {} for facet in FACETS}
+        self.memberships = {}  # product_id -> {(facet, value), ...}
+        self.labels = {BRAND: {}, CATEGORY: {}}
+
+    # ==========================
+    # Cập nhật
+    # ==========================
+    def load(self, products):
+        """
+        Nạp toàn bộ sản phẩm [(product_id, keys), ...] vào index rỗng: gom id
+        theo từng giá trị rồi mới đổi sang bitmap, O(n) thay vì O(n²) như
+        gọi set_product() cho từng sản phẩm.
+        """
+        available = []
+        postings = {facet: {} for facet in FACETS}
+        for product_id, keys in products:
+            available.append(product_id)
+            for facet, value in keys:
+                postings[facet].setdefault(value, []).append(product_id)
+            self.memberships[product_id] = set(keys)
+        size = max(available, default=0) // 8 + 1
+        self.available = bitmap_from_ids(available, size)
+        self.postings = {
+            facet: {value: bitmap_from_ids(ids, size) for value, ids in values.items()}
+            for facet, values in postings.items()
+        }
+
+    def set_product(self, product_id, keys):
+        self.remove_product(product_id)
+        bit = 1 << product_id
+        self.available |= bit
+        for facet, value in keys:
+            self.postings[facet][value] = self.postings[facet].get(value, 0) | bit
+        self.memberships[product_id] = set(keys)
+
+    def remove_product(self, product_id):
+        keys = self.memberships.pop(product_id, None)
+        if keys is None:
+            return
+        mask = ~(1 << product_id)
+        self.available &= mask
+        for facet, value in keys:
+            remaining = self.postings[facet].get(value, 0) & mask
+            if remaining:
+                self.postings[facet][value] = remaining
+            else:
+                self.postings[facet].pop(value, None)
+
+    # ==========================
+    # Truy vấn
+    # ==========================
+    def _facet_filter(self, facet, values):
+        bitmap = 0
+        for value in values:
+            bitmap |= self.postings[facet].get(value, 0)
+        return bitmap
+
+    def query(self, filters):
+        """
+        filters: {facet: [value, ...]}.
+        Trả về (bitmap kết quả, {facet: {value: count}}); số đếm của một facet
+        được tính với mọi bộ lọc trừ chính facet đó.
+        """
+        filters = {f: list(v) for f, v in filters.items() if f in self.postings and v}
+        facet_bitmaps = {f: self._facet_filter(f, v) for f, v in filters.items()}
+
+        result = self.available
+        for bitmap in facet_bitmaps.values():
+            result &= bitmap
+
+        counts = {}
+        for facet in FACETS:
+            base = self.available
+            for other, bitmap in facet_bitmaps.items():
+                if other != facet:
+                    base &= bitmap
+            counts[facet] = {
+                value: count
+                for value, bitmap in self.postings[facet].items()
+                if (count := (bitmap & base).bit_count())
+            }
+        return result, counts
+
+
+# ==========================
+# Dựng index từ database
+# ==========================
+def _category_ancestors(path):
+    # "/1/5/12/" -> [1, 5, 12]: sản phẩm thuộc mọi category tổ tiên
+    return [int(part) for part in path.strip('/').split('/') if part]
+
+
+def _product_keys(row, variants, bands):
+    keys = set()
+    if row['brand_id'] is not None:
+        keys.add((BRAND, row['brand_id']))
+    if row['category_id'] is not None:
+        for category_id in _category_ancestors(row['category__path'] or '') or [row['category_id']]:
+            keys.add((CATEGORY, category_id))
+    price = row['discount_price'] if row['discount_price'] is not None else row['price']
+    band = price_band(price, bands)
+    if band:
+        keys.add((PRICE, band))
+    for color, size in variants:
+        if color:
+            keys.add((COLOR, color.strip()))
+        if size:
+            keys.add((SIZE, size.strip()))
+    return keys
+
+
+def _product_rows(queryset):
+    return queryset.filter(is_available=True).values(
+        'id', 'brand_id', 'category_id', 'category__path', 'price', 'discount_price'
+    )
+
+
+def _variants_by_product(queryset):
+    variants = {}
+    for product_id, color, size in queryset.values_list('product_id', 'color', 'size').iterator(chunk_size=5000):
+        variants.setdefault(product_id, []).append((color, size))
+    return variants
+
+
+def _changes_cache():
+    # Change log nằm cùng cache với version (dùng chung giữa các process)
+    return caches[getattr(settings, 'CACHE_VERSIONS_ALIAS', 'default')]
+
+
+def _change_key(version):
+    return f"facets-change:{version}"
+
+
+class FacetEngine:
+    """
+    Index facet của process hiện tại. Mỗi lần sản phẩm thay đổi, version
+    trong cache tăng 1 và danh sách product id đổi được ghi vào change log
+    theo version mới: mọi process (kể cả process ghi) chỉ đọc lại các sản
+    phẩm đó. Dựng lại toàn bộ khi thiếu một version trong log (invalidate,
+    log hết hạn, cách quá FACET_CHANGE_LOG_MAX version).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.index = None
+        self.version = None
+
+    def build(self):
+        index = FacetIndex()
+        bands = get_price_bands()
+        variants = _variants_by_product(ProductVariant.objects.filter(product__is_available=True))
+        index.load(
+            (row['id'], _product_keys(row, variants.get(row['id'], []), bands))
+            for row in _product_rows(Product.objects.all()).iterator(chunk_size=5000)
+        )
+        index.labels[BRAND] = dict(Brand.objects.values_list('id', 'name'))
+        index.labels[CATEGORY] = dict(Category.objects.values_list('id', 'name'))
+        return index
+
+    def _changed_since(self, version):
+        """
+        Các product id thay đổi từ self.version tới `version`; None nếu log
+        không đủ (phải dựng lại toàn bộ).
+        """
+        if self.index is None or self.version is None or not 0 < version - self.version <= _change_log_max():
+            return None
+        keys = [_change_key(v) for v in range(self.version + 1, version + 1)]
+        found = _changes_cache().get_many(keys)
+        if len(found) != len(keys):
+            return None
+        return {product_id for ids in found.values() for product_id in ids}
+
+    def _apply(self, product_ids):
+        # Ít sản phẩm: cập nhật bitmap tại chỗ
+        bands = get_price_bands()
+        rows = {row['id']: row for row in _product_rows(Product.objects.filter(id__in=product_ids))}
+        variants = _variants_by_product(ProductVariant.objects.filter(product_id__in=rows))
+        for product_id in product_ids:
+            row = rows.get(product_id)
+            if row:
+                self.index.set_product(product_id, _product_keys(row, variants.get(product_id, []), bands))
+            else:
+                self.index.remove_product(product_id)
+
+    def ensure_current(self):
+        # Version đọc trước khi đọc database: thay đổi xảy ra trong lúc dựng
+        # làm version tăng và được áp dụng ở lần gọi sau
+        version = get_version(VERSION_KEY, create=True)
+        if self.index is not None and self.version == version:
+            return self.index
+        with self._lock:
+            if self.index is None or self.version != version:
+                changed = self._changed_since(version)
+                if changed is None:
+                    self.index = self.build()
+                else:
+                    self._apply(changed)
+                self.version = version
+            return self.index
+
+    def query(self, filters):
+        index = self.ensure_current()
+        with self._lock:
+            return index.query(filters), index.labels
+
+    def update_products(self, product_ids):
+        """
+        Ghi nhận thay đổi của các sản phẩm (sau khi Product / ProductVariant
+        đã commit): tăng version và lưu product id vào change log. Index của
+        mọi process được cập nhật incremental ở lần đọc tiếp theo.
+        """
+        product_ids = sorted(set(product_ids))
+        if not product_ids:
+            return
+        version = bump_version(VERSION_KEY)
+        _changes_cache().set(_change_key(version), product_ids, timeout=_change_log_timeout())
+
+    def invalidate(self):
+        # Brand / Category thay đổi (nhãn, cây category): version không có
+        # trong change log nên dựng lại ở lần đọc sau
+        bump_version(VERSION_KEY)
+
+
+_engine = FacetEngine()
+
+
+def get_facet_engine():
+    return _engine
+
+
+def update_facets_on_commit(product_ids):
+    product_ids = [pid for pid in product_ids if pid is not None]
+    if product_ids:
+        transaction.on_commit(lambda: get_facet_engine().update_products(product_ids))
+
+
+def parse_filters(params):
+    """
+    ?brand=1&brand=2&category=3&price=100-500&color=Black&size=M
+    """
+    filters = {}
+    for facet in FACETS:
+        values = [v for v in params.getlist(facet) if v != '']
+        if facet in (BRAND, CATEGORY):
+            values = [int(v) for v in values if v.isdigit()]
+        if values:
+            filters[facet] = values
+    return filters
@@ -0,0 +1,238 @@
+# api/products/fast_serializers.py
+
+from django.db.models import Count
+from rest_framework import serializers
+
+from .models import (
+    Product, ProductDocument, ProductVariant,
+    Review, ReturnPolicy, ShippingInfo,
+)
+from utils.async_db import gather_in_pool
+from .media_urls import MediaURLResolver
+
+# Số review mới nhất trong chi tiết sản phẩm (ProductDetailSerializer dùng chung)
+LATEST_REVIEWS = 5
+
+
+# ======================================================
+# Serializer "biên dịch sẵn" cho các endpoint đọc nhiều
+# ------------------------------------------------------
+# Đọc dữ liệu bằng values() (không tạo model instance) rồi dựng dict theo
+# đúng thứ tự key / định dạng giá trị của serializer DRF tương ứng:
+# JSON render ra giống hệt từng byte (xem ProductFastSerializerParityTests).
+# ======================================================
+
+def _compile(model, names):
+    """
+    Trả về list (tên field, hàm chuyển giá trị) dùng lại cho mọi dòng.
+    Decimal / datetime đi qua đúng field DRF mà ModelSerializer sẽ tạo,
+    các kiểu còn lại giữ nguyên giá trị.
+    """
+    compiled = []
+    for name in names:
+        field = model._meta.get_field(name)
+        convert = None
+        if field.get_internal_type() == 'DecimalField':
+            convert = serializers.DecimalField(
+                max_digits=field.max_digits, decimal_places=field.decimal_places
+            ).to_representation
+        elif field.get_internal_type() == 'DateTimeField':
+            convert = serializers.DateTimeField().to_representation
+        compiled.append((name, convert))
+    return compiled
+
+
+def _row_dict(row, compiled, prefix=''):
+    data = {}
+    for name, convert in compiled:
+        value = row[prefix + name]
+        data[name] = convert(value) if convert is not None and value is not None else value
+    return data
+
+
+# ==========================
+# Brand (nested)
+# ==========================
+BRAND_FIELDS = ('id', 'name', 'logo_url')
+BRAND_VALUES = tuple(f'brand__{name}' for name in BRAND_FIELDS)
+
+
+def _brand(row):
+    if row['brand__id'] is None:
+        return None
+    return {name: row[f'brand__{name}'] for name in BRAND_FIELDS}
+
+
+# ==========================
+# ProductFESerializer
+# ==========================
+class ProductFEFastSerializer:
+    """
+    Cùng output với ProductFESerializer, 2 query cho cả trang:
+    products (values, JOIN brands) + ảnh chính (values, JOIN documents).
+    """
+    scalar_fields = ('id', 'name', 'description', 'price', 'discount_price', 'sold')
+    compiled = _compile(Product, scalar_fields)
+
+    def __init__(self, request=None):
+        self.media = MediaURLResolver.for_request(request)
+
+    @classmethod
+    def values(cls, queryset, *extra):
+        # extra: field cần thêm cho phân trang (sort key)
+        return queryset.values(*cls.scalar_fields, *BRAND_VALUES, *extra)
+
+    def main_images(self, product_ids):
+        images = {}
+        rows = (
+            ProductDocument.objects.filter(product_id__in=product_ids, is_main=True)
+            .order_by('id')
+            .values_list('product_id', 'document__file')
+        )
+        for product_id, name in rows:
+            images.setdefault(product_id, name)
+        return images
+
+    def serialize(self, rows):
+        rows = list(rows)
+        images = self.main_images([row['id'] for row in rows]) if rows else {}
+        file_url = self.media.file_url
+        result = []
+        for row in rows:
+            data = _row_dict(row, self.compiled)
+            data['brand'] = _brand(row)
+            data['main_image'] = file_url(images.get(row['id']))
+            result.append(data)
+        return result
+
+    def serialize_ids(self, ids, queryset=None):
+        # Giữ nguyên thứ tự của `ids` (kết quả tìm kiếm, facet,...)
+        queryset = Product.objects.all() if queryset is None else queryset
+        by_id = {row['id']: row for row in self.values(queryset.filter(id__in=ids))}
+        return self.serialize(by_id[i] for i in ids if i in by_id)
+
+
+# ==========================
+# ProductDetailSerializer
+# ==========================
+class ProductDetailFastSerializer:
+    """
+    Cùng output với ProductDetailSerializer cho một sản phẩm, mỗi phần
+    (variants, reviews, histogram, shipping, return policy, ảnh) là 1 query values().
+    """
+    scalar_fields = (
+        'id', 'name', 'description', 'price', 'discount_price',
+        'rating', 'num_reviews', 'is_available',
+    )
+    compiled = _compile(Product, scalar_fields)
+    variant_fields = ('id', 'name', 'color', 'size', 'stock', 'price', 'discount_price')
+    compiled_variant = _compile(ProductVariant, variant_fields)
+    compiled_review = _compile(Review, ('rating', 'comment', 'created_at'))
+    latest_reviews = LATEST_REVIEWS
+
+    def __init__(self, request=None):
+        self.media = MediaURLResolver.for_request(request)
+
+    def serialize(self, product_id, queryset=None):
+        """
+        Trả về dict, hoặc None nếu không có sản phẩm trong queryset.
+        """
+        row = self._product_row(product_id, queryset)
+        if row is None:
+            return None
+        return self._assemble(row, *(section(product_id) for section in self.sections))
+
+    async def aserialize(self, product_id, queryset=None):
+        """
+        Như serialize(), nhưng các query (sản phẩm + từng phần) chạy đồng thời,
+        mỗi query một connection (utils/async_db.py).
+        """
+        row, *parts = await gather_in_pool(
+            (self._product_row, product_id, queryset),
+            *((section, product_id) for section in self.sections),
+        )
+        if row is None:
+            return None
+        return self._assemble(row, *parts)
+
+    @property
+    def sections(self):
+        # Các phần độc lập với nhau, cùng thứ tự tham số của _assemble
+        return (
+            self._variants, self._latest_reviews, self._rating_counts,
+            self._shipping_info, self._return_policy, self._images,
+        )
+
+    def _assemble(self, row, variants, reviews, rating_counts, shipping_info, return_policy, images):
+        data = _row_dict(row, self.compiled)
+        data['brand'] = _brand(row)
+        data['variants'] = variants
+        data['reviews'] = reviews
+        data['review_summary'] = self._review_summary(row, rating_counts)
+        data['shipping_info'] = shipping_info
+        data['return_policy'] = return_policy
+        data.update(images)
+        return data
+
+    def _product_row(self, product_id, queryset=None):
+        queryset = Product.objects.all() if queryset is None else queryset
+        return queryset.filter(id=product_id).values(*self.scalar_fields, *BRAND_VALUES).first()
+
+    def _variants(self, product_id):
+        return [
+            _row_dict(v, self.compiled_variant)
+            for v in ProductVariant.objects.filter(product_id=product_id).order_by('id').values(*self.variant_fields)
+        ]
+
+    def _shipping_info(self, product_id):
+        return list(ShippingInfo.objects.filter(product_id=product_id).order_by('id').values('id', 'info'))
+
+    def _return_policy(self, product_id):
+        return list(ReturnPolicy.objects.filter(product_id=product_id).order_by('id').values('id', 'policy_text'))
+
+    def _latest_reviews(self, product_id):
+        reviews = []
+        rows = (
+            Review.objects.filter(product_id=product_id)
+            .order_by('-created_at', '-id')
+            .values('id', 'rating', 'comment', 'created_at', 'user__username')[:self.latest_reviews]
+        )
+        for row in rows:
+            # StringRelatedField -> str(user) == username
+            review = {'id': row['id'], 'user': row['user__username']}
+            review.update(_row_dict(row, self.compiled_review))
+            reviews.append(review)
+        return reviews
+
+    def _rating_counts(self, product_id):
+        return dict(
+            Review.objects.filter(product_id=product_id).order_by()
+            .values_list('rating').annotate(count=Count('id'))
+        )
+
+    def _review_summary(self, row, counts):
+        return {
+            'count': row['num_reviews'],
+            'average': round(row['rating'], 2),
+            'histogram': {str(star): counts.get(star, 0) for star in range(1, 6)},
+        }
+
+    def _images(self, product_id):
+        file_url = self.media.file_url
+        main_image = None
+        other_images = []
+        rows = (
+            ProductDocument.objects.filter(product_id=product_id)
+            .order_by('id')
+            .values_list('is_main', 'document__file')
+        )
+        for is_main, name in rows:
+            if not name:
+                continue
+            if is_main:
+                if main_image is None:
+                    main_image = file_url(name)
+            else:
+                other_images.append(file_url(name))
+        return {'main_image': main_image, 'other_images': other_images}
+
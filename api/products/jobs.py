@@ -0,0 +1,20 @@
+# api/products/jobs.py
+# Handler việc nền của products (đăng ký với api/jobs, chạy bởi `run_workers`)
+
+from api.jobs.queue import enqueue, register
+from .back_in_stock import BACK_IN_STOCK_JOB, BACK_IN_STOCK_QUEUE, fan_out_back_in_stock
+
+
+@register(BACK_IN_STOCK_JOB)
+def send_back_in_stock(payload):
+    """
+    payload: {"product_id": ..., "after_id": ...}. Mỗi job chạy tối đa
+    BACK_IN_STOCK_JOB_SECONDS rồi thêm job tiếp theo từ vị trí đã dừng:
+    job không giữ lock lâu hơn JOB_LOCK_TIMEOUT dù có hàng chục nghìn đăng ký.
+    """
+    after_id = fan_out_back_in_stock(payload['product_id'], payload.get('after_id', 0))
+    if after_id is not None:
+        enqueue(
+            BACK_IN_STOCK_JOB, {'product_id': payload['product_id'], 'after_id': after_id},
+            queue=BACK_IN_STOCK_QUEUE,
+        )
@@ -0,0 +1,89 @@
+# api/products/media_urls.py
+
+from functools import lru_cache
+from urllib.parse import unquote, urljoin
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.encoding import iri_to_uri
+
+from .models import Document
+
+# Số URL / file name giữ trong mỗi LRU (tập file ảnh nhỏ và ít thay đổi)
+CACHE_SIZE = 4096
+
+_FILE_STORAGE = Document._meta.get_field('file').storage
+
+
+# ==========================
+# Chuẩn hóa (không phụ thuộc request)
+# ==========================
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_url(url):
+    """
+    Chuẩn hóa giá trị lưu trong Document.file / storage.url:
+    bỏ %-encode, khoảng trắng, "/" đầu, sửa "https:/" -> "https://".
+    Trả về (url, is_absolute).
+    """
+    url = unquote(url).strip()
+    if url.startswith('/'):
+        url = url[1:]
+    if url.startswith('https:/') and not url.startswith('https://'):
+        url = url.replace('https:/', 'https://', 1)
+    elif url.startswith('http:/') and not url.startswith('http://'):
+        url = url.replace('http:/', 'http://', 1)
+    return url, url.startswith(('http://', 'https://'))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def storage_url(name):
+    return _FILE_STORAGE.url(name)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _absolute_url(base, url):
+    # Giống request.build_absolute_uri(url) với url không bắt đầu bằng "/"
+    return iri_to_uri(urljoin(base, url))
+
+
+@receiver(setting_changed)
+def _clear_media_url_caches(setting, **kwargs):
+    if setting in ('MEDIA_URL', 'STORAGES'):
+        storage_url.cache_clear()
+
+
+# ==========================
+# Resolve theo request
+# ==========================
+class MediaURLResolver:
+    """
+    Build URL ảnh tuyệt đối cho một request: phần gốc (scheme, host, path)
+    tính 1 lần cho cả response, kết quả mỗi URL nằm trong LRU theo
+    (gốc, url) nên dùng lại được giữa các request cùng host / path.
+    """
+
+    def __init__(self, request=None):
+        self.base = f"{request.scheme}://{request.get_host()}{request.path}" if request is not None else None
+
+    @classmethod
+    def for_request(cls, request):
+        # Dùng chung 1 resolver cho mọi serializer trong cùng request
+        if request is None:
+            return cls()
+        resolver = getattr(request, '_media_url_resolver', None)
+        if resolver is None:
+            resolver = cls(request)
+            request._media_url_resolver = resolver
+        return resolver
+
+    def resolve(self, url):
+        if not url:
+            return None
+        url, is_absolute = normalize_url(url)
+        if is_absolute or self.base is None:
+            return url
+        return _absolute_url(self.base, url)
+
+    def file_url(self, name):
+        # name: giá trị cột Document.file
+        return self.resolve(storage_url(name)) if name else None
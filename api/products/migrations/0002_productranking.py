@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rail', models.CharField(choices=[('popular', 'Popular'), ('sale', 'Sale'), ('best_sale', 'Best sale')], max_length=20)),
+                ('position', models.PositiveIntegerField()),
+                ('refreshed_at', models.DateTimeField()),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='products.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='products.product')),
+            ],
+            options={
+                'db_table': 'product_rankings',
+                'indexes': [models.Index(fields=['rail', 'category', 'position'], name='rankings_rail_cat_pos_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+def build_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    rows = list(Category.objects.values_list('id', 'parent_id'))
+    children = {}
+    ids = {category_id for category_id, _ in rows}
+    for category_id, parent_id in rows:
+        children.setdefault(parent_id if parent_id in ids else None, []).append(category_id)
+
+    updated = []
+    stack = [(category_id, f"/{category_id}/", 0) for category_id in children.get(None, [])]
+    while stack:
+        category_id, path, depth = stack.pop()
+        updated.append(Category(id=category_id, path=path, depth=depth))
+        stack.extend((child, f"{path}{child}/", depth + 1) for child in children.get(category_id, []))
+    Category.objects.bulk_update(updated, ['path', 'depth'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_category_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(build_paths, migrations.RunPython.noop),
+    ]
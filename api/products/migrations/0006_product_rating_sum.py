@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:05
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_review_aggregates(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+    updated = [
+        Product(id=row['product_id'], num_reviews=row['count'], rating_sum=row['total'],
+                rating=row['total'] / row['count'])
+        for row in Review.objects.values('product_id').annotate(count=Count('id'), total=Sum('rating')).order_by()
+    ]
+    Product.objects.bulk_update(updated, ['num_reviews', 'rating_sum', 'rating'], batch_size=1000)
+    Product.objects.filter(reviews__isnull=True).update(num_reviews=0, rating_sum=0, rating=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_category_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_review_aggregates, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.utils.text import slugify
+from django.db.models.functions import Concat, Substr
+
+from .slugs import allocate_slugs
 
 # ==========================
 # BRANDS
@@ -32,6 +34,11 @@ class Category(models.Model):
     image = models.URLField(null=True, blank=True)
     slug = models.SlugField(max_length=255, unique=True, blank=True)
 
+    # Materialized path: "/<id gốc>/.../<id>/", cập nhật khi save / đổi parent.
+    # Cả cây con của X là một range query: path >= X.path AND path < X.path[:-1] + '0'
+    path = models.CharField(max_length=255, blank=True, default='', db_index=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
     class Meta:
         db_table = 'categories'
 
@@ -40,16 +47,58 @@ class Category(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            # tạo slug từ name
-            base_slug = slugify(self.name)
-            slug = base_slug
-            counter = 1
-            # kiểm tra duplicate trong database
-            while Category.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
+            # tạo slug từ name (1 query lấy các slug trùng prefix)
+            self.slug = allocate_slugs([self.name], model=Category)[0]
+
+        if self.pk is None:
+            super().save(*args, **kwargs)
+            self.path, self.depth = self._build_path()
+            Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+            return
+
+        old_path, old_depth = self.path, self.depth
+        self.path, self.depth = self._build_path()
         super().save(*args, **kwargs)
+        if old_path and old_path != self.path:
+            # Đổi parent: chuyển cả cây con sang path mới
+            Category.move_subtree(old_path, self.path, self.depth - old_depth, exclude_pk=self.pk)
+
+    def _build_path(self):
+        if self.parent_id is None:
+            return f"/{self.pk}/", 0
+        parent = Category.objects.filter(pk=self.parent_id).values('path', 'depth').first()
+        if parent is None or not parent['path']:
+            return f"/{self.pk}/", 0
+        if self.path and parent['path'].startswith(self.path):
+            raise ValueError("A category cannot be moved under its own subtree.")
+        return f"{parent['path']}{self.pk}/", parent['depth'] + 1
+
+    @staticmethod
+    def move_subtree(old_path, new_path, depth_delta, exclude_pk=None):
+        """
+        Thay prefix `old_path` bằng `new_path` cho mọi category con cháu (1 UPDATE).
+        """
+        queryset = Category.objects.filter(Category.path_range_q(old_path))
+        if exclude_pk is not None:
+            queryset = queryset.exclude(pk=exclude_pk)
+        return queryset.update(
+            path=Concat(models.Value(new_path), Substr('path', len(old_path) + 1)),
+            depth=models.F('depth') + depth_delta,
+        )
+
+    @staticmethod
+    def path_range_q(path, field='path'):
+        # '/' < '0' nên mọi path bắt đầu bằng `path` nằm trong [path, path[:-1] + '0')
+        return models.Q(**{f"{field}__gte": path, f"{field}__lt": path[:-1] + '0'})
+
+    def subtree_q(self, field='path'):
+        """
+        Q lọc toàn bộ cây con (gồm cả chính category này), ví dụ:
+        Product.objects.filter(category.subtree_q('category__path'))
+        """
+        return Category.path_range_q(self.path, field=field)
+
+
 # ==========================
 # PRODUCTS
 # ==========================
@@ -60,8 +109,15 @@ class Product(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     discount_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Tổng hợp từ bảng reviews, được cập nhật mỗi lần ghi Review
+    # (xem api/products/review_stats.py); rating = rating_sum / num_reviews
     rating = models.FloatField(default=0)
     num_reviews = models.IntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    # Lần cuối các cột tổng hợp review đổi: refresh_rankings incremental đọc cột
+    # này (cùng updated_at) để không phải ghi updated_at, vốn là khóa sắp xếp
+    # của rail SALE và sort=newest
+    stats_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
     is_available = models.BooleanField(default=True)
 
     # Thuộc tính trạng thái
@@ -77,10 +133,53 @@ class Product(models.Model):
 
     class Meta:
         db_table = 'products'
+        # Mỗi index ứng với một kiểu query của app products
+        # (xem api/products/query_plans.py). Các index dùng cho ORDER BY
+        # bắt đầu bằng cột sắp xếp: đọc ngược theo index rồi lọc is_available,
+        # dừng ngay khi đủ LIMIT, không cần filesort.
+        indexes = [
+            models.Index(fields=['category', 'is_available'], name='products_cat_avail_idx'),
+            # Phân trang keyset trong một category: (-sold, -id), (-updated_at, -id)
+            models.Index(fields=['category', 'sold'], name='products_cat_sold_idx'),
+            models.Index(fields=['category', 'updated_at'], name='products_cat_updated_idx'),
+            # Như trên cho listing mọi sản phẩm (/categories/0/)
+            models.Index(fields=['is_available', 'sold', 'id'], name='products_avail_sold_idx'),
+            models.Index(fields=['is_available', 'updated_at', 'id'], name='products_avail_updated_idx'),
+            models.Index(fields=['is_available', 'is_popular'], name='products_avail_popular_idx'),
+            models.Index(fields=['is_available', 'is_sale'], name='products_avail_sale_idx'),
+            models.Index(fields=['is_available', 'is_best_sale'], name='products_avail_best_idx'),
+            models.Index(fields=['rating', 'num_reviews'], name='products_rating_idx'),
+            models.Index(fields=['sold', 'rating'], name='products_sold_idx'),
+            models.Index(fields=['updated_at'], name='products_updated_idx'),
+            models.Index(fields=['stats_updated_at'], name='products_stats_updated_idx'),
+        ]
+
+    REVIEW_AGGREGATE_FIELDS = ('rating', 'num_reviews', 'rating_sum', 'stats_updated_at')
+
+    # category_id lúc load từ database: khi sản phẩm chuyển category, listing
+    # của category cũ cũng phải được invalidate (xem signals.py)
+    loaded_category_id = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'category_id' in field_names:
+            instance.loaded_category_id = instance.category_id
+        return instance
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Khi sửa sản phẩm, không ghi đè các cột tổng hợp review bằng giá trị
+        # cũ đang nằm trong instance (có thể đã bị Review khác cập nhật)
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.REVIEW_AGGREGATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     # ==========================
     # CÁC HÀM LẤY DỮ LIỆU
     # ==========================
@@ -98,22 +197,60 @@ class Product(models.Model):
     def get_best_sale_attr(cls, limit=10):
         return cls.objects.filter(is_available=True, is_best_sale=True)[:limit]
 
-    # Lấy theo tính toán
+    # Lấy theo bảng xếp hạng đã tính sẵn (xem api/products/rankings.py)
+    @classmethod
+    def get_ranked(cls, rail, limit=10, category=None):
+        return cls.objects.filter(
+            rankings__rail=rail,
+            rankings__category=category,
+            is_available=True,
+        ).order_by('rankings__position')[:limit]
+
     @classmethod
-    def get_popular(cls, limit=10):
-        return cls.objects.filter(is_available=True).order_by('-rating', '-num_reviews')[:limit]
+    def get_popular(cls, limit=10, category=None):
+        return cls.get_ranked(ProductRanking.POPULAR, limit, category)
 
     @classmethod
-    def get_sale(cls, limit=10):
-        return cls.objects.filter(
-            discount_price__isnull=False,
-            discount_price__lt=models.F('price'),
-            is_available=True
-        ).order_by('-updated_at')[:limit]
+    def get_sale(cls, limit=10, category=None):
+        return cls.get_ranked(ProductRanking.SALE, limit, category)
 
     @classmethod
-    def get_best_sale(cls, limit=10):
-        return cls.objects.filter(is_available=True).order_by('-sold', '-rating')[:limit]
+    def get_best_sale(cls, limit=10, category=None):
+        return cls.get_ranked(ProductRanking.BEST_SALE, limit, category)
+
+
+# ==========================
+# PRODUCT RANKINGS
+# ==========================
+class ProductRanking(models.Model):
+    """
+    Top-N product id của từng "rail" (popular / sale / best sale),
+    toàn cục (category = NULL) hoặc theo category (gồm cả category con).
+    """
+    POPULAR = 'popular'
+    SALE = 'sale'
+    BEST_SALE = 'best_sale'
+
+    RAIL_CHOICES = [
+        (POPULAR, 'Popular'),
+        (SALE, 'Sale'),
+        (BEST_SALE, 'Best sale'),
+    ]
+
+    rail = models.CharField(max_length=20, choices=RAIL_CHOICES)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='rankings')
+    position = models.PositiveIntegerField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='rankings')
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'product_rankings'
+        indexes = [
+            models.Index(fields=['rail', 'category', 'position'], name='rankings_rail_cat_pos_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.rail} #{self.position} - {self.product_id}"
 
 
 # ==========================
@@ -129,9 +266,19 @@ class ProductVariant(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     discount_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
+    # stock lúc load từ database: phát hiện hết hàng -> có hàng (back_in_stock.py)
+    loaded_stock = None
+
     class Meta:
         db_table = 'product_variants'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'stock' in field_names:
+            instance.loaded_stock = instance.stock
+        return instance
+
     def __str__(self):
         return f"{self.product.name} - {self.name or self.size or self.color}"
 
@@ -146,8 +293,24 @@ class Review(models.Model):
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # (product_id, rating) lúc load từ database: để trừ đúng giá trị cũ
+    # khỏi tổng hợp của sản phẩm khi review được sửa / xóa
+    loaded_values = None
+
     class Meta:
         db_table = 'reviews'
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='reviews_product_created_idx'),
+            # Histogram số sao của review_summary (GROUP BY rating trong 1 sản phẩm)
+            models.Index(fields=['product', 'rating'], name='reviews_product_rating_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'product_id' in field_names and 'rating' in field_names:
+            instance.loaded_values = (instance.product_id, instance.rating)
+        return instance
 
     def __str__(self):
         return f"{self.user.username} - {self.product.name} ({self.rating}⭐)"
@@ -192,6 +355,10 @@ class Notification(models.Model):
 
     class Meta:
         db_table = 'notifications'
+        indexes = [
+            # Duyệt keyset các đăng ký chưa gửi: WHERE product_id = ? AND notified = 0 AND id > ? ORDER BY id
+            models.Index(fields=['product', 'notified', 'id'], name='notifications_pending_idx'),
+        ]
 
     def __str__(self):
         return f"Notify {self.email} for {self.product.name}"
@@ -230,6 +397,9 @@ class ProductDocument(models.Model):
 
     class Meta:
         db_table = 'product_documents'
+        indexes = [
+            models.Index(fields=['product', 'is_main'], name='product_docs_main_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.document.title or self.document.file.name}"
@@ -0,0 +1,155 @@
+# api/products/pagination.py
+
+import base64
+import json
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+
+from .models import Product, Review
+
+
+def keyset_filter(model, ordering, values, reverse=False):
+    """
+    Điều kiện "đứng sau (va, vb)" theo thứ tự sort (a, b):
+        a > va  OR  (a = va AND b > vb)
+    (đổi chiều so sánh với field sắp xếp giảm dần hoặc khi lùi trang).
+    """
+    conditions = []
+    for i, name in enumerate(ordering):
+        field = name.lstrip('-')
+        descending = name.startswith('-') != reverse
+        lookup = 'lt' if descending else 'gt'
+        value = model._meta.get_field(field).to_python(values[i])
+        equal = {
+            prev.lstrip('-'): model._meta.get_field(prev.lstrip('-')).to_python(values[j])
+            for j, prev in enumerate(ordering[:i])
+        }
+        conditions.append(Q(**equal, **{f"{field}__{lookup}": value}))
+    return reduce(lambda a, b: a | b, conditions)
+
+
+class KeysetPagination:
+    """
+    Phân trang theo cursor (keyset): mỗi trang lọc theo giá trị sort key của
+    dòng cuối trang trước thay vì OFFSET, nên trang N tốn như trang 1.
+
+    `orderings` map tên sort -> tuple field (dòng cuối luôn là khóa duy nhất,
+    ví dụ 'id', để thứ tự ổn định) của `model`.
+    """
+    model = None
+    orderings = {}
+    default_ordering = None
+    page_size = 6
+    max_page_size = 48
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'sort'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, request):
+        params = request.query_params if hasattr(request, 'query_params') else request.GET
+        self.ordering_name = params.get(self.ordering_query_param) or self.default_ordering
+        if self.ordering_name not in self.orderings:
+            raise NotFound(f"Invalid sort: {self.ordering_name}")
+        self.ordering = self.orderings[self.ordering_name]
+        self.page_size = self._parse_page_size(params.get(self.page_size_query_param))
+        self.cursor = self.decode_cursor(params.get(self.cursor_query_param))
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def _parse_page_size(self, value):
+        try:
+            size = int(value)
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    # ==========================
+    # Cursor
+    # ==========================
+    def encode_cursor(self, obj, reverse):
+        # obj: model instance hoặc dict (queryset.values())
+        if isinstance(obj, dict):
+            values = [obj[name.lstrip('-')] for name in self.ordering]
+        else:
+            values = [getattr(obj, name.lstrip('-')) for name in self.ordering]
+        payload = {'s': self.ordering_name, 'v': values, 'r': int(reverse)}
+        # default=str: giữ nguyên microsecond của datetime, Decimal dạng chuỗi
+        raw = json.dumps(payload, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, encoded):
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            payload = json.loads(raw)
+            values = payload['v']
+            if payload['s'] != self.ordering_name or not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return {'values': self._coerce_values(values), 'reverse': bool(payload['r'])}
+        except (TypeError, ValueError, KeyError, ValidationError):
+            # json.JSONDecodeError là ValueError; giá trị sai kiểu -> ValidationError
+            raise NotFound(self.invalid_cursor_message)
+
+    def _coerce_values(self, values):
+        # Kiểm tra kiểu từng giá trị theo field sắp xếp (sort key không NULL)
+        coerced = []
+        for name, value in zip(self.ordering, values):
+            if value is None or isinstance(value, (dict, list, bool)):
+                raise ValueError
+            coerced.append(self.model._meta.get_field(name.lstrip('-')).to_python(value))
+        return coerced
+
+    # ==========================
+    # Query
+    # ==========================
+    def paginate_queryset(self, queryset):
+        reverse = bool(self.cursor and self.cursor['reverse'])
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(n[1:] if n.startswith('-') else f"-{n}" for n in ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.cursor:
+            queryset = queryset.filter(
+                keyset_filter(queryset.model, self.ordering, self.cursor['values'], reverse)
+            )
+
+        # Lấy dư 1 dòng để biết còn trang tiếp theo hay không
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if rows:
+            has_next = not reverse and has_more or reverse
+            has_previous = reverse and has_more or (not reverse and self.cursor is not None)
+            if has_next:
+                self.next_cursor = self.encode_cursor(rows[-1], reverse=False)
+            if has_previous:
+                self.previous_cursor = self.encode_cursor(rows[0], reverse=True)
+        return rows
+
+
+class CategoryProductsPagination(KeysetPagination):
+    model = Product
+    orderings = {
+        'best_seller': ('-sold', '-id'),
+        'newest': ('-updated_at', '-id'),
+    }
+    default_ordering = 'best_seller'
+
+
+class ProductReviewsPagination(KeysetPagination):
+    model = Review
+    orderings = {
+        'newest': ('-created_at', '-id'),
+        'oldest': ('created_at', 'id'),
+    }
+    default_ordering = 'newest'
+    page_size = 10
+    max_page_size = 50
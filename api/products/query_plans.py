@@ -0,0 +1,290 @@
+# api/products/query_plans.py
+
+import json
+import random
+import re
+from dataclasses import dataclass, field
+
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import (
+    Brand, Category, Document, Product, ProductDocument, ProductRanking, Review,
+)
+from .category_tree import rebuild_category_paths
+from .pagination import CategoryProductsPagination, ProductReviewsPagination, keyset_filter
+from .rankings import RAILS
+
+FULL_SCAN = 'full_scan'
+FILESORT = 'filesort'
+
+
+# ==========================
+# Danh sách các kiểu query của app products
+# ==========================
+@dataclass
+class QueryShape:
+    name: str
+    build: object  # callable(ctx) -> QuerySet
+    # Các vấn đề được chấp nhận cho query này (kèm lý do ở chỗ khai báo)
+    allow: tuple = field(default_factory=tuple)
+    # Chấp nhận thêm theo từng database, ví dụ {'sqlite': (FULL_SCAN,)}
+    vendor_allow: dict = field(default_factory=dict)
+
+    def allowed(self, vendor):
+        return tuple(self.allow) + tuple(self.vendor_allow.get(vendor, ()))
+
+
+# Trên SQLite, Django sinh `WHERE "is_available"` (không có `= 1`) nên index
+# trên cột boolean không dùng được; MySQL sinh `is_available = 1` và dùng index.
+BOOLEAN_ONLY_FILTER = {'sqlite': (FULL_SCAN,)}
+# Cùng lý do: SQLite không dùng được index (is_available, <cột sort>, id) nên
+# phải sort; trên MySQL index này trả đúng thứ tự, không filesort.
+BOOLEAN_ONLY_ORDER = {'sqlite': (FILESORT,)}
+
+
+def _sample(ctx):
+    return ctx['product_ids'][:6]
+
+
+def _keyset_page(queryset, sort='best_seller'):
+    # Trang thứ 2 trở đi của CategoryProductsPagination
+    ordering = CategoryProductsPagination.orderings[sort]
+    values = [timezone.now() if name == '-updated_at' else 10 for name in ordering]
+    return queryset.filter(keyset_filter(Product, ordering, values)).order_by(*ordering)[:7]
+
+
+QUERY_SHAPES = [
+    # Listing theo category / parent / id=0
+    QueryShape('category_listing', lambda ctx: Product.objects.filter(
+        category_id=ctx['category_id'], is_available=True)[:6]),
+    QueryShape('parent_listing', lambda ctx: Product.objects.filter(
+        Category.path_range_q(ctx['parent_path'], 'category__path'), is_available=True)[:6]),
+    QueryShape('category_subtree', lambda ctx: Category.objects.filter(
+        Category.path_range_q(ctx['parent_path']))),
+    QueryShape('category_page', lambda ctx: _keyset_page(
+        Product.objects.filter(category_id=ctx['category_id'], is_available=True))),
+    QueryShape('category_page_newest', lambda ctx: _keyset_page(
+        Product.objects.filter(category_id=ctx['category_id'], is_available=True), 'newest')),
+    # Gộp nhiều category: mỗi category đọc theo index (category, sold) nhưng
+    # trộn nhiều category thì phải sort. Chấp nhận: chỉ sort các sản phẩm của
+    # cây con sau cursor; đi theo index (is_available, sold, id) toàn bảng rồi
+    # lọc theo path sẽ đọc gần hết bảng khi cây con nhỏ.
+    QueryShape('parent_page', lambda ctx: _keyset_page(
+        Product.objects.filter(
+            Category.path_range_q(ctx['parent_path'], 'category__path'), is_available=True)),
+        allow=(FILESORT,)),
+    # Listing mọi sản phẩm (/categories/0/), cũng phân trang keyset
+    QueryShape('all_page', lambda ctx: _keyset_page(Product.objects.filter(is_available=True)),
+               vendor_allow=BOOLEAN_ONLY_ORDER),
+    QueryShape('all_page_newest', lambda ctx: _keyset_page(Product.objects.filter(is_available=True), 'newest'),
+               vendor_allow=BOOLEAN_ONLY_ORDER),
+    QueryShape('main_images', lambda ctx: ProductDocument.objects.filter(
+        is_main=True, product_id__in=_sample(ctx))),
+
+    # Lấy theo thuộc tính
+    QueryShape('popular_attr', lambda ctx: Product.get_popular_attr(limit=6), vendor_allow=BOOLEAN_ONLY_FILTER),
+    QueryShape('sale_attr', lambda ctx: Product.get_sale_attr(limit=6), vendor_allow=BOOLEAN_ONLY_FILTER),
+    QueryShape('best_sale_attr', lambda ctx: Product.get_best_sale_attr(limit=6), vendor_allow=BOOLEAN_ONLY_FILTER),
+
+    # Đọc bảng xếp hạng
+    QueryShape('ranked_global', lambda ctx: Product.get_popular(limit=6)),
+    QueryShape('ranked_category', lambda ctx: Product.get_popular(limit=6, category=ctx['parent_id'])),
+
+    # Tính bảng xếp hạng (refresh_rankings)
+    QueryShape('rank_popular', lambda ctx: RAILS[ProductRanking.POPULAR](
+        Product.objects.filter(is_available=True)).values_list('id', flat=True)[:100]),
+    QueryShape('rank_sale', lambda ctx: RAILS[ProductRanking.SALE](
+        Product.objects.filter(is_available=True)).values_list('id', flat=True)[:100]),
+    QueryShape('rank_best_sale', lambda ctx: RAILS[ProductRanking.BEST_SALE](
+        Product.objects.filter(is_available=True)).values_list('id', flat=True)[:100]),
+    # Như parent_page: sort toàn bộ sản phẩm của cây con; chấp nhận vì chỉ
+    # chạy trong refresh_rankings (định kỳ), không chạy theo request
+    QueryShape('rank_category', lambda ctx: RAILS[ProductRanking.BEST_SALE](
+        Product.objects.filter(Category.path_range_q(ctx['parent_path'], 'category__path'), is_available=True)
+    ).values_list('id', flat=True)[:100], allow=(FILESORT,)),
+    QueryShape('changed_products', lambda ctx: Product.objects.filter(
+        Q(updated_at__gt=ctx['since']) | Q(stats_updated_at__gt=ctx['since'])).values_list('category_id', flat=True)),
+
+    # Chi tiết sản phẩm
+    QueryShape('product_detail', lambda ctx: Product.objects.filter(
+        id=ctx['product_id'], is_available=True).select_related('brand')),
+    # Sort theo id trên vài dòng của một sản phẩm
+    QueryShape('detail_documents', lambda ctx: ProductDocument.objects.filter(
+        product_id=ctx['product_id']).select_related('document').order_by('id'), allow=(FILESORT,)),
+    QueryShape('latest_reviews', lambda ctx: Review.objects.filter(
+        product_id=ctx['product_id']).order_by('-created_at')[:10]),
+    QueryShape('review_page', lambda ctx: Review.objects.filter(
+        keyset_filter(Review, ProductReviewsPagination.orderings['newest'], [timezone.now(), 10]),
+        product_id=ctx['product_id']).select_related('user').order_by('-created_at', '-id')[:11]),
+    QueryShape('review_histogram', lambda ctx: Review.objects.filter(
+        product_id=ctx['product_id']).order_by().values_list('rating').annotate(count=Count('id'))),
+]
+
+
+# ==========================
+# Phân tích EXPLAIN theo từng database
+# ==========================
+def explain(queryset):
+    if connection.vendor == 'mysql':
+        return queryset.explain(format='json')
+    return queryset.explain()
+
+
+def _mysql_problems(plan):
+    problems = set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get('access_type') == 'ALL':
+                problems.add(FULL_SCAN)
+            if node.get('using_filesort'):
+                problems.add(FILESORT)
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(json.loads(plan))
+    return problems
+
+
+def _sqlite_problems(plan):
+    problems = set()
+    for line in plan.splitlines():
+        # "SCAN products" (không kèm USING ... INDEX) là quét toàn bảng
+        if re.search(r'\bSCAN \w+$', line.strip()):
+            problems.add(FULL_SCAN)
+        if 'USE TEMP B-TREE FOR ORDER BY' in line:
+            problems.add(FILESORT)
+    return problems
+
+
+def _postgresql_problems(plan):
+    problems = set()
+    if 'Seq Scan' in plan:
+        problems.add(FULL_SCAN)
+    if re.search(r'^\s*(->\s*)?Sort\b', plan, re.MULTILINE):
+        problems.add(FILESORT)
+    return problems
+
+
+def plan_problems(plan):
+    analyzers = {
+        'mysql': _mysql_problems,
+        'sqlite': _sqlite_problems,
+        'postgresql': _postgresql_problems,
+    }
+    analyzer = analyzers.get(connection.vendor)
+    if analyzer is None:
+        raise NotImplementedError(f"Unsupported database vendor: {connection.vendor}")
+    return analyzer(plan)
+
+
+@dataclass
+class PlanResult:
+    name: str
+    plan: str
+    problems: set
+    allowed: tuple
+
+    @property
+    def regressions(self):
+        return sorted(self.problems - set(self.allowed))
+
+    @property
+    def ok(self):
+        return not self.regressions
+
+
+def build_context():
+    """
+    Tham số cho các query mẫu, lấy từ dữ liệu hiện có.
+    """
+    child = Category.objects.exclude(parent=None).values('id', 'parent_id', 'parent__path').first()
+    any_category = Category.objects.values('id', 'path').first() or {'id': 0, 'path': '/0/'}
+    product_ids = list(Product.objects.values_list('id', flat=True)[:6]) or [0]
+    return {
+        'category_id': child['id'] if child else any_category['id'],
+        'parent_id': child['parent_id'] if child else any_category['id'],
+        'parent_path': child['parent__path'] if child else any_category['path'],
+        'product_id': product_ids[0],
+        'product_ids': product_ids,
+        'since': timezone.now() - timezone.timedelta(hours=1),
+    }
+
+
+def check_query_plans(shapes=None):
+    """
+    Chạy EXPLAIN cho từng kiểu query và trả về danh sách PlanResult.
+    """
+    with connection.cursor() as cursor:
+        # Cập nhật thống kê để planner chọn plan giống production
+        if connection.vendor == 'sqlite':
+            cursor.execute('ANALYZE')
+        elif connection.vendor == 'postgresql':
+            cursor.execute('ANALYZE')
+    ctx = build_context()
+    results = []
+    for shape in shapes or QUERY_SHAPES:
+        plan = explain(shape.build(ctx))
+        results.append(PlanResult(shape.name, plan, plan_problems(plan), shape.allowed(connection.vendor)))
+    return results
+
+
+# ==========================
+# Dữ liệu lớn để kiểm tra plan
+# ==========================
+def seed_plan_dataset(products=100000, categories=200, batch_size=5000, seed=42):
+    """
+    Tạo nhanh một catalog lớn (bulk_create) để planner chọn plan như trên production.
+    """
+    rng = random.Random(seed)
+    Brand.objects.bulk_create([Brand(name=f"Plan Brand {i}") for i in range(20)])
+    brand_ids = list(Brand.objects.filter(name__startswith="Plan Brand ").values_list('id', flat=True))
+
+    Category.objects.bulk_create([
+        Category(name=f"Plan Root {i}", slug=f"plan-root-{i}") for i in range(max(1, categories // 10))
+    ])
+    root_ids = list(Category.objects.filter(slug__startswith="plan-root-").values_list('id', flat=True))
+    Category.objects.bulk_create([
+        Category(name=f"Plan Category {i}", slug=f"plan-category-{i}", parent_id=rng.choice(root_ids))
+        for i in range(categories)
+    ])
+    category_ids = list(Category.objects.filter(slug__startswith="plan-category-").values_list('id', flat=True))
+    rebuild_category_paths()
+
+    for start in range(0, products, batch_size):
+        rows = []
+        for i in range(start, min(start + batch_size, products)):
+            price = rng.randint(100, 3000)
+            rows.append(Product(
+                name=f"Plan Product {i}",
+                description="",
+                price=price,
+                discount_price=price - rng.randint(1, 50) if rng.random() < 0.2 else None,
+                brand_id=rng.choice(brand_ids),
+                category_id=rng.choice(category_ids),
+                rating=round(rng.uniform(1, 5), 2),
+                num_reviews=rng.randint(0, 500),
+                sold=rng.randint(0, 10000),
+                is_available=rng.random() < 0.9,
+                is_popular=rng.random() < 0.05,
+                is_sale=rng.random() < 0.05,
+                is_best_sale=rng.random() < 0.05,
+            ))
+        Product.objects.bulk_create(rows)
+
+    product_ids = list(Product.objects.values_list('id', flat=True)[:1000])
+    documents = Document.objects.bulk_create([
+        Document(title=f"Plan Image {i}", type=Document.IMAGE, file=f"documents/plan-{i}.png")
+        for i in range(len(product_ids) * 2)
+    ])
+    document_ids = list(Document.objects.filter(title__startswith="Plan Image ").values_list('id', flat=True))
+    ProductDocument.objects.bulk_create([
+        ProductDocument(product_id=pid, document_id=document_ids[i], is_main=(i % 2 == 0))
+        for i, pid in enumerate(p for p in product_ids for _ in range(2))
+    ])
+    return products
@@ -0,0 +1,119 @@
+# api/products/rankings.py
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from utils.response_cache import invalidate_tags_on_commit
+from . import cache_tags
+from .category_tree import CategoryTree
+from .conditional import bump_catalog_version
+from .models import Category, Product, ProductRanking
+
+# Cách tính thứ hạng của từng rail (-id để thứ tự luôn ổn định và vẫn
+# đọc được ngược theo index, không cần filesort)
+RAILS = {
+    ProductRanking.POPULAR: lambda qs: qs.order_by('-rating', '-num_reviews', '-id'),
+    ProductRanking.SALE: lambda qs: qs.filter(
+        discount_price__isnull=False,
+        discount_price__lt=models.F('price'),
+    ).order_by('-updated_at', '-id'),
+    ProductRanking.BEST_SALE: lambda qs: qs.order_by('-sold', '-rating', '-id'),
+}
+
+# Giá trị ?type= của API -> rail
+RAIL_BY_TYPE = {
+    'popular': ProductRanking.POPULAR,
+    'sale': ProductRanking.SALE,
+    'best_seller': ProductRanking.BEST_SALE,
+}
+
+
+def get_ranking_size():
+    return getattr(settings, 'PRODUCT_RANKING_SIZE', 100)
+
+
+def last_refreshed_at():
+    return ProductRanking.objects.filter(category=None).aggregate(
+        last=models.Max('refreshed_at')
+    )['last']
+
+
+def _ancestor_ids(tree, category_id):
+    ids = []
+    while category_id is not None and category_id in tree.nodes:
+        ids.append(category_id)
+        category_id = tree.nodes[category_id]['parent_id']
+    return ids
+
+
+def changed_scopes(tree, since):
+    """
+    Các category cần tính lại kể từ `since`: category hiện tại và category cũ
+    (đang có trong bảng xếp hạng) của sản phẩm đã thay đổi, cùng mọi category cha.
+    Trả về None nếu không có sản phẩm nào thay đổi.
+    """
+    # Sản phẩm được sửa hoặc có review thay đổi (xem review_stats.py)
+    changed = Product.objects.filter(models.Q(updated_at__gt=since) | models.Q(stats_updated_at__gt=since))
+    category_ids = set(changed.values_list('category_id', flat=True))
+    if not category_ids:
+        return None
+    category_ids |= set(
+        ProductRanking.objects.filter(product__in=changed)
+        .exclude(category=None)
+        .values_list('category_id', flat=True)
+    )
+    scopes = set()
+    for category_id in category_ids:
+        scopes.update(_ancestor_ids(tree, category_id))
+    return scopes
+
+
+def refresh_scope(category_id, tree, size, now):
+    queryset = Product.objects.filter(is_available=True)
+    if category_id is not None:
+        queryset = queryset.filter(
+            Category.path_range_q(tree.nodes[category_id]['path'], field='category__path')
+        )
+    for rail, order in RAILS.items():
+        ids = list(order(queryset).values_list('id', flat=True)[:size])
+        with transaction.atomic():
+            ProductRanking.objects.filter(rail=rail, category_id=category_id).delete()
+            ProductRanking.objects.bulk_create([
+                ProductRanking(
+                    rail=rail,
+                    category_id=category_id,
+                    position=position,
+                    product_id=product_id,
+                    refreshed_at=now,
+                )
+                for position, product_id in enumerate(ids)
+            ])
+
+
+def refresh_rankings(size=None, full=False):
+    """
+    Tính lại bảng xếp hạng. Mặc định chỉ tính lại toàn cục + các category
+    có sản phẩm thay đổi từ lần chạy trước; `full=True` tính lại tất cả.
+    Trả về số scope (toàn cục / category) đã tính lại.
+    """
+    size = size or get_ranking_size()
+    now = timezone.now()
+    tree = CategoryTree.load()
+
+    since = None if full else last_refreshed_at()
+    if since is None:
+        scopes = set(tree.nodes)
+    else:
+        scopes = changed_scopes(tree, since)
+        if scopes is None:
+            return 0
+        # Category đã bị xóa thì không cần tính
+        scopes &= set(tree.nodes)
+
+    refresh_scope(None, tree, size, now)
+    for category_id in sorted(scopes):
+        refresh_scope(category_id, tree, size, now)
+    transaction.on_commit(bump_catalog_version)
+    invalidate_tags_on_commit([cache_tags.RANKINGS])
+    return len(scopes) + 1
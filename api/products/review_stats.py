@@ -0,0 +1,113 @@
+# api/products/review_stats.py
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Product, Review
+
+
+# ==========================
+# Cập nhật incremental (mỗi lần ghi Review)
+# ==========================
+def apply_review_delta(product_id, count_delta, sum_delta):
+    """
+    Cộng dồn (num_reviews, rating_sum) bằng F() trong 1 câu UPDATE, rating
+    tính lại từ chính các giá trị đó: không đọc-sửa-ghi nên không mất cập
+    nhật khi nhiều review được ghi đồng thời. stats_updated_at được ghi để
+    refresh_rankings incremental thấy rating đã đổi (updated_at giữ nguyên).
+    """
+    if product_id is None or (not count_delta and not sum_delta):
+        return
+    new_count = F('num_reviews') + count_delta
+    new_sum = F('rating_sum') + sum_delta
+    # `rating` phải đứng đầu: MySQL gán SET từ trái sang phải và dùng giá trị
+    # mới của cột đã gán trước đó (SQLite / PostgreSQL dùng giá trị cũ).
+    Product.objects.filter(pk=product_id).update(
+        rating=Case(
+            When(num_reviews__gt=-count_delta, then=Cast(new_sum, FloatField()) / new_count),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        num_reviews=new_count,
+        rating_sum=new_sum,
+        stats_updated_at=timezone.now(),
+    )
+
+
+def review_saved(review, created):
+    if created:
+        apply_review_delta(review.product_id, 1, review.rating)
+    else:
+        old = review.loaded_values
+        if old is None:
+            # Instance không load từ database: không biết giá trị cũ
+            recompute_review_aggregates(Product.objects.filter(pk=review.product_id))
+        elif old != (review.product_id, review.rating):
+            old_product_id, old_rating = old
+            with transaction.atomic():
+                apply_review_delta(old_product_id, -1, -old_rating)
+                apply_review_delta(review.product_id, 1, review.rating)
+    review.loaded_values = (review.product_id, review.rating)
+
+
+def review_deleted(review):
+    # Lấy giá trị lúc load nếu có: bản trong database mới là cái được cộng vào
+    product_id, rating = review.loaded_values or (review.product_id, review.rating)
+    apply_review_delta(product_id, -1, -rating)
+
+
+# ==========================
+# Sửa lại toàn bộ (command recompute_review_aggregates)
+# ==========================
+def recompute_review_aggregates(products=None, chunk_size=2000):
+    """
+    Tính lại (num_reviews, rating_sum, rating) từ bảng reviews bằng 1 query
+    GROUP BY product_id đọc dạng stream, so với giá trị đang lưu theo từng lô
+    và chỉ bulk_update các sản phẩm bị lệch. Trả về số sản phẩm đã sửa.
+    """
+    products = Product.objects.all() if products is None else products
+    aggregates = (
+        Review.objects.filter(product__in=products.values('pk'))
+        .values('product_id')
+        .annotate(count=Count('id'), total=Sum('rating'))
+        .order_by('product_id')
+        .values_list('product_id', 'count', 'total')
+    )
+
+    fixed = 0
+    chunk = {}
+    now = timezone.now()
+
+    def flush():
+        nonlocal fixed
+        current = Product.objects.filter(pk__in=chunk).values_list('pk', 'num_reviews', 'rating_sum', 'rating')
+        changed = []
+        for pk, num_reviews, rating_sum, rating in current:
+            count, total = chunk[pk]
+            expected = total / count
+            if (num_reviews, rating_sum) != (count, total) or abs(rating - expected) > 1e-9:
+                changed.append(Product(
+                    pk=pk, num_reviews=count, rating_sum=total, rating=expected, stats_updated_at=now,
+                ))
+        Product.objects.bulk_update(
+            changed, ['num_reviews', 'rating_sum', 'rating', 'stats_updated_at'], batch_size=chunk_size,
+        )
+        fixed += len(changed)
+        chunk.clear()
+
+    for product_id, count, total in aggregates.iterator(chunk_size=chunk_size):
+        chunk[product_id] = (count, total)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    # Sản phẩm không còn review nào
+    fixed += (
+        products.filter(reviews__isnull=True)
+        .exclude(num_reviews=0, rating_sum=0, rating=0)
+        .update(num_reviews=0, rating_sum=0, rating=0, stats_updated_at=now)
+    )
+    return fixed
@@ -0,0 +1,375 @@
+# api/products/search.py
+
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+import uuid
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from django.conf import settings
+from django.db import transaction
+
+from utils.cache_versions import bump_version, get_version
+from .models import Product
+
+VERSION_KEY = 'search-index'
+FILE_MAGIC = b'VKUSIDX1'
+
+# Trọng số từng field khi tính tần suất từ (BM25F đơn giản)
+FIELD_WEIGHTS = {
+    'name': 3,
+    'brand': 2,
+    'category': 2,
+    'description': 1,
+}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+# ==========================
+# Tách từ (không phân biệt dấu tiếng Việt)
+# ==========================
+def normalize(text):
+    """
+    "Điện thoại Xiaomi" -> "dien thoai xiaomi"
+    """
+    text = (text or '').lower().replace('đ', 'd')
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def document_terms(fields):
+    """
+    Tần suất có trọng số của từng từ trong tài liệu.
+    """
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(fields.get(field)):
+            terms[token] += weight
+    return dict(terms)
+
+
+# ==========================
+# Inverted index + BM25
+# ==========================
+class SearchIndex:
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.postings = {}   # term -> {doc_id: tf}
+        self.documents = {}  # doc_id -> {term: tf}
+        self.lengths = {}    # doc_id -> độ dài (có trọng số)
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, doc_id, terms):
+        self.remove(doc_id)
+        if not terms:
+            return
+        self.documents[doc_id] = terms
+        length = sum(terms.values())
+        self.lengths[doc_id] = length
+        self.total_length += length
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id):
+        terms = self.documents.pop(doc_id, None)
+        if terms is None:
+            return
+        self.total_length -= self.lengths.pop(doc_id)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def search(self, query, limit=20):
+        """
+        Trả về list (doc_id, score) theo điểm BM25 giảm dần.
+        """
+        terms = set(tokenize(query))
+        n = len(self.documents)
+        if not terms or not n:
+            return []
+        avg_length = self.total_length / n
+        scores = Counter()
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for doc_id, tf in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    # ==========================
+    # Lưu / đọc file
+    # ==========================
+    def dumps(self):
+        """
+        Định dạng: MAGIC + zlib(JSON {"terms": [...], "docs": [[id, ti, tf, ti, tf, ...], ...]}).
+        Chỉ lưu forward index; postings được dựng lại khi load.
+        """
+        vocabulary = {}
+        docs = []
+        for doc_id, terms in self.documents.items():
+            row = [doc_id]
+            for term, tf in terms.items():
+                row.append(vocabulary.setdefault(term, len(vocabulary)))
+                row.append(tf)
+            docs.append(row)
+        payload = json.dumps({'terms': list(vocabulary), 'docs': docs}, separators=(',', ':'))
+        return FILE_MAGIC + zlib.compress(payload.encode(), 6)
+
+    @classmethod
+    def loads(cls, data):
+        if not data.startswith(FILE_MAGIC):
+            raise ValueError('Not a search index file')
+        payload = json.loads(zlib.decompress(data[len(FILE_MAGIC):]))
+        vocabulary = payload['terms']
+        index = cls()
+        for row in payload['docs']:
+            terms = {vocabulary[row[i]]: row[i + 1] for i in range(1, len(row), 2)}
+            index.add(row[0], terms)
+        return index
+
+
+# ==========================
+# Đồng bộ với database
+# ==========================
+def _product_rows(queryset):
+    return queryset.values('id', 'name', 'description', 'brand__name', 'category__name', 'is_available')
+
+
+def _terms_for(row):
+    return document_terms({
+        'name': row['name'],
+        'description': row['description'],
+        'brand': row['brand__name'],
+        'category': row['category__name'],
+    })
+
+
+class SearchEngine:
+    """
+    Index của process hiện tại, lưu thành hai file:
+
+    - snapshot (SEARCH_INDEX_PATH): toàn bộ index, ghi lại khi rebuild / compact.
+    - change log (SEARCH_INDEX_PATH + ".log"): mỗi dòng một thay đổi
+      [doc_id, terms | null], reindex_products chỉ append phần thay đổi.
+
+    Ghi file giữ lock độc quyền (SEARCH_INDEX_PATH + ".lock", flock) nên
+    thay đổi từ nhiều process không ghi đè nhau. Các process khác nhận thay
+    đổi qua version trong cache: khi version khác, đọc tiếp change log từ vị
+    trí đã đọc (đọc lại từ đầu nếu log đã được compact).
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.RLock()
+        self.index = None
+        self.version = None
+        # Change log đã áp dụng tới đâu: (generation, offset)
+        self._log_generation = None
+        self._log_offset = 0
+
+    @property
+    def path(self):
+        return self._path or getattr(settings, 'SEARCH_INDEX_PATH')
+
+    @property
+    def log_path(self):
+        return self.path + '.log'
+
+    def _log_max_bytes(self):
+        return getattr(settings, 'SEARCH_INDEX_LOG_MAX_BYTES', 4 * 1024 * 1024)
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        if fcntl is None:
+            # Không có flock (Windows): chỉ khóa trong process
+            yield
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + '.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def build(self):
+        index = SearchIndex()
+        for row in _product_rows(Product.objects.filter(is_available=True)).iterator(chunk_size=2000):
+            index.add(row['id'], _terms_for(row))
+        return index
+
+    def _write(self, path, data):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.search-index-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def save(self):
+        """
+        Ghi snapshot của index hiện tại và bắt đầu change log mới (rỗng).
+        Gọi khi đang giữ lock độc quyền.
+        """
+        self._write(self.path, self.index.dumps())
+        generation = uuid.uuid4().hex
+        header = json.dumps({'generation': generation}).encode() + b'\n'
+        self._write(self.log_path, header)
+        self._log_generation = generation
+        self._log_offset = len(header)
+
+    def load(self):
+        with open(self.path, 'rb') as f:
+            return SearchIndex.loads(f.read())
+
+    def _read_log(self):
+        """
+        Áp dụng các dòng change log chưa đọc vào self.index. Log đã được
+        compact (generation khác) thì trả về False để load lại snapshot.
+        """
+        try:
+            f = open(self.log_path, 'rb')
+        except FileNotFoundError:
+            return self._log_generation is None
+        with f:
+            header = f.readline()
+            try:
+                generation = json.loads(header)['generation']
+            except (ValueError, KeyError, TypeError):
+                raise ValueError('Not a search index log file')
+            if self._log_generation is None:
+                self._log_generation, self._log_offset = generation, len(header)
+            elif generation != self._log_generation:
+                return False
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Dòng ghi dở (process ghi bị dừng giữa chừng)
+                    break
+                doc_id, terms = json.loads(line)
+                if terms:
+                    self.index.add(doc_id, terms)
+                else:
+                    self.index.remove(doc_id)
+                self._log_offset += len(line)
+        return True
+
+    def _reload(self):
+        self._log_generation, self._log_offset = None, 0
+        self.index = self.load()
+        if not self._read_log():
+            # Compact xảy ra giữa lúc đọc snapshot và log
+            self._log_generation, self._log_offset = None, 0
+            self.index = self.load()
+            self._read_log()
+
+    def _catch_up(self):
+        # Gọi khi đang giữ lock file: áp dụng phần log còn thiếu
+        if self.index is None or not self._read_log():
+            self._reload()
+
+    def rebuild(self):
+        with self._lock, self._file_lock(exclusive=True):
+            self.index = self.build()
+            self.save()
+            self.version = bump_version(VERSION_KEY)
+            return len(self.index)
+
+    def ensure_current(self):
+        version = get_version(VERSION_KEY, create=True)
+        if self.index is not None and self.version == version:
+            return
+        with self._lock:
+            if self.index is not None and self.version == version:
+                return
+            try:
+                with self._file_lock(exclusive=False):
+                    self._catch_up()
+            except (OSError, ValueError):
+                # Chưa có file (hoặc file hỏng): build lại từ database
+                with self._file_lock(exclusive=True):
+                    self.index = self.build()
+                    self.save()
+            self.version = version
+
+    def search(self, query, limit=20):
+        self.ensure_current()
+        with self._lock:
+            return self.index.search(query, limit)
+
+    def reindex_products(self, product_ids):
+        """
+        Cập nhật index cho các sản phẩm (thêm / sửa / xóa): append phần thay
+        đổi vào change log (không ghi lại cả index) và báo cho các process
+        khác. Log lớn hơn SEARCH_INDEX_LOG_MAX_BYTES thì được compact vào
+        snapshot.
+        """
+        product_ids = set(product_ids)
+        if not product_ids:
+            return
+        self.ensure_current()
+        rows = {row['id']: row for row in _product_rows(Product.objects.filter(id__in=product_ids))}
+        changes = []
+        for product_id in sorted(product_ids):
+            row = rows.get(product_id)
+            terms = _terms_for(row) if row and row['is_available'] else None
+            changes.append([product_id, terms or None])
+        with self._lock, self._file_lock(exclusive=True):
+            # Process khác có thể vừa ghi: đọc tiếp log trước khi append
+            self._catch_up()
+            for product_id, terms in changes:
+                if terms:
+                    self.index.add(product_id, terms)
+                else:
+                    self.index.remove(product_id)
+            if self._log_generation is None or self._log_offset >= self._log_max_bytes():
+                # Chưa có log (file từ bản cũ) hoặc log quá lớn: ghi snapshot mới
+                self.save()
+            else:
+                data = b''.join(json.dumps(change, separators=(',', ':')).encode() + b'\n' for change in changes)
+                with open(self.log_path, 'ab') as f:
+                    f.write(data)
+                self._log_offset += len(data)
+            self.version = bump_version(VERSION_KEY)
+
+
+_engine = SearchEngine()
+
+
+def get_search_engine():
+    return _engine
+
+
+def reindex_products_on_commit(product_ids):
+    product_ids = [pid for pid in product_ids if pid is not None]
+    if product_ids:
+        transaction.on_commit(lambda: get_search_engine().reindex_products(product_ids))
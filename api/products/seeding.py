@@ -0,0 +1,273 @@
+# api/products/seeding.py
+
+import itertools
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+
+from .models import (
+    Brand, Category, Document, Notification, Product, ProductDocument, ProductRanking,
+    ProductVariant, Review, ReturnPolicy, ShippingInfo,
+)
+
+# Thứ tự con -> cha (dùng cho truncate)
+CATALOG_MODELS = [
+    ProductRanking, ProductDocument, Document, ProductVariant, Review,
+    ShippingInfo, ReturnPolicy, Notification, Product, Brand, Category,
+]
+
+NOUNS = [
+    "Phone", "Laptop", "Tablet", "Monitor", "Headphones", "Keyboard", "Mouse",
+    "Printer", "Watch", "Camera", "Speaker", "Router", "Charger", "SSD", "TV",
+]
+COLORS = ["Black", "White", "Silver", "Blue", "Red", "Gold", "Green"]
+SIZES = ["S", "M", "L", "XL", "64GB", "128GB", "256GB", "512GB"]
+
+
+def truncate_catalog():
+    """
+    Xóa toàn bộ dữ liệu catalog và reset auto increment, chạy được trên mọi
+    database (MySQL: TRUNCATE + tắt FOREIGN_KEY_CHECKS, SQLite: DELETE,...).
+    """
+    tables = [model._meta.db_table for model in CATALOG_MODELS]
+    connection.ops.execute_sql_flush(
+        connection.ops.sql_flush(no_style(), tables, reset_sequences=True)
+    )
+
+
+def _next_id(model):
+    return (model.objects.aggregate(max_id=models.Max('pk'))['max_id'] or 0) + 1
+
+
+def zipf_cum_weights(n, s):
+    """
+    Trọng số tích lũy của phân phối Zipf cho hạng 1..n (w = 1 / rank^s),
+    dùng với rng.choices(..., cum_weights=...) / bisect.
+    """
+    return list(itertools.accumulate(1 / rank ** s for rank in range(1, n + 1)))
+
+
+class CatalogSeeder:
+    """
+    Sinh catalog lớn, có thể lặp lại (cùng seed -> cùng dữ liệu) để load test:
+
+    - id được gán sẵn (không cần đọc lại id sau bulk_create, kể cả MySQL)
+    - mọi bảng ghi bằng bulk_create theo lô, mỗi lô một transaction
+    - độ phổ biến sản phẩm theo Zipf (sold, số review), category / brand
+      cũng theo Zipf nên có đuôi dài
+    - rating / num_reviews / rating_sum khớp với bảng reviews
+    """
+
+    def __init__(self, products=10000, categories=300, brands=50, users=1000,
+                 reviews_per_product=3.0, max_reviews_per_product=5000,
+                 variants_per_product=2, images_per_product=2, notifications_per_product=0.1,
+                 policies=True, zipf=1.1, batch_size=5000, seed=42, log=None):
+        self.products = products
+        self.categories = max(categories, 3)
+        self.brands = max(brands, 1)
+        self.users = max(users, 1)
+        self.reviews_per_product = reviews_per_product
+        self.max_reviews_per_product = max_reviews_per_product
+        self.variants_per_product = variants_per_product
+        self.images_per_product = images_per_product
+        self.notifications_per_product = notifications_per_product
+        self.policies = policies
+        self.zipf = zipf
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.log = log or (lambda message: None)
+        self.counts = {}
+        self.product_ids = range(0)
+
+    # ==========================
+    # Tiện ích
+    # ==========================
+    def _bulk_create(self, model, rows):
+        if rows:
+            model.objects.bulk_create(rows, batch_size=self.batch_size)
+            self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(rows)
+
+    def _ids(self, model, count):
+        start = _next_id(model)
+        return list(range(start, start + count))
+
+    # ==========================
+    # Bảng nhỏ: brand, category, user
+    # ==========================
+    def seed_brands(self):
+        ids = self._ids(Brand, self.brands)
+        self._bulk_create(Brand, [
+            Brand(id=bid, name=f"Brand {bid}", description=f"Seed brand {bid}") for bid in ids
+        ])
+        return ids
+
+    def seed_categories(self):
+        """
+        Cây 3 cấp: ~5% gốc, ~20% cấp 2, còn lại là lá. Path / depth tính
+        luôn từ id đã gán sẵn.
+        """
+        rng = self.rng
+        ids = self._ids(Category, self.categories)
+        n_roots = max(1, len(ids) // 20)
+        n_mid = max(1, len(ids) // 5)
+        roots, mids, leaves = ids[:n_roots], ids[n_roots:n_roots + n_mid], ids[n_roots + n_mid:]
+
+        rows, paths = [], {}
+        for level, (group, parents) in enumerate(((roots, None), (mids, roots), (leaves, mids))):
+            for cid in group:
+                parent_id = rng.choice(parents) if parents else None
+                path = f"{paths[parent_id] if parent_id else '/'}{cid}/"
+                paths[cid] = path
+                rows.append(Category(
+                    id=cid, name=f"Category {cid}", slug=f"seed-category-{cid}",
+                    parent_id=parent_id, path=path, depth=level,
+                ))
+        self._bulk_create(Category, rows)
+        # Sản phẩm gắn vào category cấp 2 và lá
+        return mids + leaves
+
+    def seed_users(self):
+        ids = self._ids(User, self.users)
+        self._bulk_create(User, [
+            # "!": mật khẩu không dùng được, tránh hash 1 lần / user
+            User(id=uid, username=f"seed_user_{uid}", email=f"seed_user_{uid}@example.com", password='!')
+            for uid in ids
+        ])
+        return ids
+
+    # ==========================
+    # Sản phẩm + bảng con
+    # ==========================
+    def _weighted(self, population):
+        # Zipf theo thứ tự ngẫu nhiên: vài phần tử rất lớn, đuôi dài
+        population = list(population)
+        self.rng.shuffle(population)
+        return population, zipf_cum_weights(len(population), self.zipf)
+
+    def _review_ratings(self, count):
+        rng = self.rng
+        quality = rng.uniform(2.5, 4.8)
+        return [min(5, max(1, round(rng.gauss(quality, 1.0)))) for _ in range(count)]
+
+    def seed_products(self, category_ids, brand_ids, user_ids):
+        rng = self.rng
+        n = self.products
+        categories, category_weights = self._weighted(category_ids)
+        brands, brand_weights = self._weighted(brand_ids)
+
+        # Hạng độ phổ biến của từng sản phẩm (1 = bán chạy nhất)
+        ranks = list(range(1, n + 1))
+        rng.shuffle(ranks)
+        harmonic = zipf_cum_weights(n, self.zipf)[-1] if n else 1
+        expected_reviews = self.reviews_per_product * n / harmonic
+
+        next_ids = {
+            model: _next_id(model)
+            for model in (Product, ProductVariant, Document, ProductDocument, Review,
+                          ShippingInfo, ReturnPolicy, Notification)
+        }
+
+        self.product_ids = range(next_ids[Product], next_ids[Product] + n)
+
+        def take_id(model):
+            value = next_ids[model]
+            next_ids[model] = value + 1
+            return value
+
+        started = time.monotonic()
+        for start in range(0, n, self.batch_size):
+            stop = min(start + self.batch_size, n)
+            size = stop - start
+            batch_categories = rng.choices(categories, cum_weights=category_weights, k=size)
+            batch_brands = rng.choices(brands, cum_weights=brand_weights, k=size)
+            rows = {model: [] for model in next_ids}
+
+            for offset in range(size):
+                i = start + offset
+                pid = take_id(Product)
+                weight = 1 / ranks[i] ** self.zipf
+
+                # Số review ~ Zipf (có phần lẻ ngẫu nhiên), có chặn trên
+                mean = expected_reviews * weight
+                count = min(self.max_reviews_per_product, int(mean) + (rng.random() < mean % 1))
+                ratings = self._review_ratings(count)
+                for rating in ratings:
+                    rows[Review].append(Review(
+                        id=take_id(Review), product_id=pid, user_id=rng.choice(user_ids), rating=rating,
+                    ))
+
+                price = Decimal(round(rng.lognormvariate(6, 0.8), 2)).quantize(Decimal('0.01'))
+                discount = (price * Decimal(rng.uniform(0.6, 0.95))).quantize(Decimal('0.01')) \
+                    if rng.random() < 0.2 else None
+                sold = int(100000 * weight) + rng.randint(0, 20)
+                rows[Product].append(Product(
+                    id=pid,
+                    name=f"Brand {batch_brands[offset]} {rng.choice(NOUNS)} {pid}",
+                    description=f"Seed product {pid}",
+                    price=price,
+                    discount_price=discount,
+                    brand_id=batch_brands[offset],
+                    category_id=batch_categories[offset],
+                    num_reviews=count,
+                    rating_sum=sum(ratings),
+                    rating=sum(ratings) / count if count else 0,
+                    sold=sold,
+                    is_available=rng.random() < 0.95,
+                    is_popular=ranks[i] <= max(1, n // 100),
+                    is_sale=discount is not None,
+                    is_best_sale=ranks[i] <= max(1, n // 200),
+                ))
+
+                for v in range(self.variants_per_product):
+                    color, size_name = rng.choice(COLORS), rng.choice(SIZES)
+                    rows[ProductVariant].append(ProductVariant(
+                        id=take_id(ProductVariant), product_id=pid, name=f"{color} - {size_name}",
+                        sku=f"SEED-{pid}-{v}", color=color, size=size_name,
+                        stock=rng.choice((0, rng.randint(1, 200))), price=price, discount_price=discount,
+                    ))
+                for j in range(self.images_per_product):
+                    did = take_id(Document)
+                    rows[Document].append(Document(
+                        id=did, title=f"Product {pid} image {j + 1}", type=Document.IMAGE,
+                        file=f"documents/seed/{pid}-{j}.jpg",
+                    ))
+                    rows[ProductDocument].append(ProductDocument(
+                        id=take_id(ProductDocument), product_id=pid, document_id=did, is_main=(j == 0),
+                    ))
+                if self.policies:
+                    rows[ShippingInfo].append(ShippingInfo(
+                        id=take_id(ShippingInfo), product_id=pid, info="Ships in 3-5 business days.",
+                    ))
+                    rows[ReturnPolicy].append(ReturnPolicy(
+                        id=take_id(ReturnPolicy), product_id=pid, policy_text="30-day return policy.",
+                    ))
+                if rng.random() < self.notifications_per_product:
+                    rows[Notification].append(Notification(
+                        id=take_id(Notification), product_id=pid, email=f"waiter{pid}@example.com",
+                    ))
+
+            with transaction.atomic():
+                # Bảng cha trước (Product, Document) rồi mới tới bảng tham chiếu
+                for model in (Product, Document, ProductDocument, ProductVariant, Review,
+                              ShippingInfo, ReturnPolicy, Notification):
+                    self._bulk_create(model, rows[model])
+
+            elapsed = time.monotonic() - started
+            self.log(f"{stop}/{n} products ({stop / elapsed:,.0f}/s)")
+
+    def run(self):
+        if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+            # Dữ liệu load test: không cần fsync từng transaction (PRAGMA không chạy được trong transaction)
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+        with transaction.atomic():
+            brand_ids = self.seed_brands()
+            category_ids = self.seed_categories()
+            user_ids = self.seed_users()
+        self.seed_products(category_ids, brand_ids, user_ids)
+        return self.counts
+
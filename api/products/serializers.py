@@ -1,28 +1,24 @@
+from django.db.models import Count, Prefetch
 from rest_framework import serializers
 from .models import (
     Category, Product, Brand,
     ProductVariant, Review, ShippingInfo, ReturnPolicy, ProductDocument
 )
-from urllib.parse import unquote
+from .rankings import RAIL_BY_TYPE
+from .fast_serializers import LATEST_REVIEWS, ProductFEFastSerializer
+from .media_urls import MediaURLResolver
 
 # ==========================
 # Helper: Chuẩn hóa URL
 # ==========================
 def get_valid_url(request, url):
-    if not url:
-        return None
-    url = unquote(url).strip()
-    if url.startswith('/'):
-        url = url[1:]
-    if url.startswith('https:/') and not url.startswith('https://'):
-        url = url.replace('https:/', 'https://', 1)
-    elif url.startswith('http:/') and not url.startswith('http://'):
-        url = url.replace('http:/', 'http://', 1)
-    if url.startswith('http://') or url.startswith('https://'):
-        return url
-    if request:
-        return request.build_absolute_uri(url)
-    return url
+    # Chuẩn hóa + build URL tuyệt đối có cache (xem api/products/media_urls.py)
+    return MediaURLResolver.for_request(request).resolve(url)
+
+
+def build_file_url(request, file):
+    # Như get_valid_url(request, file.url), storage.url(name) cũng được cache
+    return MediaURLResolver.for_request(request).file_url(file.name)
 
 # ==========================
 # Serializer Brand
@@ -47,12 +43,30 @@ class ProductFESerializer(serializers.ModelSerializer):
             'sold', 'brand', 'main_image'
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Nạp sẵn brand + ảnh chính cho cả trang sản phẩm:
+        1 query cho products (JOIN brands) + 1 query cho ảnh chính (JOIN documents).
+        """
+        return queryset.select_related('brand').prefetch_related(
+            Prefetch(
+                'documents',
+                queryset=ProductDocument.objects.filter(is_main=True)
+                .select_related('document')
+                .order_by('id'),
+                to_attr='main_documents',
+            )
+        )
+
     def get_main_image(self, obj):
-        main_doc = obj.documents.filter(is_main=True).first()
+        main_docs = getattr(obj, 'main_documents', None)
+        if main_docs is None:
+            main_doc = obj.documents.filter(is_main=True).first()
+        else:
+            main_doc = main_docs[0] if main_docs else None
         if main_doc and main_doc.document and main_doc.document.file:
-            url = main_doc.document.file.url
-            request = self.context.get('request')
-            return get_valid_url(request, url)
+            return build_file_url(self.context.get('request'), main_doc.document.file)
         return None
 
 
@@ -89,32 +103,51 @@ class CategoryParentFESerializer(serializers.ModelSerializer):
 # ==========================
 class ProductsByCategoryFESerializer(serializers.ModelSerializer):
     products = serializers.SerializerMethodField()
+    # Cursor trang sau / trang trước (None nếu không phân trang)
+    next = serializers.SerializerMethodField()
+    previous = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
-        fields = ['id', 'name', 'slug', 'products']
+        fields = ['id', 'name', 'slug', 'products', 'next', 'previous']
 
     def get_products(self, obj):
-        mode = getattr(self.context, 'mode', None) or self.context.get('mode', None)
+        mode = self.context.get('mode', None)
+        rail = RAIL_BY_TYPE.get(self.context.get('type', None))
+        paginator = self.context.get('paginator', None)
         limit = 6
 
-        if getattr(obj, 'id', 0) == 0:
-            if mode == 'popular':
-                products = Product.objects.filter(is_popular=True, is_available=True)[:limit]
-            elif mode == 'sale':
-                products = Product.objects.filter(is_sale=True, is_available=True)[:limit]
-            elif mode == 'best_seller':
-                products = Product.objects.filter(is_best_seller=True, is_available=True)[:limit]
-            else:
-                products = Product.objects.filter(is_available=True)[:limit]
+        # Đọc bằng values() và dựng dict trực tiếp (cùng output với ProductFESerializer)
+        fast = ProductFEFastSerializer(self.context.get('request'))
+
+        if rail:
+            # Bảng xếp hạng theo category đã bao gồm cả category con
+            category = obj if getattr(obj, 'id', 0) else None
+            products = fast.values(Product.get_ranked(rail, limit, category=category))
         else:
-            if mode == 'parent':
-                subcategories = obj.children.all()
-                products = Product.objects.filter(category__in=subcategories, is_available=True)[:limit]
+            if getattr(obj, 'id', 0) == 0:
+                products = Product.objects.filter(is_available=True)
+            elif mode == 'parent':
+                # Toàn bộ cây con (mọi cấp) bằng một range query trên categories.path
+                products = Product.objects.filter(obj.subtree_q('category__path'), is_available=True)
             else:
-                products = obj.products.filter(is_available=True)[:limit]
+                products = obj.products.filter(is_available=True)
 
-        return ProductFESerializer(products, many=True, context=self.context).data
+            if paginator is not None:
+                sort_keys = [name.lstrip('-') for name in paginator.ordering]
+                products = paginator.paginate_queryset(fast.values(products, *sort_keys))
+            else:
+                products = fast.values(products)[:limit]
+
+        return fast.serialize(products)
+
+    def get_next(self, obj):
+        paginator = self.context.get('paginator', None)
+        return paginator.next_cursor if paginator else None
+
+    def get_previous(self, obj):
+        paginator = self.context.get('paginator', None)
+        return paginator.previous_cursor if paginator else None
 
 
 # ======================================================
@@ -156,16 +189,16 @@ class ProductImageSerializer(serializers.ModelSerializer):
 
     def get_file_url(self, obj):
         if obj.document and obj.document.file:
-            request = self.context.get('request')
-            url = obj.document.file.url
-            return get_valid_url(request, url)
+            return build_file_url(self.context.get('request'), obj.document.file)
         return None
 
 
 class ProductDetailSerializer(serializers.ModelSerializer):
     brand = BrandSerializer()
     variants = ProductVariantSerializer(many=True)
-    reviews = ReviewSerializer(many=True)
+    # Chỉ N review mới nhất + thống kê; danh sách đầy đủ ở /api/products/<id>/reviews/
+    reviews = serializers.SerializerMethodField()
+    review_summary = serializers.SerializerMethodField()
     shipping_info = ShippingInfoSerializer(many=True)
     return_policy = ReturnPolicySerializer(many=True)
     main_image = serializers.SerializerMethodField()
@@ -176,24 +209,66 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'description', 'price', 'discount_price',
             'rating', 'num_reviews', 'is_available',
-            'brand', 'variants', 'reviews', 'shipping_info', 'return_policy',
+            'brand', 'variants', 'reviews', 'review_summary', 'shipping_info', 'return_policy',
             'main_image', 'other_images',
         ]
 
+    LATEST_REVIEWS = LATEST_REVIEWS
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Nạp toàn bộ dữ liệu liên quan của chi tiết sản phẩm với số query cố định.
+        """
+        return queryset.select_related('brand').prefetch_related(
+            'variants',
+            'shipping_info',
+            'return_policy',
+            Prefetch(
+                'reviews',
+                queryset=Review.objects.select_related('user').order_by('-created_at', '-id')[
+                    :ProductDetailSerializer.LATEST_REVIEWS
+                ],
+                to_attr='latest_reviews',
+            ),
+            Prefetch(
+                'documents',
+                queryset=ProductDocument.objects.select_related('document').order_by('id'),
+            ),
+        )
+
+    def get_reviews(self, obj):
+        reviews = getattr(obj, 'latest_reviews', None)
+        if reviews is None:
+            reviews = obj.reviews.select_related('user').order_by('-created_at', '-id')[:self.LATEST_REVIEWS]
+        return ReviewSerializer(reviews, many=True, context=self.context).data
+
+    def get_review_summary(self, obj):
+        # 1 query GROUP BY rating trên index (product, rating)
+        counts = dict(
+            Review.objects.filter(product=obj).order_by()
+            .values_list('rating').annotate(count=Count('id'))
+        )
+        return {
+            'count': obj.num_reviews,
+            'average': round(obj.rating, 2),
+            'histogram': {str(star): counts.get(star, 0) for star in range(1, 6)},
+        }
+
+    def _documents(self, obj):
+        # Dùng chung 1 lần prefetch cho cả ảnh chính và ảnh phụ
+        return [d for d in obj.documents.all() if d.document and d.document.file]
+
     def get_main_image(self, obj):
-        main = obj.documents.filter(is_main=True).first()
-        if main and main.document and main.document.file:
-            url = main.document.file.url
-            request = self.context.get('request')
-            return get_valid_url(request, url)
+        main = next((d for d in self._documents(obj) if d.is_main), None)
+        if main:
+            return build_file_url(self.context.get('request'), main.document.file)
         return None
 
     def get_other_images(self, obj):
-        images = obj.documents.filter(is_main=False)
         request = self.context.get('request')
-        urls = []
-        for img in images:
-            if img.document and img.document.file:
-                url = img.document.file.url
-                urls.append(get_valid_url(request, url))
-        return urls
+        return [
+            build_file_url(request, img.document.file)
+            for img in self._documents(obj)
+            if not img.is_main
+        ]
@@ -0,0 +1,197 @@
+# api/products/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import cache_tags
+from .category_tree import invalidate_category_tree
+from .conditional import bump_catalog_version
+from .detail_cache import invalidate_products
+from .facets import get_facet_engine, update_facets_on_commit
+from .review_stats import review_deleted, review_saved
+from .back_in_stock import variant_saved
+from .search import reindex_products_on_commit
+from .models import (
+    Brand, Category, Document, Product, ProductDocument, ProductVariant,
+    Review, ReturnPolicy, ShippingInfo,
+)
+
+
+def _invalidate_products_on_commit(product_ids):
+    # Tăng version sau khi commit: tránh việc request khác build lại cache
+    # từ dữ liệu cũ trong lúc transaction chưa commit.
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: invalidate_products(product_ids))
+
+
+# ==========================
+# Product detail document
+# ==========================
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_detail(sender, instance, **kwargs):
+    _invalidate_products_on_commit([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=ProductVariant)
+@receiver([post_save, post_delete], sender=Review)
+@receiver([post_save, post_delete], sender=ProductDocument)
+@receiver([post_save, post_delete], sender=ShippingInfo)
+@receiver([post_save, post_delete], sender=ReturnPolicy)
+def invalidate_product_detail_related(sender, instance, **kwargs):
+    _invalidate_products_on_commit([instance.product_id])
+
+
+# pre_delete: sau khi xóa, products.brand_id đã bị SET_NULL
+@receiver([post_save, pre_delete], sender=Brand)
+def invalidate_brand_products(sender, instance, **kwargs):
+    _invalidate_products_on_commit(
+        Product.objects.filter(brand_id=instance.pk).values_list('id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Document)
+def invalidate_document_products(sender, instance, **kwargs):
+    _invalidate_products_on_commit(
+        ProductDocument.objects.filter(document_id=instance.pk).values_list('product_id', flat=True)
+    )
+
+
+# ==========================
+# Category tree
+# ==========================
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_categories(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_category_tree)
+
+
+@receiver(post_delete, sender=Category)
+def reroot_deleted_category_subtree(sender, instance, **kwargs):
+    # Các category con đã bị SET_NULL parent -> trở thành gốc, cập nhật path cả cây con
+    if instance.path:
+        Category.move_subtree(instance.path, '/', -(instance.depth + 1))
+
+
+# ==========================
+# Search index
+# ==========================
+@receiver([post_save, post_delete], sender=Product)
+def reindex_product(sender, instance, **kwargs):
+    reindex_products_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Brand)
+@receiver(pre_delete, sender=Brand)
+def reindex_brand_products(sender, instance, **kwargs):
+    reindex_products_on_commit(Product.objects.filter(brand_id=instance.pk).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def reindex_category_products(sender, instance, **kwargs):
+    reindex_products_on_commit(Product.objects.filter(category_id=instance.pk).values_list('id', flat=True))
+
+
+# ==========================
+# Facets
+# ==========================
+@receiver([post_save, post_delete], sender=Product)
+def update_product_facets(sender, instance, **kwargs):
+    update_facets_on_commit([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=ProductVariant)
+def update_variant_facets(sender, instance, **kwargs):
+    update_facets_on_commit([instance.product_id])
+
+
+@receiver([post_save, post_delete], sender=Brand)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_facets(sender, instance, **kwargs):
+    transaction.on_commit(get_facet_engine().invalidate)
+
+
+# ==========================
+# Tổng hợp rating / num_reviews
+# ==========================
+@receiver(post_save, sender=Review)
+def update_review_aggregates_on_save(sender, instance, created, raw=False, **kwargs):
+    # raw: loaddata, số liệu tổng hợp đi kèm fixture của Product
+    if not raw:
+        review_saved(instance, created)
+
+
+@receiver(post_delete, sender=Review)
+def update_review_aggregates_on_delete(sender, instance, **kwargs):
+    review_deleted(instance)
+
+
+# ==========================
+# Thông báo có hàng trở lại
+# ==========================
+@receiver(post_save, sender=ProductVariant)
+def notify_back_in_stock(sender, instance, raw=False, **kwargs):
+    if not raw:
+        variant_saved(instance)
+
+
+# ==========================
+# Conditional GET: version của listing
+# ==========================
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductDocument)
+@receiver([post_save, post_delete], sender=Document)
+@receiver([post_save, post_delete], sender=Brand)
+def bump_listing_version(sender, instance, **kwargs):
+    # Category: bump cùng lúc với cây category (invalidate_category_tree)
+    transaction.on_commit(bump_catalog_version)
+
+
+# ==========================
+# Response cache: invalidate theo tag
+# ==========================
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_responses(sender, instance, **kwargs):
+    # Listing của category chứa sản phẩm (cả category cũ nếu vừa chuyển) và mọi
+    # category tổ tiên (listing theo parent); path lấy từ bảng categories
+    category_ids = {instance.loaded_category_id, instance.category_id} - {None}
+    instance.loaded_category_id = instance.category_id
+    paths = Category.objects.filter(pk__in=category_ids).values_list('path', flat=True) if category_ids else []
+    cache_tags.invalidate_products(
+        [instance.pk], cache_tags.PRODUCTS,
+        *(tag for path in paths for tag in cache_tags.category_path_tags(path)),
+    )
+
+
+@receiver([post_save, post_delete], sender=ProductVariant)
+def invalidate_variant_responses(sender, instance, **kwargs):
+    # Màu / size: facet
+    cache_tags.invalidate_products([instance.product_id], cache_tags.PRODUCTS)
+
+
+@receiver([post_save, post_delete], sender=Review)
+@receiver([post_save, post_delete], sender=ProductDocument)
+@receiver([post_save, post_delete], sender=ShippingInfo)
+@receiver([post_save, post_delete], sender=ReturnPolicy)
+def invalidate_related_responses(sender, instance, **kwargs):
+    cache_tags.invalidate_products([instance.product_id])
+
+
+@receiver(post_save, sender=Document)
+def invalidate_document_responses(sender, instance, **kwargs):
+    cache_tags.invalidate_products(
+        ProductDocument.objects.filter(document_id=instance.pk).values_list('product_id', flat=True)
+    )
+
+
+@receiver([post_save, pre_delete], sender=Brand)
+def invalidate_brand_responses(sender, instance, **kwargs):
+    cache_tags.invalidate_products(
+        Product.objects.filter(brand_id=instance.pk).values_list('id', flat=True), cache_tags.BRANDS
+    )
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_responses(sender, instance, **kwargs):
+    # Đổi tên / thêm / xóa: listing của chính nó và các category tổ tiên
+    cache_tags.invalidate_products([], *cache_tags.category_path_tags(instance.path))
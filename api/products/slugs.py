@@ -0,0 +1,53 @@
+# api/products/slugs.py
+
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.utils.text import slugify
+
+# Số prefix tối đa mỗi query
+PREFIX_CHUNK_SIZE = 300
+
+
+def allocate_slugs(names, model=None, field='slug', fallback='category', reserved=()):
+    """
+    Cấp slug duy nhất cho cả một lô tên chỉ với 1 query prefix (mỗi
+    PREFIX_CHUNK_SIZE tên gốc khác nhau):
+    lấy mọi slug đang có bắt đầu bằng các slug gốc, rồi đánh số trong bộ nhớ
+    ("laptops", "laptops-1", "laptops-2", ...), kể cả khi trùng nhau trong lô.
+
+    `reserved`: slug đã được dành cho dòng khác (chưa có trong database),
+    ví dụ slug khai báo sẵn trong cùng lô import.
+
+    Trả về list slug theo đúng thứ tự `names`.
+    """
+    if model is None:
+        from .models import Category
+        model = Category
+
+    bases = [slugify(name) or fallback for name in names]
+    if not bases:
+        return []
+
+    # Chia nhỏ điều kiện OR: SQLite giới hạn độ sâu cây biểu thức (1000)
+    unique_bases = sorted(set(bases))
+    taken = set(reserved)
+    for start in range(0, len(unique_bases), PREFIX_CHUNK_SIZE):
+        prefixes = reduce(
+            or_, (Q(**{f"{field}__startswith": base}) for base in unique_bases[start:start + PREFIX_CHUNK_SIZE])
+        )
+        taken.update(model.objects.filter(prefixes).values_list(field, flat=True))
+
+    slugs = []
+    next_counter = {}
+    for base in bases:
+        slug = base
+        counter = next_counter.get(base, 1)
+        while slug in taken:
+            slug = f"{base}-{counter}"
+            counter += 1
+        next_counter[base] = counter
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
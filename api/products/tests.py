@@ -0,0 +1,1589 @@
+import base64
+import io
+import json
+import os
+import smtplib
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection, connections
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import include, path
+from django.utils.http import http_date
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import AccessToken
+from utils.async_db import _with_connection
+from utils.profiling import SamplingProfilerMiddleware, _frame_label
+from utils.request_metrics import RequestMetricsMiddleware, fingerprint
+from utils.response_cache import ResponseCacheMiddleware, invalidate_tags, tag_response
+from django.urls import reverse
+
+from .serializers import CategoryParentFESerializer, ProductDetailSerializer, ProductFESerializer
+
+from api.jobs.models import Job
+from api.jobs.queue import claim_jobs, run_job
+from . import async_views, cache_tags
+from .back_in_stock import BACK_IN_STOCK_JOB, fan_out_back_in_stock
+from .category_import import import_category_tree
+from .detail_cache import get_product_document, invalidate_all_products, version_key
+from .category_tree import get_category_tree, rebuild_category_paths
+from .conditional import CATALOG_MODIFIED_KEY
+from .models import (
+    Brand, Category, Document, Notification, Product, ProductDocument, ProductRanking,
+    ProductVariant, Review, ReturnPolicy, ShippingInfo,
+)
+from .query_plans import FULL_SCAN, QueryShape, check_query_plans, seed_plan_dataset
+from .facets import BRAND, COLOR, FacetEngine, FacetIndex, get_facet_engine
+from .media_urls import MediaURLResolver, normalize_url
+from .fast_serializers import ProductDetailFastSerializer, ProductFEFastSerializer
+from .rankings import refresh_rankings
+from .review_stats import recompute_review_aggregates
+from .seeding import CatalogSeeder, truncate_catalog
+from .search import SearchEngine, SearchIndex, get_search_engine, tokenize
+from .slugs import allocate_slugs
+
+
+def clear_caches():
+    # default (version, document) + responses (response cache)
+    for backend in caches.all():
+        backend.clear()
+
+
+def make_cursor(payload):
+    # Cursor tự dựng (cùng định dạng KeysetPagination.encode_cursor)
+    raw = json.dumps(payload).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+class TempSearchIndexMixin:
+    """
+    Ghi file index tìm kiếm vào thư mục tạm thay vì SEARCH_INDEX_PATH thật.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._search_dir = tempfile.mkdtemp()
+        cls._search_settings = override_settings(SEARCH_INDEX_PATH=f"{cls._search_dir}/index.bin")
+        cls._search_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._search_settings.disable()
+        shutil.rmtree(cls._search_dir, ignore_errors=True)
+
+
+def create_product(category, brand, name, with_image=True):
+    product = Product.objects.create(
+        name=name,
+        description=f"Description for {name}",
+        price=100,
+        brand=brand,
+        category=category,
+    )
+    if with_image:
+        for j in range(2):
+            doc = Document.objects.create(
+                title=f"{name} Image {j + 1}",
+                type=Document.IMAGE,
+                file=f"https://example.com/{name}-{j}.png",
+            )
+            ProductDocument.objects.create(product=product, document=doc, is_main=(j == 0))
+    return product
+
+
+# ==========================
+# Listing: số query cố định theo trang
+# ==========================
+class ProductListingQueryBudgetTests(TestCase):
+    # 1 query category + 1 query products (JOIN brand) + 1 query ảnh chính
+    CATEGORY_QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="Apple")
+        cls.parent = Category.objects.create(name="Phones")
+        cls.small = Category.objects.create(name="iPhones", parent=cls.parent)
+        cls.large = Category.objects.create(name="Android Phones", parent=cls.parent)
+        create_product(cls.small, cls.brand, "small-0")
+        for i in range(6):
+            create_product(cls.large, cls.brand, f"large-{i}", with_image=(i % 2 == 0))
+
+    def get_products(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['products']
+
+    def test_category_products_query_budget_is_constant(self):
+        with self.assertNumQueries(self.CATEGORY_QUERIES):
+            small = self.get_products(reverse('category-products', args=[self.small.id]))
+        with self.assertNumQueries(self.CATEGORY_QUERIES):
+            large = self.get_products(reverse('category-products', args=[self.large.id]))
+        self.assertEqual(len(small), 1)
+        self.assertEqual(len(large), 6)
+
+    def test_parent_category_products_query_budget(self):
+        with self.assertNumQueries(self.CATEGORY_QUERIES):
+            products = self.get_products(reverse('parent-category-products', args=[self.parent.id]))
+        self.assertEqual(len(products), 6)
+
+    def test_listing_resolves_brand_and_main_image(self):
+        products = self.get_products(reverse('category-products', args=[self.large.id]))
+        by_name = {p['name']: p for p in products}
+        self.assertEqual(by_name['large-0']['brand']['name'], "Apple")
+        self.assertEqual(by_name['large-0']['main_image'], "https://example.com/large-0-0.png")
+        self.assertIsNone(by_name['large-1']['main_image'])
+
+
+# ==========================
+# Chi tiết sản phẩm: document build sẵn + invalidation
+# ==========================
+class ProductDetailDocumentTests(TempSearchIndexMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="Sony")
+        cls.category = Category.objects.create(name="Headphones")
+        cls.product = create_product(cls.category, cls.brand, "wh-1000xm5")
+        cls.user = User.objects.create_user(username="reviewer", password="x")
+
+    def setUp(self):
+        clear_caches()
+        self.url = reverse('product-detail', args=[self.product.id])
+
+    def test_second_hit_is_served_without_queries(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first.content, second.content)
+        data = second.json()
+        self.assertEqual(data['brand']['name'], "Sony")
+        self.assertEqual(data['main_image'], "https://example.com/wh-1000xm5-0.png")
+        self.assertEqual(data['other_images'], ["https://example.com/wh-1000xm5-1.png"])
+
+    def test_related_changes_rebuild_document(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(product=self.product, user=self.user, rating=5, comment="Great")
+        self.assertEqual(len(self.client.get(self.url).json()['reviews']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductVariant.objects.create(product=self.product, name="Black", stock=3)
+        self.assertEqual(self.client.get(self.url).json()['variants'][0]['name'], "Black")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brand.name = "Sony Group"
+            self.brand.save()
+        self.assertEqual(self.client.get(self.url).json()['brand']['name'], "Sony Group")
+
+    def test_etag_depends_on_origin(self):
+        first = self.client.get(self.url)
+        # Cùng version nhưng host khác: URL ảnh tuyệt đối khác, không được 304
+        other = self.client.get(self.url, HTTP_HOST='cdn.example.com', HTTP_IF_NONE_MATCH=first.headers['ETag'])
+        self.assertEqual(other.status_code, 200)
+        self.assertNotEqual(other.headers['ETag'], first.headers['ETag'])
+
+    def test_change_in_other_process_rebuilds_document(self):
+        get_product_document(self.product.id)
+        Product.objects.filter(pk=self.product.pk).update(name="WH-1000XM6")
+        # Process khác bump version: chỉ cache version dùng chung thay đổi
+        other_process = caches.create_connection(settings.CACHE_VERSIONS_ALIAS)
+        other_process.set(f"version:{version_key(self.product.id)}", 1, timeout=None)
+        self.assertIn(b'"WH-1000XM6"', get_product_document(self.product.id)['body'])
+
+    def test_missing_product_creates_no_version_key(self):
+        self.assertEqual(self.client.get(reverse('product-detail', args=[999999])).status_code, 404)
+        self.assertIsNone(caches[settings.CACHE_VERSIONS_ALIAS].get(f"version:{version_key(999999)}"))
+
+    def test_invalidate_all_products_rebuilds_documents(self):
+        first = self.client.get(self.url)
+        # Như seed --flush: dữ liệu thay toàn bộ, không có signal theo từng sản phẩm
+        Product.objects.filter(pk=self.product.pk).update(name="WH-1000XM6")
+        invalidate_all_products()
+        invalidate_tags([cache_tags.DETAILS])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first.headers['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], "WH-1000XM6")
+
+    def test_unavailable_product_is_not_found(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.is_available = False
+            self.product.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+# ==========================
+# Cây category + ETag
+# ==========================
+class CategoryParentsTreeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.laptops = Category.objects.create(name="Laptops")
+        cls.phones = Category.objects.create(name="Phones")
+        for name in ["Gaming Laptops", "Ultrabooks"]:
+            Category.objects.create(name=name, parent=cls.laptops)
+        Category.objects.create(name="iPhones", parent=cls.phones)
+
+    def setUp(self):
+        clear_caches()
+        self.url = reverse('category-parents')
+
+    def test_payload_matches_serializer(self):
+        expected = CategoryParentFESerializer(
+            Category.objects.filter(parent=None).order_by('id'), many=True
+        ).data
+        self.assertEqual(self.client.get(self.url).json(), expected)
+
+    def test_tree_is_loaded_once_per_version(self):
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_etag_returns_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Tablets")
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+        self.assertEqual(len(changed.json()), 3)
+
+    def test_change_in_other_process_reloads_tree(self):
+        get_category_tree()
+        Category.objects.filter(pk=self.phones.pk).update(name="Smartphones")
+        other_process = caches.create_connection(settings.CACHE_VERSIONS_ALIAS)
+        other_process.incr('version:category-tree')
+        self.assertEqual(get_category_tree().nodes[self.phones.id]['name'], "Smartphones")
+
+    def test_descendant_ids(self):
+        tree = get_category_tree()
+        child = tree.get_children(self.laptops.id)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            grandchild = Category.objects.create(name="RTX Laptops", parent_id=child['id'])
+        tree = get_category_tree()
+        self.assertIn(grandchild.id, tree.get_descendant_ids(self.laptops.id))
+
+
+# ==========================
+# Bảng xếp hạng popular / sale / best sale
+# ==========================
+class ProductRankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="Dell")
+        cls.parent = Category.objects.create(name="Computers")
+        cls.laptops = Category.objects.create(name="Laptops", parent=cls.parent)
+        cls.monitors = Category.objects.create(name="Monitors", parent=cls.parent)
+        cls.products = []
+        for i in range(8):
+            product = create_product(cls.laptops if i % 2 else cls.monitors, cls.brand, f"p{i}")
+            product.sold = i * 10
+            product.rating = 5 - i * 0.5
+            # rating là cột tổng hợp review: save() mặc định không ghi đè
+            product.save(update_fields=['sold', 'rating', 'updated_at'])
+            cls.products.append(product)
+
+    def test_classmethods_read_rankings(self):
+        self.assertEqual(list(Product.get_best_sale(limit=3)), [])
+        refresh_rankings()
+        self.assertEqual(
+            [p.name for p in Product.get_best_sale(limit=3)], ["p7", "p6", "p5"]
+        )
+        self.assertEqual(
+            [p.name for p in Product.get_popular(limit=2, category=self.laptops)], ["p1", "p3"]
+        )
+        with self.assertNumQueries(1):
+            list(Product.get_popular(limit=5, category=self.parent))
+
+    def test_incremental_refresh_only_touches_changed_scopes(self):
+        refresh_rankings()
+        self.assertEqual(refresh_rankings(), 0)
+
+        product = self.products[0]
+        product.sold = 1000
+        product.save()
+        # Toàn cục + Monitors + Computers
+        self.assertEqual(refresh_rankings(), 3)
+        self.assertEqual(Product.get_best_sale(limit=1)[0], product)
+        self.assertEqual(Product.get_best_sale(limit=1, category=self.monitors)[0], product)
+
+    def test_incremental_refresh_sees_review_changes(self):
+        refresh_rankings()
+        user = User.objects.create_user(username="reviewer", password="x")
+        updated_at = Product.objects.get(pk=self.products[7].pk).updated_at
+        review = Review.objects.create(product=self.products[7], user=user, rating=5)
+        # updated_at (khóa sort của SALE / sort=newest) không đổi theo review
+        self.assertEqual(Product.objects.get(pk=self.products[7].pk).updated_at, updated_at)
+        # Toàn cục + Laptops + Computers
+        self.assertEqual(refresh_rankings(), 3)
+        self.assertEqual(Product.get_popular(limit=1)[0], self.products[7])
+        review.delete()
+        self.assertEqual(refresh_rankings(), 3)
+        self.assertEqual(Product.get_popular(limit=1)[0], self.products[0])
+
+    def test_rail_endpoint_uses_rankings(self):
+        refresh_rankings()
+        response = self.client.get(reverse('category-products', args=[0]), {'type': 'best_seller'})
+        self.assertEqual(
+            [p['name'] for p in response.json()['products']],
+            ["p7", "p6", "p5", "p4", "p3", "p2"],
+        )
+        response = self.client.get(reverse('parent-category-products', args=[self.parent.id]), {'type': 'popular'})
+        self.assertEqual(response.json()['products'][0]['name'], "p0")
+        self.assertEqual(
+            ProductRanking.objects.filter(category=None, rail=ProductRanking.SALE).count(), 0
+        )
+
+
+# ==========================
+# Query plan: không full scan / filesort ngoài dự kiến
+# ==========================
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_plan_dataset(products=3000, categories=200, batch_size=1000)
+
+    def test_catalog_query_plans_use_indexes(self):
+        failed = {r.name: r.plan for r in check_query_plans() if not r.ok}
+        self.assertEqual(failed, {})
+
+    def test_unindexed_query_is_reported(self):
+        shape = QueryShape('by_description', lambda ctx: Product.objects.filter(description='x'))
+        result = check_query_plans([shape])[0]
+        self.assertFalse(result.ok)
+        self.assertIn(FULL_SCAN, result.regressions)
+
+
+# ==========================
+# Phân trang keyset
+# ==========================
+class CategoryKeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="Asus")
+        cls.parent = Category.objects.create(name="Computers")
+        cls.category = Category.objects.create(name="Laptops", parent=cls.parent)
+        for i in range(7):
+            product = create_product(cls.category, cls.brand, f"laptop-{i}")
+            # Cố ý trùng `sold` để kiểm tra khóa phụ id
+            product.sold = (i // 2) * 10
+            product.save()
+
+    def walk(self, url, **params):
+        pages, cursor = [], None
+        while True:
+            query = dict(params, page_size=2, **({'cursor': cursor} if cursor else {}))
+            data = self.client.get(url, query).json()
+            pages.append(data)
+            cursor = data['next']
+            if not cursor:
+                return pages
+
+    def test_walks_every_product_once_in_order(self):
+        url = reverse('category-products', args=[self.category.id])
+        pages = self.walk(url)
+        self.assertEqual(len(pages), 4)
+        ids = [p['id'] for page in pages for p in page['products']]
+        expected = list(
+            Product.objects.filter(category=self.category).order_by('-sold', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertIsNone(pages[0]['previous'])
+
+        newest = [p['id'] for page in self.walk(url, sort='newest') for p in page['products']]
+        self.assertEqual(sorted(newest), sorted(expected))
+
+    def test_previous_cursor_returns_previous_page(self):
+        url = reverse('parent-category-products', args=[self.parent.id])
+        first = self.client.get(url, {'page_size': 3}).json()
+        second = self.client.get(url, {'page_size': 3, 'cursor': first['next']}).json()
+        back = self.client.get(url, {'page_size': 3, 'cursor': second['previous']}).json()
+        self.assertEqual(back['products'], first['products'])
+        self.assertIsNone(back['previous'])
+
+    def test_deep_page_costs_the_same_as_first_page(self):
+        url = reverse('category-products', args=[self.category.id])
+        first = self.client.get(url, {'page_size': 2}).json()
+        with self.assertNumQueries(3):
+            self.client.get(url, {'page_size': 2, 'cursor': first['next']})
+
+    def test_invalid_cursor(self):
+        url = reverse('category-products', args=[self.category.id])
+        self.assertEqual(self.client.get(url, {'cursor': 'not-a-cursor'}).status_code, 404)
+        first = self.client.get(url, {'page_size': 2}).json()
+        response = self.client.get(url, {'cursor': first['next'], 'sort': 'newest'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_malformed_cursor_values(self):
+        url = reverse('category-products', args=[self.category.id])
+        for sort, values in [
+            ('best_seller', ['abc', 1]),
+            ('best_seller', [None, 1]),
+            ('best_seller', [10]),
+            ('best_seller', [[1], 1]),
+            ('newest', ['not-a-date', 1]),
+            ('newest', ['2024-01-01T00:00:00', 'x']),
+        ]:
+            with self.subTest(sort=sort, values=values):
+                cursor = make_cursor({'s': sort, 'v': values, 'r': 0})
+                response = self.client.get(url, {'cursor': cursor, 'sort': sort})
+                self.assertEqual(response.status_code, 404)
+        cursor = make_cursor({'s': 'best_seller', 'v': {'a': 1}, 'r': 0})
+        self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 404)
+
+
+# ==========================
+# Materialized path của category
+# ==========================
+class CategoryPathTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.root = Category.objects.create(name="Electronics")
+        cls.computers = Category.objects.create(name="Computers", parent=cls.root)
+        cls.laptops = Category.objects.create(name="Laptops", parent=cls.computers)
+        cls.gaming = Category.objects.create(name="Gaming Laptops", parent=cls.laptops)
+        cls.other = Category.objects.create(name="Home")
+
+    def refresh(self, *categories):
+        for category in categories:
+            category.refresh_from_db()
+
+    def test_path_and_depth_on_create(self):
+        self.assertEqual(self.gaming.path, f"/{self.root.id}/{self.computers.id}/{self.laptops.id}/{self.gaming.id}/")
+        self.assertEqual(self.gaming.depth, 3)
+        subtree = Category.objects.filter(self.computers.subtree_q()).order_by('depth')
+        self.assertEqual(list(subtree), [self.computers, self.laptops, self.gaming])
+
+    def test_move_updates_whole_subtree(self):
+        self.computers.parent = self.other
+        self.computers.save()
+        self.refresh(self.gaming)
+        self.assertEqual(self.gaming.path, f"/{self.other.id}/{self.computers.id}/{self.laptops.id}/{self.gaming.id}/")
+        self.assertEqual(self.gaming.depth, 3)
+        self.assertFalse(Category.objects.filter(self.root.subtree_q()).exclude(pk=self.root.pk).exists())
+
+    def test_cannot_move_under_own_subtree(self):
+        self.computers.parent = self.gaming
+        with self.assertRaises(ValueError):
+            self.computers.save()
+
+    def test_delete_reroots_children(self):
+        self.computers.delete()
+        self.refresh(self.laptops, self.gaming)
+        self.assertIsNone(self.laptops.parent_id)
+        self.assertEqual(self.laptops.path, f"/{self.laptops.id}/")
+        self.assertEqual(self.gaming.path, f"/{self.laptops.id}/{self.gaming.id}/")
+        self.assertEqual(self.gaming.depth, 1)
+
+    def test_rebuild_repairs_paths(self):
+        Category.objects.update(path='', depth=0)
+        self.assertEqual(rebuild_category_paths(), 5)
+        self.refresh(self.gaming)
+        self.assertEqual(self.gaming.depth, 3)
+        self.assertEqual(rebuild_category_paths(), 0)
+
+    def test_parent_products_include_every_depth(self):
+        brand = Brand.objects.create(name="MSI")
+        create_product(self.gaming, brand, "deep")
+        create_product(self.computers, brand, "shallow")
+        create_product(self.other, brand, "elsewhere")
+        response = self.client.get(reverse('parent-category-products', args=[self.root.id]))
+        self.assertEqual(sorted(p['name'] for p in response.json()['products']), ["deep", "shallow"])
+
+
+# ==========================
+# Cấp slug theo lô + import category
+# ==========================
+class BulkCategoryImportTests(TestCase):
+    def test_allocate_slugs_uses_one_query(self):
+        Category.objects.create(name="Laptops")
+        Category.objects.create(name="Laptops")
+        with self.assertNumQueries(1):
+            slugs = allocate_slugs(["Laptops", "Laptops", "Phones", "Phones", "Laptop"])
+        self.assertEqual(slugs, ["laptops-2", "laptops-3", "phones", "phones-1", "laptop"])
+
+    def test_allocate_slugs_for_many_distinct_names(self):
+        # Quá nhiều điều kiện OR trong 1 query: SQLite "Expression tree is too large"
+        Category.objects.create(name="Name 7")
+        names = [f"Name {i}" for i in range(1200)]
+        with self.assertNumQueries(4):
+            slugs = allocate_slugs(names)
+        self.assertEqual(len(set(slugs)), 1200)
+        self.assertEqual(slugs[7], "name-7-1")
+
+    def test_import_tree_with_constant_queries_per_level(self):
+        nodes = [
+            {"name": f"Root {i}", "children": [
+                {"name": "Accessories", "children": [{"name": "Cables"}]} for _ in range(3)
+            ]}
+            for i in range(4)
+        ]
+        # 3 cấp, mỗi cấp: cấp slug + INSERT + UPDATE path; cộng SAVEPOINT/RELEASE
+        with self.assertNumQueries(3 * 3 + 2):
+            created = import_category_tree(nodes, batch_size=100)
+        self.assertEqual(created, 4 + 12 + 12)
+        self.assertEqual(Category.objects.filter(slug__startswith="accessories").count(), 12)
+
+        cable = Category.objects.filter(name="Cables").select_related('parent__parent').first()
+        self.assertEqual(cable.depth, 2)
+        self.assertEqual(
+            cable.path, f"/{cable.parent.parent_id}/{cable.parent_id}/{cable.id}/"
+        )
+        self.assertEqual(rebuild_category_paths(), 0)
+
+    def test_import_under_existing_parent(self):
+        parent = Category.objects.create(name="Electronics")
+        import_category_tree([{"name": "TVs", "slug": "tv"}], parent=parent)
+        tv = Category.objects.get(slug="tv")
+        self.assertEqual(tv.parent, parent)
+        self.assertEqual(tv.path, f"{parent.path}{tv.id}/")
+
+    def test_explicit_slugs_are_reserved(self):
+        created = import_category_tree([
+            {"name": "Laptops", "slug": "laptops"},
+            {"name": "Laptops"},
+            {"name": "Phones", "children": [{"name": "Cases", "slug": "phones"}]},
+        ])
+        self.assertEqual(created, 4)
+        self.assertEqual(
+            sorted(Category.objects.values_list('name', 'slug')),
+            [("Cases", "phones"), ("Laptops", "laptops"), ("Laptops", "laptops-1"), ("Phones", "phones-1")],
+        )
+
+    def test_duplicate_explicit_slugs_are_rejected(self):
+        with self.assertRaisesMessage(ValueError, "Duplicate slug in import: tv"):
+            import_category_tree([{"name": "TV", "slug": "tv"}, {"name": "B", "children": [{"name": "T", "slug": "tv"}]}])
+        Category.objects.create(name="Audio", slug="audio")
+        with self.assertRaisesMessage(ValueError, "Slug already exists: audio"):
+            import_category_tree([{"name": "Sound", "slug": "audio"}])
+        self.assertEqual(Category.objects.count(), 1)
+
+
+# ==========================
+# Tìm kiếm BM25
+# ==========================
+class ProductSearchTests(TempSearchIndexMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.apple = Brand.objects.create(name="Apple")
+        cls.samsung = Brand.objects.create(name="Samsung")
+        cls.phones = Category.objects.create(name="Điện thoại")
+        cls.laptops = Category.objects.create(name="Laptops")
+        cls.iphone = create_product(cls.phones, cls.apple, "iPhone 15 Pro")
+        cls.galaxy = create_product(cls.phones, cls.samsung, "Galaxy S23 Ultra")
+        cls.macbook = create_product(cls.laptops, cls.apple, "MacBook Pro 16")
+        cls.macbook.description = "Laptop mạnh mẽ, pin trâu, tốt hơn iPhone để làm việc"
+        cls.macbook.save()
+
+    def setUp(self):
+        clear_caches()
+        self.url = reverse('product-search')
+
+    def search(self, q):
+        return [p['name'] for p in self.client.get(self.url, {'q': q}).json()['results']]
+
+    def test_tokenize_ignores_vietnamese_diacritics(self):
+        self.assertEqual(tokenize("Điện thoại Đẹp, GIÁ rẻ!"), ["dien", "thoai", "dep", "gia", "re"])
+
+    def test_bm25_ranks_name_above_description(self):
+        self.assertEqual(self.search("iphone"), ["iPhone 15 Pro", "MacBook Pro 16"])
+        self.assertEqual(sorted(self.search("dien thoai")), ["Galaxy S23 Ultra", "iPhone 15 Pro"])
+        self.assertEqual(self.search("apple")[0:2], ["iPhone 15 Pro", "MacBook Pro 16"])
+        self.assertEqual(self.search("khong-co-gi"), [])
+
+    def test_signals_update_index_incrementally(self):
+        self.search("galaxy")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.galaxy.name = "Galaxy Z Fold"
+            self.galaxy.save()
+        self.assertEqual(self.search("fold"), ["Galaxy Z Fold"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.samsung.name = "Samsung Electronics"
+            self.samsung.save()
+        self.assertEqual(self.search("electronics"), ["Galaxy Z Fold"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.galaxy.is_available = False
+            self.galaxy.save()
+        self.assertEqual(self.search("fold"), [])
+
+    def test_index_persists_and_loads_without_database(self):
+        engine = get_search_engine()
+        engine.rebuild()
+        fresh = SearchEngine()
+        with self.assertNumQueries(0):
+            fresh.ensure_current()
+        self.assertEqual(fresh.search("macbook")[0][0], self.macbook.id)
+
+        index = SearchIndex.loads(engine.index.dumps())
+        self.assertEqual(index.postings, engine.index.postings)
+        self.assertEqual(index.total_length, engine.index.total_length)
+
+    def test_processes_append_changes_without_losing_updates(self):
+        # Hai engine dùng chung file như hai process
+        first, second = SearchEngine(), SearchEngine()
+        first.rebuild()
+        second.ensure_current()
+        with open(first.path, 'rb') as f:
+            snapshot = f.read()
+        Product.objects.filter(pk=self.galaxy.pk).update(name="Galaxy Z Fold")
+        Product.objects.filter(pk=self.macbook.pk).update(name="MacBook Air")
+        first.reindex_products([self.galaxy.pk])
+        second.reindex_products([self.macbook.pk])
+        # Chỉ append vào change log, snapshot không bị ghi lại
+        with open(first.path, 'rb') as f:
+            self.assertEqual(f.read(), snapshot)
+        for engine in (first, second, SearchEngine()):
+            self.assertEqual([doc_id for doc_id, _ in engine.search("fold")], [self.galaxy.pk])
+            self.assertEqual([doc_id for doc_id, _ in engine.search("air")], [self.macbook.pk])
+
+    def test_change_log_is_compacted(self):
+        first, second = SearchEngine(), SearchEngine()
+        first.rebuild()
+        second.ensure_current()
+        Product.objects.filter(pk=self.galaxy.pk).update(is_available=False)
+        with override_settings(SEARCH_INDEX_LOG_MAX_BYTES=1):
+            first.reindex_products([self.galaxy.pk])
+        with open(first.log_path, 'rb') as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertEqual(second.search("galaxy"), [])
+        self.assertEqual(SearchEngine().search("galaxy"), [])
+
+
+# ==========================
+# Facet: lọc + số đếm
+# ==========================
+class ProductFacetTests(TempSearchIndexMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.apple = Brand.objects.create(name="Apple")
+        cls.sony = Brand.objects.create(name="Sony")
+        cls.root = Category.objects.create(name="Audio")
+        cls.headphones = Category.objects.create(name="Headphones", parent=cls.root)
+        cls.speakers = Category.objects.create(name="Speakers", parent=cls.root)
+
+        def product(name, brand, category, price, variants):
+            p = create_product(category, brand, name, with_image=False)
+            p.price = price
+            p.save()
+            for color, size in variants:
+                ProductVariant.objects.create(product=p, color=color, size=size)
+            return p
+
+        cls.airpods = product("AirPods", cls.apple, cls.headphones, 250, [("White", "S"), ("White", "M")])
+        cls.xm5 = product("WH-1000XM5", cls.sony, cls.headphones, 400, [("Black", "L"), ("Silver", "L")])
+        cls.srs = product("SRS-XB13", cls.sony, cls.speakers, 60, [("Black", None)])
+
+    def setUp(self):
+        clear_caches()
+        self.url = reverse('product-facets')
+
+    def facet_counts(self, data, facet):
+        return {item['value']: item['count'] for item in data['facets'][facet]}
+
+    def test_counts_without_filters(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(self.facet_counts(data, 'brand'), {self.sony.id: 2, self.apple.id: 1})
+        self.assertEqual(self.facet_counts(data, 'category')[self.root.id], 3)
+        self.assertEqual(self.facet_counts(data, 'price'), {'100-500': 2, '0-100': 1})
+        self.assertEqual(self.facet_counts(data, 'color'), {'Black': 2, 'White': 1, 'Silver': 1})
+        self.assertEqual(data['facets']['brand'][0]['label'], "Sony")
+
+    def test_filters_are_and_across_facets_or_within(self):
+        data = self.client.get(self.url, {'brand': self.sony.id, 'color': 'Black'}).json()
+        self.assertEqual(sorted(p['name'] for p in data['results']), ["SRS-XB13", "WH-1000XM5"])
+        # Số đếm brand bỏ qua bộ lọc brand
+        self.assertEqual(self.facet_counts(data, 'brand'), {self.sony.id: 2})
+
+        data = self.client.get(self.url, {'color': ['White', 'Silver'], 'category': self.headphones.id}).json()
+        self.assertEqual(data['count'], 2)
+        data = self.client.get(self.url, {'price': '0-100', 'size': 'L'}).json()
+        self.assertEqual(data['count'], 0)
+
+    def test_incremental_updates(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductVariant.objects.create(product=self.srs, color="Blue", size="M")
+        with self.assertNumQueries(4):
+            # Index không dựng lại: chỉ đọc lại sản phẩm đã đổi (+ variant),
+            # rồi query sản phẩm cho kết quả (+ ảnh chính)
+            data = self.client.get(self.url, {'color': 'Blue'}).json()
+        self.assertEqual([p['name'] for p in data['results']], ["SRS-XB13"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.airpods.is_available = False
+            self.airpods.save()
+        self.assertEqual(self.client.get(self.url, {'brand': self.apple.id}).json()['count'], 0)
+        self.assertNotIn(self.airpods.id, get_facet_engine().index.memberships)
+
+    def test_other_process_changes_are_applied_from_change_log(self):
+        engine = get_facet_engine()
+        engine.ensure_current()
+        other = FacetEngine()
+        ProductVariant.objects.create(product=self.srs, color="Blue", size="M")
+        other.update_products([self.srs.id])
+        with self.assertNumQueries(2):
+            engine.ensure_current()
+        self.assertIn((COLOR, 'Blue'), engine.index.memberships[self.srs.id])
+        # Version không có trong change log: dựng lại toàn bộ
+        other.invalidate()
+        with self.assertNumQueries(4):
+            engine.ensure_current()
+
+    def test_bulk_load_matches_incremental_updates(self):
+        products = [(3, {(BRAND, 1), (COLOR, 'Black')}), (17, {(BRAND, 1)}), (9, {(BRAND, 2), (COLOR, 'Black')})]
+        loaded, incremental = FacetIndex(), FacetIndex()
+        loaded.load(products)
+        for product_id, keys in products:
+            incremental.set_product(product_id, keys)
+        self.assertEqual(loaded.available, incremental.available)
+        self.assertEqual(loaded.postings, incremental.postings)
+        self.assertEqual(loaded.memberships, incremental.memberships)
+
+
+# ==========================
+# Tổng hợp rating / num_reviews theo Review
+# ==========================
+class ReviewAggregateTests(TempSearchIndexMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Phones")
+        cls.phone = create_product(cls.category, None, "Phone", with_image=False)
+        cls.tablet = create_product(cls.category, None, "Tablet", with_image=False)
+        cls.alice = User.objects.create_user(username="alice", password="x")
+        cls.bob = User.objects.create_user(username="bob", password="x")
+
+    def setUp(self):
+        clear_caches()
+
+    def assertAggregates(self, product, num_reviews, rating_sum):
+        product.refresh_from_db()
+        self.assertEqual((product.num_reviews, product.rating_sum), (num_reviews, rating_sum))
+        self.assertAlmostEqual(product.rating, rating_sum / num_reviews if num_reviews else 0)
+
+    def test_create_update_delete(self):
+        first = Review.objects.create(product=self.phone, user=self.alice, rating=5)
+        Review.objects.create(product=self.phone, user=self.bob, rating=2)
+        self.assertAggregates(self.phone, 2, 7)
+
+        review = Review.objects.get(pk=first.pk)
+        review.rating = 3
+        review.save()
+        self.assertAggregates(self.phone, 2, 5)
+
+        review.product = self.tablet
+        review.save()
+        self.assertAggregates(self.phone, 1, 2)
+        self.assertAggregates(self.tablet, 1, 3)
+
+        review.delete()
+        self.assertAggregates(self.tablet, 0, 0)
+        self.bob.delete()  # xóa dây chuyền review của user
+        self.assertAggregates(self.phone, 0, 0)
+
+    def test_product_save_does_not_overwrite_aggregates(self):
+        stale = Product.objects.get(pk=self.phone.pk)
+        Review.objects.create(product=self.phone, user=self.alice, rating=4)
+        stale.name = "Phone 2"
+        stale.save()
+        self.assertAggregates(self.phone, 1, 4)
+
+    def test_recompute_repairs_drift(self):
+        Review.objects.create(product=self.phone, user=self.alice, rating=4)
+        Review.objects.create(product=self.phone, user=self.bob, rating=5)
+        Product.objects.filter(pk=self.phone.pk).update(num_reviews=40, rating_sum=0, rating=1.5)
+        Product.objects.filter(pk=self.tablet.pk).update(num_reviews=7, rating=4.2)
+
+        self.assertEqual(recompute_review_aggregates(chunk_size=1), 2)
+        self.assertAggregates(self.phone, 2, 9)
+        self.assertAggregates(self.tablet, 0, 0)
+        self.assertEqual(recompute_review_aggregates(), 0)
+
+
+# ==========================
+# Review: tóm tắt trong chi tiết + endpoint phân trang riêng
+# ==========================
+class ProductReviewsEndpointTests(TempSearchIndexMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Cameras")
+        cls.product = create_product(cls.category, None, "Alpha 7")
+        users = [User.objects.create_user(username=f"u{i}", password="x") for i in range(4)]
+        cls.reviews = [
+            Review.objects.create(product=cls.product, user=users[i % 4], rating=i % 5 + 1, comment=f"r{i}")
+            for i in range(13)
+        ]
+
+    def setUp(self):
+        clear_caches()
+        self.url = reverse('product-reviews', args=[self.product.id])
+
+    def test_detail_carries_summary_only(self):
+        data = self.client.get(reverse('product-detail', args=[self.product.id])).json()
+        self.assertEqual([r['comment'] for r in data['reviews']], ["r12", "r11", "r10", "r9", "r8"])
+        summary = data['review_summary']
+        self.assertEqual(summary['count'], 13)
+        self.assertEqual(summary['histogram'], {'1': 3, '2': 3, '3': 3, '4': 2, '5': 2})
+        self.assertEqual(summary['average'], round(sum(r.rating for r in self.reviews) / 13, 2))
+
+    def test_pages_join_user_in_one_query(self):
+        comments = []
+        cursor = None
+        while True:
+            params = {'page_size': 5, **({'cursor': cursor} if cursor else {})}
+            # exists() + 1 query cho trang (JOIN user)
+            with self.assertNumQueries(2):
+                data = self.client.get(self.url, params).json()
+            comments += [r['comment'] for r in data['results']]
+            self.assertTrue(all(r['user'].startswith('u') for r in data['results']))
+            cursor = data['next']
+            if not cursor:
+                break
+        self.assertEqual(comments, [f"r{i}" for i in range(12, -1, -1)])
+
+        data = self.client.get(self.url, {'sort': 'oldest', 'page_size': 2}).json()
+        self.assertEqual([r['comment'] for r in data['results']], ["r0", "r1"])
+        back = self.client.get(self.url, {'sort': 'oldest', 'cursor': data['next']}).json()
+        previous = self.client.get(self.url, {'sort': 'oldest', 'cursor': back['previous']}).json()
+        self.assertEqual([r['comment'] for r in previous['results']], ["r0", "r1"])
+
+    def test_missing_product_and_bad_cursor(self):
+        self.assertEqual(self.client.get(reverse('product-reviews', args=[999999])).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'garbage'}).status_code, 404)
+
+    def test_unavailable_product_is_not_found(self):
+        Product.objects.filter(pk=self.product.pk).update(is_available=False)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_malformed_cursor_values(self):
+        for sort, values in [
+            ('newest', ['not-a-date', 1]),
+            ('newest', [None, 1]),
+            ('oldest', ['2024-01-01T00:00:00', 'x']),
+            ('oldest', [1]),
+            ('oldest', {'a': 1}),
+        ]:
+            with self.subTest(sort=sort, values=values):
+                cursor = make_cursor({'s': sort, 'v': values, 'r': 0})
+                response = self.client.get(self.url, {'cursor': cursor, 'sort': sort})
+                self.assertEqual(response.status_code, 404)
+
+
+# ==========================
+# Serializer values(): output giống hệt serializer DRF
+# ==========================
+class ProductFastSerializerParityTests(TempSearchIndexMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="Asus", logo_url="https://example.com/asus.png")
+        cls.parent = Category.objects.create(name="Laptops")
+        cls.child = Category.objects.create(name="Gaming", parent=cls.parent)
+        Category.objects.create(name="Empty")
+        cls.with_brand = create_product(cls.child, cls.brand, "ROG Zephyrus")
+        cls.with_brand.price = "1234.5"
+        cls.with_brand.discount_price = "999.99"
+        cls.with_brand.sold = 17
+        cls.with_brand.save()
+        cls.no_brand = create_product(cls.parent, None, "No brand", with_image=False)
+        # Ảnh đường dẫn tương đối: build tuyệt đối theo request
+        doc = Document.objects.create(title="local", type=Document.IMAGE, file="documents/local.png")
+        ProductDocument.objects.create(product=cls.no_brand, document=doc, is_main=True)
+
+        user = User.objects.create_user(username="critic", password="x")
+        for i in range(7):
+            Review.objects.create(product=cls.with_brand, user=user, rating=i % 5 + 1, comment=f"c{i}" if i else None)
+        ProductVariant.objects.create(product=cls.with_brand, name="16GB", color="Black", size=None,
+                                      stock=4, price="1234.50", discount_price=None)
+        ShippingInfo.objects.create(product=cls.with_brand, info="2 days")
+        ReturnPolicy.objects.create(product=cls.with_brand, policy_text="30 days")
+
+    def setUp(self):
+        clear_caches()
+        self.request = RequestFactory().get('/api/products/')
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_product_fe_parity(self):
+        ids = [self.with_brand.id, self.no_brand.id]
+        for request in (None, self.request):
+            products = ProductFESerializer.setup_eager_loading(Product.objects.filter(id__in=ids).order_by('id'))
+            expected = ProductFESerializer(products, many=True, context={'request': request}).data
+            self.assertEqual(self.render(ProductFEFastSerializer(request).serialize_ids(ids)), self.render(expected))
+
+    def test_product_detail_parity(self):
+        for product in (self.with_brand, self.no_brand):
+            for request in (None, self.request):
+                instance = ProductDetailSerializer.setup_eager_loading(Product.objects.filter(id=product.id)).first()
+                expected = ProductDetailSerializer(instance, context={'request': request}).data
+                fast = ProductDetailFastSerializer(request).serialize(product.id)
+                self.assertEqual(self.render(fast), self.render(expected))
+        self.assertIsNone(ProductDetailFastSerializer().serialize(999999))
+
+    def test_listing_uses_two_queries(self):
+        with self.assertNumQueries(2):
+            ProductFEFastSerializer().serialize_ids([self.with_brand.id, self.no_brand.id])
+
+
+# ==========================
+# Chuẩn hóa URL ảnh (LRU + gốc tuyệt đối theo request)
+# ==========================
+def legacy_valid_url(request, url):
+    # Bản get_valid_url cũ, làm chuẩn để so sánh
+    if not url:
+        return None
+    url = unquote(url).strip()
+    if url.startswith('/'):
+        url = url[1:]
+    if url.startswith('https:/') and not url.startswith('https://'):
+        url = url.replace('https:/', 'https://', 1)
+    elif url.startswith('http:/') and not url.startswith('http://'):
+        url = url.replace('http:/', 'http://', 1)
+    if url.startswith('http://') or url.startswith('https://'):
+        return url
+    if request:
+        return request.build_absolute_uri(url)
+    return url
+
+
+class MediaURLResolverTests(TestCase):
+    URLS = [
+        None, '', '/', 'https://cdn.example.com/a.png', 'https:/cdn.example.com/b.png',
+        '/https%3A/cdn.example.com/c.png', 'http:/x.vn/d.png', ' /media/documents/e f.png ',
+        '/media/documents/%C3%A1nh.png', 'media/documents/ảnh 2.png', 'documents/../f.png',
+    ]
+
+    def test_matches_legacy_behaviour(self):
+        for path in ('/api/products/', '/api/products/categories/3/'):
+            request = RequestFactory().get(path, HTTP_HOST='shop.example.com')
+            for url in self.URLS:
+                with self.subTest(path=path, url=url):
+                    self.assertEqual(MediaURLResolver(request).resolve(url), legacy_valid_url(request, url))
+                    self.assertEqual(MediaURLResolver().resolve(url), legacy_valid_url(None, url))
+
+    def test_base_is_computed_once_per_request(self):
+        request = RequestFactory().get('/api/products/')
+        with mock.patch.object(request, 'get_host', wraps=request.get_host) as get_host:
+            resolver = MediaURLResolver.for_request(request)
+            self.assertIs(MediaURLResolver.for_request(request), resolver)
+            urls = [resolver.file_url(f"documents/{i}.png") for i in range(20)]
+        self.assertEqual(get_host.call_count, 1)
+        self.assertEqual(urls[0], legacy_valid_url(request, Document(file="documents/0.png").file.url))
+
+    def test_normalization_is_memoized(self):
+        normalize_url.cache_clear()
+        for _ in range(3):
+            normalize_url('/media/documents/x.png')
+        self.assertEqual(normalize_url.cache_info().hits, 2)
+
+
+# ==========================
+# Conditional GET (ETag / Last-Modified)
+# ==========================
+class ConditionalGetTests(TempSearchIndexMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="LG")
+        cls.parent = Category.objects.create(name="TV")
+        cls.category = Category.objects.create(name="OLED", parent=cls.parent)
+        cls.product = create_product(cls.category, cls.brand, "C3")
+        cls.user = User.objects.create_user(username="viewer", password="x")
+
+    def setUp(self):
+        clear_caches()
+
+    def test_detail_not_modified_without_queries(self):
+        url = reverse('product-detail', args=[self.product.id])
+        first = self.client.get(url)
+        etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+        with self.assertNumQueries(0), mock.patch('api.products.views.get_product_document') as get_document:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        get_document.assert_not_called()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(product=self.product, user=self.user, rating=4)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+
+    def test_listing_not_modified_until_catalog_changes(self):
+        for url in (reverse('category-products', args=[self.category.id]),
+                    reverse('parent-category-products', args=[self.parent.id])):
+            etag = self.client.get(url).headers['ETag']
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            # Query string khác (trang / sort khác) -> ETag khác
+            self.assertNotEqual(self.client.get(url, {'sort': 'newest'}).headers['ETag'], etag)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.brand.name = f"{self.brand.name}+"
+                self.brand.save()
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_listing_if_modified_since(self):
+        url = reverse('parent-category-products', args=[self.parent.id])
+        last_modified = self.client.get(url).headers['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="QLED", parent=self.parent)
+        # Lần đổi ở giây sau, ghi bởi process khác: mốc nằm trong cache dùng chung
+        other_process = caches.create_connection(settings.CACHE_VERSIONS_ALIAS)
+        other_process.set(CATALOG_MODIFIED_KEY, int(time.time()) + 5)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)).status_code, 304)
+
+    def test_reviews_endpoint_etag(self):
+        url = reverse('product-reviews', args=[self.product.id])
+        etag = self.client.get(url).headers['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(product=self.product, user=self.user, rating=2)
+        self.assertEqual(len(self.client.get(url, HTTP_IF_NONE_MATCH=etag).json()['results']), 1)
+
+
+# ==========================
+# Response cache theo tag
+# ==========================
+class ResponseCacheTests(TempSearchIndexMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="Xiaomi")
+        cls.category = Category.objects.create(name="Phones")
+        cls.other_category = Category.objects.create(name="Watches")
+        cls.phone = create_product(cls.category, cls.brand, "Redmi Note")
+        cls.watch = create_product(cls.other_category, None, "Band 8")
+
+    def setUp(self):
+        clear_caches()
+
+    def test_hit_skips_view_and_database(self):
+        url = reverse('product-detail', args=[self.phone.id])
+        first = self.client.get(url)
+        self.assertEqual(first.headers['X-Cache'], 'MISS')
+        with self.assertNumQueries(0), mock.patch('api.products.views.get_product_version') as version:
+            second = self.client.get(url)
+        version.assert_not_called()
+        self.assertEqual(second.headers['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second.headers['ETag'], first.headers['ETag'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first.headers['ETag']).status_code, 304)
+        # Có Authorization: không dùng cache
+        self.assertNotIn('X-Cache', self.client.get(url, HTTP_AUTHORIZATION='Bearer x').headers)
+
+    def test_invalidation_from_other_process(self):
+        url = reverse('category-parents')
+        self.client.get(url)
+        # Worker khác invalidate tag: chỉ ghi vào cache dùng chung, không đụng
+        # entry (riêng từng process) của process này
+        other_process = caches.create_connection(settings.RESPONSE_CACHE_TAGS_ALIAS)
+        other_process.set('response-tag:categories', time.time() + 1, timeout=None)
+        self.assertEqual(self.client.get(url).headers['X-Cache'], 'MISS')
+
+    def test_save_invalidates_only_tagged_entries(self):
+        phone_url = reverse('product-detail', args=[self.phone.id])
+        watch_url = reverse('product-detail', args=[self.watch.id])
+        phone_list = reverse('category-products', args=[self.category.id])
+        watch_list = reverse('category-products', args=[self.other_category.id])
+        for url in (phone_url, watch_url, phone_list, watch_list):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phone.name = "Redmi Note 13"
+            self.phone.save()
+        self.assertEqual(self.client.get(phone_url).json()['name'], "Redmi Note 13")
+        self.assertEqual(self.client.get(phone_list).headers['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(watch_url).headers['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(watch_list).headers['X-Cache'], 'HIT')
+
+        # Sản phẩm mới trong category: listing của category đó hết hạn
+        with self.captureOnCommitCallbacks(execute=True):
+            create_product(self.other_category, None, "Band 9")
+        self.assertEqual(len(self.client.get(watch_list).json()['products']), 2)
+
+        # Brand đổi tên: các sản phẩm của brand
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brand.name = "Xiaomi Global"
+            self.brand.save()
+        self.assertEqual(self.client.get(phone_url).json()['brand']['name'], "Xiaomi Global")
+        self.assertEqual(self.client.get(watch_url).headers['X-Cache'], 'HIT')
+
+        # Chuyển category: listing của cả category cũ (kể cả trang không chứa
+        # sản phẩm này) và category mới
+        bestseller = create_product(self.category, None, "Redmi 13", with_image=False)
+        Product.objects.filter(pk=bestseller.pk).update(sold=10)
+        first_page = reverse('category-products', args=[self.category.id]) + '?page_size=1'
+        self.assertEqual(self.client.get(first_page).json()['products'][0]['name'], "Redmi 13")
+        self.client.get(watch_list)
+        phone = Product.objects.get(pk=self.phone.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            phone.category = self.other_category
+            phone.save()
+        self.assertEqual(self.client.get(first_page).headers['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(watch_list).headers['X-Cache'], 'MISS')
+
+    def test_file_based_backend(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        file_caches = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'responses': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory},
+            'versions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }
+        url = reverse('category-parents')
+        with override_settings(CACHES=file_caches):
+            self.assertEqual(self.client.get(url).headers['X-Cache'], 'MISS')
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).headers['X-Cache'], 'HIT')
+            with self.captureOnCommitCallbacks(execute=True):
+                Category.objects.create(name="Tablets")
+            self.assertEqual(len(self.client.get(url).json()), 3)
+
+    def test_concurrent_misses_run_view_once(self):
+        calls = []
+
+        def view(request):
+            calls.append(1)
+            time.sleep(0.2)
+            return tag_response(HttpResponse(b'{"ok":true}', content_type='application/json'), 'products')
+        view.view_class = type('SlowView', (), {'response_cache_timeout': 30})
+
+        def handler(request):
+            return middleware.process_view(request, view, (), {}) or view(request)
+        middleware = ResponseCacheMiddleware(handler)
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(middleware(RequestFactory().get('/api/products/slow/'))))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual({r.content for r in results}, {b'{"ok":true}'})
+        self.assertEqual(sorted(r.headers['X-Cache'] for r in results), ['HIT'] * 4 + ['MISS'])
+
+
+class CatalogSeederTests(TestCase):
+    def seed(self, **options):
+        options = {'products': 300, 'categories': 40, 'brands': 8, 'users': 30,
+                   'reviews_per_product': 4, 'batch_size': 128, **options}
+        return CatalogSeeder(**options).run()
+
+    def snapshot(self):
+        return (
+            list(Product.objects.order_by('id').values_list('id', 'name', 'price', 'category_id', 'brand_id', 'sold')),
+            list(Review.objects.order_by('id').values_list('product_id', 'user_id', 'rating')),
+            list(Category.objects.order_by('id').values_list('id', 'parent_id', 'path')),
+        )
+
+    def test_same_seed_gives_same_catalog(self):
+        counts = self.seed()
+        first = self.snapshot()
+        self.assertEqual(counts['Product'], 300)
+        self.assertEqual(counts['Review'], Review.objects.count())
+
+        truncate_catalog()
+        User.objects.filter(username__startswith='seed_user_').delete()
+        self.assertEqual(Product.objects.count(), 0)
+        self.seed()
+        self.assertEqual(self.snapshot(), first)
+
+    def test_aggregates_and_paths_are_consistent(self):
+        self.seed()
+        self.assertEqual(recompute_review_aggregates(), 0)
+        self.assertEqual(rebuild_category_paths(), 0)
+        category_ids = set(Product.objects.values_list('category_id', flat=True))
+        self.assertFalse(Category.objects.filter(id__in=category_ids, depth=0).exists())
+        self.assertEqual(ProductDocument.objects.filter(is_main=True).count(), 300)
+
+    def test_popularity_is_zipf_skewed(self):
+        self.seed(products=1000, reviews_per_product=5)
+        counts = sorted(Product.objects.values_list('num_reviews', flat=True), reverse=True)
+        self.assertGreater(counts[0], 20 * max(counts[len(counts) // 2], 1))
+        self.assertAlmostEqual(sum(counts) / len(counts), 5, delta=1)
+
+
+class RequestMetricsTests(TempSearchIndexMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="Oppo")
+        cls.category = Category.objects.create(name="Phones")
+        cls.products = [create_product(cls.category, cls.brand, f"Reno {i}") for i in range(3)]
+
+    def setUp(self):
+        clear_caches()
+
+    def timings(self, response):
+        return {
+            part.split(';')[0]: part
+            for part in (p.strip() for p in response.headers['Server-Timing'].split(','))
+        }
+
+    def test_fingerprint_groups_same_query_shape(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "products" WHERE "id" IN (%s, %s, %s) AND name = \'x\' LIMIT 21'),
+            'SELECT * FROM "products" WHERE "id" IN (...) AND name = ? LIMIT ?',
+        )
+        self.assertEqual(fingerprint('SELECT 1 WHERE id = %s'), fingerprint('SELECT  2 WHERE id = 7'))
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('category-products', args=[self.category.id]))
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'render', 'app', 'total'})
+        self.assertIn('desc="3 queries"', timings['db'])
+        # Cache HIT: không query database
+        cached = self.client.get(reverse('category-products', args=[self.category.id]))
+        self.assertIn('desc="0 queries"', self.timings(cached)['db'])
+
+    @override_settings(REQUEST_METRICS_SLOW_MS=0)
+    def test_slow_request_log_reports_duplicate_queries(self):
+        def view(request):
+            for product in self.products:
+                Product.objects.get(id=product.id)
+            return HttpResponse(b'ok')
+        middleware = RequestMetricsMiddleware(view)
+
+        with self.assertLogs('slow_requests', level='WARNING') as logs:
+            response = middleware(RequestFactory().get('/api/products/n-plus-one/'))
+        record = logs.records[0].request_metrics
+        self.assertEqual(record['path'], '/api/products/n-plus-one/')
+        self.assertEqual(record['queries'], 3)
+        self.assertEqual(list(record['duplicates'].values()), [3])
+        self.assertEqual(record['top_queries'][0]['count'], 3)
+        self.assertIn('dup;desc="2 duplicate queries"', response.headers['Server-Timing'])
+
+
+class SamplingProfilerTests(TempSearchIndexMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_product(Category.objects.create(name="Phones"), None, "Find X")
+        cls.staff = User.objects.create_user(username="staff", password="x", is_staff=True)
+        cls.customer = User.objects.create_user(username="customer", password="x")
+
+    def setUp(self):
+        clear_caches()
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir, ignore_errors=True)
+        overrides = override_settings(PROFILER_DIR=self.profile_dir, PROFILER_SECRET='s3cret', PROFILER_INTERVAL_MS=1)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def bearer(self, user):
+        return f"Bearer {AccessToken.for_user(user)}"
+
+    def get_detail(self, **headers):
+        return self.client.get(reverse('product-detail', args=[self.product.id]), **headers)
+
+    def test_profile_requires_secret_or_staff_token(self):
+        self.assertNotIn('X-Profile-File', self.get_detail().headers)
+        self.assertNotIn('X-Profile-File', self.get_detail(HTTP_X_PROFILE='wrong').headers)
+        self.assertNotIn('X-Profile-File', self.get_detail(
+            HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=self.bearer(self.customer)).headers)
+
+        response = self.get_detail(HTTP_X_PROFILE='s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(os.path.exists(os.path.join(self.profile_dir, response.headers['X-Profile-File'])))
+        response = self.get_detail(HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=self.bearer(self.staff))
+        self.assertIn('X-Profile-File', response.headers)
+
+    def test_collapsed_stacks_contain_view_frames(self):
+        def slow_view(request):
+            deadline = time.monotonic() + 0.05
+            while time.monotonic() < deadline:
+                pass
+            return HttpResponse(b'ok')
+
+        response = SamplingProfilerMiddleware(slow_view)(RequestFactory().get('/x/', HTTP_X_PROFILE='s3cret'))
+        with open(os.path.join(self.profile_dir, response.headers['X-Profile-File'])) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            self.assertGreater(int(count), 0)
+        self.assertTrue(any('slow_view (' in line for line in lines))
+
+    def test_old_profiles_are_rotated(self):
+        for i in range(3):
+            with open(os.path.join(self.profile_dir, f"20000101-00000{i}-get-old.collapsed"), 'w') as f:
+                f.write('main (x.py:1) 1\n')
+        with override_settings(PROFILER_SAMPLE_RATE=1.0, PROFILER_MAX_FILES=2):
+            name = self.get_detail().headers['X-Profile-File']
+        self.assertEqual(sorted(os.listdir(self.profile_dir)), ["20000101-000002-get-old.collapsed", name])
+
+    def test_frame_labels_are_computed_once_per_function(self):
+        frame = sys._getframe()
+        label = _frame_label(frame)
+        self.assertIn('test_frame_labels_are_computed_once_per_function (', label)
+        with mock.patch('utils.profiling._path_prefixes', side_effect=AssertionError):
+            self.assertEqual(_frame_label(frame), label)
+
+    def test_sample_rate(self):
+        with override_settings(PROFILER_SAMPLE_RATE=1.0):
+            self.assertIn('X-Profile-File', self.get_detail().headers)
+        with override_settings(PROFILER_SAMPLE_RATE=0):
+            self.assertNotIn('X-Profile-File', self.get_detail().headers)
+
+
+class AsyncCatalogURLConf:
+    # Như api/products/urls.py khi ASYNC_CATALOG_VIEWS=True
+    urlpatterns = [path('api/products/', include([
+        path('categories-parents/', async_views.AsyncCategoryParentsView.as_view()),
+        path('categories/<int:category_id>/', async_views.AsyncCategoryProductsView.as_view()),
+        path('parent-categories/<int:parent_id>/', async_views.AsyncParentCategoryProductsView.as_view()),
+        path('<int:product_id>/', async_views.AsyncProductDetailView.as_view()),
+    ]))]
+
+
+# Query song song chạy ở thread khác (connection khác): dữ liệu phải được commit
+class AsyncCatalogViewTests(TempSearchIndexMixin, TransactionTestCase):
+    def setUp(self):
+        clear_caches()
+        brand = Brand.objects.create(name="Asus")
+        self.parent = Category.objects.create(name="Computers")
+        self.child = Category.objects.create(name="Laptops", parent=self.parent)
+        self.product = create_product(self.child, brand, "Zenbook")
+        create_product(self.child, None, "Vivobook", with_image=False)
+        ProductVariant.objects.create(product=self.product, name="16GB", sku="ZB-16", stock=3, price=100)
+        ShippingInfo.objects.create(product=self.product, info="Ships tomorrow")
+        user = User.objects.create_user(username="reviewer", password="x")
+        Review.objects.create(product=self.product, user=user, rating=4, comment="Good")
+
+    def async_get(self, url, **headers):
+        with override_settings(ROOT_URLCONF=AsyncCatalogURLConf):
+            return async_to_sync(self.async_client.get)(url, headers=headers)
+
+    def test_async_views_match_sync_views(self):
+        urls = [
+            reverse('category-parents'),
+            reverse('category-products', args=[self.child.id]),
+            reverse('category-products', args=[0]) + '?type=popular',
+            reverse('category-products', args=[999]),
+            reverse('category-products', args=[self.child.id]) + '?cursor=not-a-cursor',
+            reverse('category-products', args=[0]) + '?sort=cheapest',
+            reverse('parent-category-products', args=[self.parent.id]),
+            reverse('parent-category-products', args=[999]),
+            reverse('product-detail', args=[self.product.id]),
+            reverse('product-detail', args=[999]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                expected = self.client.get(url)
+                clear_caches()
+                response = self.async_get(url)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.content, expected.content)
+                # ETag theo version trong cache (được tạo lại sau clear_caches)
+                self.assertEqual('ETag' in response.headers, 'ETag' in expected.headers)
+                self.assertIn('Server-Timing', response.headers)
+
+    def test_conditional_and_response_cache(self):
+        url = reverse('product-detail', args=[self.product.id])
+        first = self.async_get(url)
+        self.assertEqual(first.headers['X-Cache'], 'MISS')
+        self.assertEqual(self.async_get(url).headers['X-Cache'], 'HIT')
+        self.assertEqual(self.async_get(url, if_none_match=first.headers['ETag']).status_code, 304)
+
+    def test_waiting_for_build_lock_does_not_block_a_thread(self):
+        url = reverse('product-detail', args=[self.product.id])
+        key = ResponseCacheMiddleware(HttpResponse)._key(RequestFactory().get(url))
+        # Request khác đang build entry này
+        caches['responses'].add(f"{key}:lock", time.time())
+        with override_settings(RESPONSE_CACHE_LOCK_WAIT=0.1), \
+                mock.patch('utils.response_cache.time.sleep', side_effect=AssertionError('blocking sleep')):
+            response = self.async_get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+
+    def test_detail_sections_are_fetched_concurrently(self):
+        serializer = ProductDetailFastSerializer()
+        delay = 0.05
+
+        def slow(section):
+            def wrapper(*args):
+                time.sleep(delay)
+                return section(*args)
+            return wrapper
+
+        for name in ('_product_row', '_variants', '_latest_reviews', '_rating_counts',
+                     '_shipping_info', '_return_policy', '_images'):
+            setattr(serializer, name, slow(getattr(serializer, name)))
+
+        started = time.perf_counter()
+        data = async_to_sync(serializer.aserialize)(self.product.id)
+        elapsed = time.perf_counter() - started
+        self.assertLess(elapsed, delay * 4)
+        self.assertEqual(data, ProductDetailFastSerializer().serialize(self.product.id))
+
+    def test_pool_thread_keeps_its_connection(self):
+        def raw_connection():
+            connection.ensure_connection()
+            return connection.connection
+
+        call = _with_connection(raw_connection)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            first = executor.submit(call).result()
+            # CONN_MAX_AGE=0 không áp dụng cho thread của pool
+            self.assertIs(executor.submit(call).result(), first)
+            executor.submit(connections.close_all).result()
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class BackInStockTests(TempSearchIndexMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Phones")
+        cls.product = Product.objects.create(name="Pixel 9", description="d", price=900, category=category)
+        cls.other = Product.objects.create(name="Pixel 8", description="d", price=700, category=category)
+        cls.variant = ProductVariant.objects.create(product=cls.product, name="128GB", stock=0)
+        Notification.objects.bulk_create(
+            [Notification(product=cls.product, email=f"user{i}@example.com") for i in range(23)]
+            + [Notification(product=cls.product, email="done@example.com", notified=True)]
+            + [Notification(product=cls.other, email="other@example.com")]
+        )
+
+    def restock(self, stock=5):
+        variant = ProductVariant.objects.get(pk=self.variant.pk)
+        variant.stock = stock
+        variant.save()
+        return variant
+
+    def jobs(self):
+        return list(Job.objects.filter(name=BACK_IN_STOCK_JOB).values_list('payload', flat=True))
+
+    def test_only_out_of_stock_to_in_stock_enqueues_once(self):
+        variant = self.restock(0)
+        self.assertEqual(self.jobs(), [])
+        variant.stock = 3
+        variant.save()
+        self.assertEqual(self.jobs(), [{'product_id': self.product.id}])
+        # Vẫn có hàng: không thêm job
+        variant.stock = 10
+        variant.save()
+        # Hết hàng rồi có lại trong khi job cũ còn chờ: không thêm job trùng
+        variant.stock = 0
+        variant.save()
+        variant.stock = 1
+        variant.save()
+        self.assertEqual(len(self.jobs()), 1)
+
+    def test_restock_while_job_running_enqueues_again(self):
+        variant = self.restock()
+        job, = claim_jobs('w')
+        # Job đang chạy (có thể đã qua lô cuối) khi hết hàng rồi có lại
+        variant.stock = 0
+        variant.save()
+        Notification.objects.create(product=self.product, email="late@example.com")
+        variant.stock = 2
+        variant.save()
+        self.assertEqual(Job.objects.filter(name=BACK_IN_STOCK_JOB, status=Job.PENDING).count(), 1)
+
+    def test_no_job_without_pending_subscribers(self):
+        ProductVariant.objects.create(product=self.other, stock=0)
+        Notification.objects.filter(product=self.other).update(notified=True)
+        variant = ProductVariant.objects.get(product=self.other)
+        variant.stock = 2
+        variant.save()
+        self.assertEqual(self.jobs(), [])
+
+    def test_fan_out_streams_chunks_and_marks_notified(self):
+        self.restock()
+        # 23 đăng ký, lô 10: product + kiểm tra stock, mỗi lô 1 SELECT keyset + 1 UPDATE
+        with self.assertNumQueries(2 + 3 * 2):
+            self.assertIsNone(fan_out_back_in_stock(self.product.id, chunk_size=10))
+        self.assertEqual(len(mail.outbox), 23)
+        self.assertEqual(mail.outbox[0].subject, "Pixel 9 is back in stock")
+        self.assertEqual(mail.outbox[0].to, ["user0@example.com"])
+        self.assertFalse(Notification.objects.filter(product=self.product, notified=False).exists())
+        self.assertFalse(Notification.objects.get(product=self.other).notified)
+        # Chạy lại: không gửi trùng
+        fan_out_back_in_stock(self.product.id, chunk_size=10)
+        self.assertEqual(len(mail.outbox), 23)
+
+    def test_refused_address_does_not_resend_the_chunk(self):
+        self.restock()
+        Notification.objects.filter(email="user2@example.com").update(email="bad@example.com")
+        sent = []
+
+        class RefusingBackend(LocmemEmailBackend):
+            def send_messages(self, messages):
+                for message in messages:
+                    if message.to == ["bad@example.com"]:
+                        raise smtplib.SMTPRecipientsRefused({"bad@example.com": (550, b"no such user")})
+                    sent.append(message.to[0])
+                return len(messages)
+
+        with mock.patch('api.products.back_in_stock.get_connection', return_value=RefusingBackend()):
+            fan_out_back_in_stock(self.product.id, chunk_size=10)
+        self.assertEqual(len(sent), 22)
+        self.assertEqual(len(set(sent)), 22)
+        self.assertFalse(Notification.objects.filter(product=self.product, notified=False).exists())
+
+    def test_connection_error_marks_messages_already_sent(self):
+        self.restock()
+        sent = []
+
+        class DroppingBackend(LocmemEmailBackend):
+            def send_messages(self, messages):
+                if len(sent) == 4:
+                    raise smtplib.SMTPServerDisconnected("gone")
+                sent.extend(message.to[0] for message in messages)
+                return len(messages)
+
+        with mock.patch('api.products.back_in_stock.get_connection', return_value=DroppingBackend()):
+            with self.assertRaises(smtplib.SMTPServerDisconnected):
+                fan_out_back_in_stock(self.product.id, chunk_size=10)
+        notified = set(Notification.objects.filter(product=self.product, notified=True).values_list('email', flat=True))
+        self.assertEqual(notified, set(sent) | {"done@example.com"})
+
+    def test_sold_out_again_keeps_subscriptions(self):
+        self.assertIsNone(fan_out_back_in_stock(self.product.id))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Notification.objects.filter(notified=False).count(), 24)
+
+    @override_settings(BACK_IN_STOCK_CHUNK_SIZE=10, BACK_IN_STOCK_JOB_SECONDS=0)
+    def test_job_continues_from_where_it_stopped(self):
+        self.restock()
+        for expected_after in (10, 20, None):
+            job, = claim_jobs('w')
+            run_job(job)
+            pending = Job.objects.filter(name=BACK_IN_STOCK_JOB, status=Job.PENDING)
+            if expected_after is None:
+                self.assertFalse(pending.exists())
+            else:
+                ids = list(Notification.objects.filter(product=self.product).order_by('id').values_list('id', flat=True))
+                self.assertEqual(pending.get().payload['after_id'], ids[expected_after - 1])
+        self.assertEqual(len(mail.outbox), 23)
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED).count(), 3)
+
+    def test_command_schedules_products_updated_without_signals(self):
+        ProductVariant.objects.filter(pk=self.variant.pk).update(stock=4)
+        self.assertEqual(self.jobs(), [])
+        call_command('notify_back_in_stock', stdout=io.StringIO())
+        self.assertEqual(self.jobs(), [{'product_id': self.product.id}])
@@ -1,21 +1,40 @@
+from django.conf import settings
 from django.urls import path
+from . import async_views
 from .views import (
     CategoryParentsAPIView,
     CategoryProductsAPIView,
     ParentCategoryProductsAPIView,
     ProductDetailAPIView,
+    ProductReviewsAPIView,
+    ProductSearchAPIView,
+    ProductFacetsAPIView,
 )
 
+# ASGI (asgi.py bật ASYNC_CATALOG_VIEWS): các endpoint đọc catalog dùng view async
+if getattr(settings, 'ASYNC_CATALOG_VIEWS', False):
+    CategoryParentsAPIView = async_views.AsyncCategoryParentsView
+    CategoryProductsAPIView = async_views.AsyncCategoryProductsView
+    ParentCategoryProductsAPIView = async_views.AsyncParentCategoryProductsView
+    ProductDetailAPIView = async_views.AsyncProductDetailView
+
 urlpatterns = [
     # Lấy danh sách category cha + subcategories
     path('categories-parents/', CategoryParentsAPIView.as_view(), name='category-parents'),
 
     # Lấy sản phẩm theo category cụ thể
     # Nếu category_id = 0, có thể truyền ?type=popular/sale/best_seller
+    # Phân trang: ?cursor=<next|previous>&sort=best_seller|newest&page_size=6
     path('categories/<int:category_id>/', CategoryProductsAPIView.as_view(), name='category-products'),
 
     # Lấy sản phẩm tất cả category con của parent
     # Nếu parent_id = 0, có thể truyền ?type=popular/sale/best_seller
     path('parent-categories/<int:parent_id>/', ParentCategoryProductsAPIView.as_view(), name='parent-category-products'),
+    # Tìm kiếm: ?q=<từ khóa>&limit=20
+    path('search/', ProductSearchAPIView.as_view(), name='product-search'),
+    # Lọc theo facet: ?brand=&category=&price=&color=&size=
+    path('facets/', ProductFacetsAPIView.as_view(), name='product-facets'),
     path('<int:product_id>/', ProductDetailAPIView.as_view(), name='product-detail'),
+    # Review của sản phẩm: ?cursor=<next|previous>&sort=newest|oldest&page_size=10
+    path('<int:product_id>/reviews/', ProductReviewsAPIView.as_view(), name='product-reviews'),
 ]
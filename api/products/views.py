@@ -1,52 +1,112 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Category, Product
-from .serializers import CategoryParentFESerializer, ProductsByCategoryFESerializer,ProductDetailSerializer
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from .models import Category, Product, Review
+from .serializers import ProductsByCategoryFESerializer, ReviewSerializer
+from .fast_serializers import ProductFEFastSerializer
+from .search import get_search_engine
+from .facets import get_facet_engine, iter_bits, parse_filters
+from .detail_cache import get_product_document, get_product_version
+from .conditional import catalog_state, make_etag, not_modified_response, request_origin, set_validators
+from .category_tree import get_category_tree
+from .pagination import CategoryProductsPagination, ProductReviewsPagination
+from .rankings import RAIL_BY_TYPE
+from . import cache_tags
+from utils.response_cache import tag_response
 
 # ==========================
 # Lấy danh sách category cha + subcategories
 # ==========================
 class CategoryParentsAPIView(APIView):
+    response_cache_timeout = 60 * 10
+
     def get(self, request):
-        categories = Category.objects.filter(parent=None)
-        serializer = CategoryParentFESerializer(categories, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Cây category được cache trong process, chỉ load lại khi có thay đổi
+        tree = get_category_tree()
+        not_modified = get_conditional_response(request, etag=tree.etag)
+        if not_modified is not None:
+            return not_modified
+        response = HttpResponse(tree.body, content_type='application/json', status=status.HTTP_200_OK)
+        response.headers['ETag'] = tree.etag
+        return tag_response(response, cache_tags.CATEGORIES)
 
 
 # ==========================
 # Lấy sản phẩm theo category cụ thể
 # ==========================
 class CategoryProductsAPIView(APIView):
+    response_cache_timeout = 60
+
     def get(self, request, category_id):
+        # 304 theo version catalog, trước khi query / serialize
+        version, modified = catalog_state()
+        etag = make_etag('category-products', version, request_origin(request), request.get_full_path())
+        not_modified = not_modified_response(request, etag, modified)
+        if not_modified is not None:
+            return not_modified
+
+        # ?type=popular/sale/best_seller: lấy theo bảng xếp hạng đã tính sẵn
+        # còn lại phân trang theo cursor: ?cursor=...&sort=best_seller|newest&page_size=
+        context = {
+            'type': request.GET.get('type', None),
+            'paginator': CategoryProductsPagination(request),
+        }
         if category_id == 0:
             # Lấy 6 sản phẩm bất kỳ theo type: popular/sale/best_seller
-            mode = request.GET.get('type', None)  # ?type=popular
             fake_category = Category(id=0, name='All Products', slug='all')
-            serializer = ProductsByCategoryFESerializer(fake_category, context={'mode': mode})
+            serializer = ProductsByCategoryFESerializer(fake_category, context=context)
         else:
             category = Category.objects.filter(id=category_id).first()
             if not category:
                 return Response({'detail': 'Category not found'}, status=status.HTTP_404_NOT_FOUND)
-            serializer = ProductsByCategoryFESerializer(category)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+            serializer = ProductsByCategoryFESerializer(category, context=context)
+        data = serializer.data
+        response = set_validators(Response(data, status=status.HTTP_200_OK), etag, modified)
+        return tag_response(
+            response,
+            cache_tags.category_tag(category_id) if category_id else cache_tags.PRODUCTS,
+            cache_tags.RANKINGS if context['type'] in RAIL_BY_TYPE else None,
+            *cache_tags.listing_tags(data['products']),
+        )
 
 
 # ==========================
 # Lấy sản phẩm tất cả category con của parent
 # ==========================
 class ParentCategoryProductsAPIView(APIView):
+    response_cache_timeout = 60
+
     def get(self, request, parent_id):
+        version, modified = catalog_state()
+        etag = make_etag('parent-category-products', version, request_origin(request), request.get_full_path())
+        not_modified = not_modified_response(request, etag, modified)
+        if not_modified is not None:
+            return not_modified
+
+        context = {
+            'type': request.GET.get('type', None),
+            'paginator': CategoryProductsPagination(request),
+        }
         if parent_id == 0:
-            mode = request.GET.get('type', None)
             fake_category = Category(id=0, name='All Products', slug='all')
-            serializer = ProductsByCategoryFESerializer(fake_category, context={'mode': mode})
+            serializer = ProductsByCategoryFESerializer(fake_category, context=context)
         else:
             parent = Category.objects.filter(id=parent_id).first()
             if not parent:
                 return Response({'detail': 'Parent category not found'}, status=status.HTTP_404_NOT_FOUND)
-            serializer = ProductsByCategoryFESerializer(parent, context={'mode': 'parent'})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+            serializer = ProductsByCategoryFESerializer(parent, context={**context, 'mode': 'parent'})
+        data = serializer.data
+        response = set_validators(Response(data, status=status.HTTP_200_OK), etag, modified)
+        # CATEGORIES: cây con của parent đổi khi category được thêm / chuyển / xóa
+        return tag_response(
+            response,
+            cache_tags.category_tag(parent_id) if parent_id else cache_tags.PRODUCTS,
+            cache_tags.CATEGORIES,
+            cache_tags.RANKINGS if context['type'] in RAIL_BY_TYPE else None,
+            *cache_tags.listing_tags(data['products']),
+        )
 
 # ======================================================
 #   Lấy chi tiết sản phẩm theo ID
@@ -54,15 +114,129 @@ class ParentCategoryProductsAPIView(APIView):
 class ProductDetailAPIView(APIView):
     """
     GET /api/products/<int:product_id>/
-    Trả về chi tiết sản phẩm (brand, variants, reviews, images,...)
+    Trả về chi tiết sản phẩm (brand, variants, review mới nhất + thống kê, images,...)
     """
+    response_cache_timeout = 60 * 5
     def get(self, request, product_id):
-        product = Product.objects.filter(id=product_id, is_available=True).first()
-        if not product:
+        # If-None-Match: chỉ cần version (1 lần đọc cache), chưa đụng tới document
+        version = get_product_version(product_id)
+        etag = make_etag('product', product_id, version, request_origin(request))
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        # Document JSON được build sẵn và chỉ build lại khi sản phẩm thay đổi
+        document = get_product_document(product_id, request=request, version=version)
+        if not document:
             return Response(
                 {"detail": "Product not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = ProductDetailSerializer(product, context={"request": request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        # If-Modified-Since (không có If-None-Match)
+        not_modified = not_modified_response(request, etag, document['last_modified'])
+        if not_modified is not None:
+            return not_modified
+        response = HttpResponse(document['body'], content_type='application/json', status=status.HTTP_200_OK)
+        set_validators(response, etag, document['last_modified'])
+        return tag_response(response, cache_tags.product_tag(product_id), cache_tags.DETAILS)
+
+
+# ======================================================
+#   Danh sách review của sản phẩm (phân trang cursor)
+# ======================================================
+class ProductReviewsAPIView(APIView):
+    """
+    GET /api/products/<int:product_id>/reviews/?cursor=...&sort=newest|oldest&page_size=10
+    """
+    response_cache_timeout = 60
+    def get(self, request, product_id):
+        paginator = ProductReviewsPagination(request)
+        # Review thay đổi làm tăng version của sản phẩm
+        etag = make_etag('reviews', product_id, get_product_version(product_id), request.get_full_path())
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        # Như chi tiết sản phẩm: sản phẩm ngừng bán thì không có review
+        if not Product.objects.filter(id=product_id, is_available=True).exists():
+            return Response({"detail": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        # user lấy cùng query (JOIN), không query riêng cho từng review
+        reviews = paginator.paginate_queryset(
+            Review.objects.filter(product_id=product_id).select_related('user')
+        )
+        response = set_validators(Response({
+            'results': ReviewSerializer(reviews, many=True).data,
+            'next': paginator.next_cursor,
+            'previous': paginator.previous_cursor,
+        }, status=status.HTTP_200_OK), etag)
+        return tag_response(response, cache_tags.product_tag(product_id), cache_tags.DETAILS)
+
+
+
+# ======================================================
+#   Tìm kiếm sản phẩm (BM25 trên name, description, brand, category)
+# ======================================================
+class ProductSearchAPIView(APIView):
+    """
+    GET /api/products/search/?q=<từ khóa>&limit=20
+    Không phân biệt dấu: "dien thoai" khớp "Điện thoại".
+    """
+    default_limit = 20
+    max_limit = 100
+    response_cache_timeout = 30
+
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        try:
+            limit = int(request.GET.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+
+        hits = get_search_engine().search(query, limit=limit) if query else []
+        results = ProductFEFastSerializer(request).serialize_ids(
+            [product_id for product_id, _ in hits], Product.objects.filter(is_available=True)
+        )
+        response = Response({'query': query, 'results': results}, status=status.HTTP_200_OK)
+        return tag_response(response, cache_tags.PRODUCTS, cache_tags.CATEGORIES, cache_tags.BRANDS)
+
+
+
+# ======================================================
+#   Lọc theo facet (brand, category, khoảng giá, màu, size) + số đếm
+# ======================================================
+class ProductFacetsAPIView(APIView):
+    """
+    GET /api/products/facets/?brand=1&brand=2&category=3&price=100-500&color=Black&size=M&limit=24
+    Cùng facet: OR, khác facet: AND. Số đếm của mỗi facet tính theo các
+    bộ lọc còn lại (chọn thêm giá trị trong cùng facet vẫn thấy số đếm).
+    """
+    default_limit = 24
+    max_limit = 100
+    response_cache_timeout = 30
+
+    def get(self, request):
+        try:
+            limit = int(request.GET.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+
+        (matched, counts), labels = get_facet_engine().query(parse_filters(request.GET))
+        ids = list(iter_bits(matched, limit))
+
+        facets = {
+            facet: [
+                {'value': value, 'label': labels.get(facet, {}).get(value, value), 'count': count}
+                for value, count in sorted(values.items(), key=lambda item: (-item[1], str(item[0])))
+            ]
+            for facet, values in counts.items()
+        }
+        response = Response({
+            'count': matched.bit_count(),
+            'facets': facets,
+            'results': ProductFEFastSerializer(request).serialize_ids(ids),
+        }, status=status.HTTP_200_OK)
+        return tag_response(response, cache_tags.PRODUCTS, cache_tags.CATEGORIES, cache_tags.BRANDS)
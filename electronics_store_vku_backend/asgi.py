@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'electronics_store_vku_backend.settings')
+# Dưới ASGI các endpoint đọc catalog dùng view async (ASYNC_CATALOG_VIEWS=False để tắt)
+os.environ.setdefault('ASYNC_CATALOG_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -47,16 +47,23 @@ INSTALLED_APPS = [
     'api.cart',
     'api.orders',
     'api.payments',
+    'api.jobs',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Server-Timing + log request chậm (đặt ngoài cùng để đo cả cache HIT)
+    'utils.request_metrics.RequestMetricsMiddleware',
+    # Profile theo yêu cầu (X-Profile) hoặc theo tỉ lệ PROFILER_SAMPLE_RATE
+    'utils.profiling.SamplingProfilerMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Cache response của các view có response_cache_timeout (api/products)
+    'utils.response_cache.ResponseCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'electronics_store_vku_backend.urls'
@@ -103,6 +110,111 @@ DATABASES = {
     }
 }
 
+# DB_ENGINE=sqlite: chạy với SQLite (benchmark / load test cục bộ, xem bench_endpoints)
+if os.getenv("DB_ENGINE") == "sqlite":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("SQLITE_PATH", str(BASE_DIR / 'db.sqlite3')),
+            # Test DB dạng file: DB in-memory (shared cache) khóa cả bảng khi
+            # nhiều thread cùng ghi (worker của api/jobs)
+            'TEST': {'NAME': os.getenv("SQLITE_TEST_PATH", str(BASE_DIR / 'test_db.sqlite3'))},
+            # BEGIN IMMEDIATE: transaction ghi chờ lock (timeout) thay vì lỗi
+            # "database is locked" khi nâng từ đọc lên ghi
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+        }
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Đổi BACKEND (Redis, Memcached, file-based...) mà không cần sửa code.
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "locmem")
+
+# Version của key cache (utils/cache_versions.py): phải dùng chung giữa các
+# process, nếu không invalidation (user, chi tiết sản phẩm, cây category...)
+# chỉ có hiệu lực trong process đã gọi. Mặc định Redis (CACHE_REDIS_URL):
+# INCR / SET NX atomic giữa mọi process, đọc / ghi O(1). Redis nên dùng
+# maxmemory-policy noeviction hoặc volatile-* (key version không có TTL).
+# Chỉ cho môi trường dev (chọn rõ bằng CACHE_VERSIONS_BACKEND):
+# "file": chung trong một máy nhưng mỗi lần ghi quét cả thư mục (cull) và
+# incr / add không atomic; "locmem": chỉ khi chạy một process.
+CACHE_VERSIONS_BACKEND = os.getenv("CACHE_VERSIONS_BACKEND", "redis")
+CACHE_VERSIONS_BACKENDS = {
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv("CACHE_REDIS_URL", "redis://127.0.0.1:6379/1"),
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv("CACHE_VERSIONS_DIR", str(BASE_DIR / 'var' / 'cache_versions')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'vku-elec-store-versions',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'vku-elec-store',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Response cache (utils/response_cache.py). "file": dùng chung giữa các
+    # worker trên cùng máy; "locmem": entry riêng từng process (invalidate
+    # vẫn tới mọi process qua RESPONSE_CACHE_TAGS_ALIAS).
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv("RESPONSE_CACHE_DIR", str(BASE_DIR / 'var' / 'response_cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    } if RESPONSE_CACHE_BACKEND == 'file' else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'vku-elec-store-responses',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+    'versions': CACHE_VERSIONS_BACKENDS[CACHE_VERSIONS_BACKEND],
+}
+
+CACHE_VERSIONS_ALIAS = 'versions'
+
+RESPONSE_CACHE_ALIAS = 'responses'
+# Mốc invalidate của tag (invalidate_tags): cache dùng chung giữa các process
+RESPONSE_CACHE_TAGS_ALIAS = CACHE_VERSIONS_ALIAS
+# Single-flight: thời gian giữ lock khi build / thời gian request khác chờ (giây)
+RESPONSE_CACHE_LOCK_TIMEOUT = 10
+RESPONSE_CACHE_LOCK_WAIT = 2
+
+# Document JSON chi tiết sản phẩm (api/products/detail_cache.py). Key chứa
+# version trong CACHE_VERSIONS_ALIAS nên alias này có thể riêng từng process
+PRODUCT_DETAIL_CACHE_ALIAS = 'default'
+PRODUCT_DETAIL_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Số sản phẩm giữ lại cho mỗi rail popular / sale / best sale
+# (python manage.py refresh_rankings)
+PRODUCT_RANKING_SIZE = 100
+
+# File index tìm kiếm sản phẩm (python manage.py build_search_index)
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", str(BASE_DIR / 'var' / 'search_index.bin'))
+# Change log (SEARCH_INDEX_PATH + ".log") lớn hơn giới hạn này thì gộp vào snapshot
+SEARCH_INDEX_LOG_MAX_BYTES = 4 * 1024 * 1024
+
+# Mốc giá cho facet "price" (api/products/facets.py): 0-100, 100-500, ..., 2000-
+FACET_PRICE_BANDS = [0, 100, 500, 1000, 2000]
+# Change log của facet: process cách quá số version / quá thời gian này thì dựng lại toàn bộ
+FACET_CHANGE_LOG_MAX = 1000
+FACET_CHANGE_LOG_TIMEOUT = 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -147,9 +259,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication + cache User trong process (api/accounts/authentication.py)
+        'api.accounts.authentication.CachedJWTAuthentication',
     ),
 }
+# Cache User của CachedJWTAuthentication: số user tối đa mỗi process, số giây sống
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_TTL = 60
 
 from datetime import timedelta
 
@@ -163,10 +279,67 @@ SIMPLE_JWT = {
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(os.path.join(BASE_DIR, ".env"))
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Backend SMTP có pool kết nối dùng lại giữa các lần gửi (utils/smtp_pool.py)
+EMAIL_BACKEND = 'utils.smtp_pool.PooledEmailBackend'
 EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
 EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "True") == "True"
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
-DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
\ No newline at end of file
+DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+EMAIL_TIMEOUT = 30
+EMAIL_POOL_SIZE = int(os.getenv("EMAIL_POOL_SIZE", 4))   # số kết nối SMTP tối đa mỗi process
+EMAIL_POOL_BATCH_SIZE = 50       # số message mỗi kết nối trong một lần send_messages()
+EMAIL_POOL_MAX_IDLE = 120        # giây: kết nối rảnh lâu hơn bị đóng
+EMAIL_POOL_CHECK_IDLE = 15       # giây: kết nối rảnh lâu hơn được NOOP trước khi dùng
+EMAIL_POOL_MAX_MESSAGES = 100    # số message tối đa trên một kết nối
+# View async cho các endpoint đọc catalog (api/products/async_views.py).
+# asgi.py bật mặc định; WSGI giữ APIView sync.
+ASYNC_CATALOG_VIEWS = os.getenv("ASYNC_CATALOG_VIEWS", "False") == "True"
+# Số thread (= số connection database) cho các query chạy song song (utils/async_db.py)
+ASYNC_DB_THREADS = int(os.getenv("ASYNC_DB_THREADS", 16))
+# Thời gian (giây) giữ connection của các thread đó giữa các lần gọi (None: không giới hạn)
+ASYNC_DB_CONN_MAX_AGE = int(os.getenv("ASYNC_DB_CONN_MAX_AGE", 60))
+
+# Đo request (utils/request_metrics.py)
+REQUEST_METRICS_SERVER_TIMING = os.getenv("REQUEST_METRICS_SERVER_TIMING", "True") == "True"
+REQUEST_METRICS_SLOW_MS = int(os.getenv("REQUEST_METRICS_SLOW_MS", 500))
+REQUEST_METRICS_TOP_QUERIES = 5
+
+# Sampling profiler (utils/profiling.py): file .collapsed trong PROFILER_DIR
+PROFILER_SECRET = os.getenv("PROFILER_SECRET")
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", 0))
+PROFILER_INTERVAL_MS = 5
+PROFILER_MAX_SECONDS = 30
+PROFILER_MAX_CONCURRENT = 2
+PROFILER_DIR = os.getenv("PROFILER_DIR", str(BASE_DIR / 'var' / 'profiles'))
+# Số file profile giữ lại trong PROFILER_DIR (file cũ nhất bị xóa; 0: không giới hạn)
+PROFILER_MAX_FILES = int(os.getenv("PROFILER_MAX_FILES", 200))
+
+# Hàng đợi việc nền (api/jobs): chạy bằng `python manage.py run_workers`
+JOB_MAX_ATTEMPTS = 5
+JOB_BACKOFF_BASE = 5        # giây, nhân đôi sau mỗi lần lỗi
+JOB_BACKOFF_MAX = 60 * 60
+JOB_LOCK_TIMEOUT = 60 * 5   # job RUNNING quá thời gian này được trả lại hàng đợi
+
+# Thông báo có hàng trở lại (api/products/back_in_stock.py)
+BACK_IN_STOCK_CHUNK_SIZE = 500     # số đăng ký mỗi lô (một lần gửi + một UPDATE)
+BACK_IN_STOCK_JOB_SECONDS = 60     # mỗi job chạy tối đa N giây rồi thêm job tiếp theo
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # Mỗi request chậm là một dòng JSON
+        'slow_requests': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
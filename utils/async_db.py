@@ -0,0 +1,69 @@
+# utils/async_db.py
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    # Số thread = số connection database tối đa mà các truy vấn song song dùng
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'ASYNC_DB_THREADS', 16),
+                    thread_name_prefix='async-db',
+                )
+    return _executor
+
+
+def _keep_connections():
+    # Connection mới mở trong thread của pool sống ASYNC_DB_CONN_MAX_AGE giây
+    # thay vì CONN_MAX_AGE của request (=0: mỗi query một lần connect), kiểm
+    # tra bằng health check trước lần dùng tiếp theo
+    max_age = getattr(settings, 'ASYNC_DB_CONN_MAX_AGE', 60)
+    for conn in connections.all(initialized_only=True):
+        if conn.connection is not None and getattr(conn, '_pool_connection', None) is not conn.connection:
+            conn._pool_connection = conn.connection
+            conn.close_at = None if max_age is None else time.monotonic() + max_age
+            conn.health_check_enabled = True
+
+
+def _with_connection(func):
+    # Mỗi thread trong pool có connection riêng, dùng lại giữa các lời gọi;
+    # connection lỗi / hết hạn bị đóng như khi kết thúc một request
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _keep_connections()
+            close_old_connections()
+    return wrapper
+
+
+def run_in_pool(func, *args, **kwargs):
+    """
+    Chạy một hàm sync (query ORM) trong pool thread riêng, không dùng chung
+    thread với phần còn lại của request: nhiều lời gọi có thể chạy song song.
+    """
+    return sync_to_async(_with_connection(func), thread_sensitive=False, executor=_get_executor())(*args, **kwargs)
+
+
+async def gather_in_pool(*calls):
+    """
+    calls: (func, *args), ... Các query độc lập chạy đồng thời, mỗi query
+    một connection. Trả về kết quả theo đúng thứ tự của `calls`.
+    """
+    return await asyncio.gather(*(run_in_pool(func, *args) for func, *args in calls))
@@ -0,0 +1,74 @@
+# utils/cache_versions.py
+
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+# Version của key chưa từng được bump. Key version theo id (sản phẩm, user)
+# chỉ được tạo khi ghi (bump_version): đọc, kể cả id không tồn tại, không tạo
+# key nên store không phình theo số id từng được đọc.
+MISSING_VERSION = 0
+
+
+def _initial_version():
+    # Khởi tạo theo thời gian (ms) thay vì 1: nếu cache bị xóa/evict thì version
+    # mới vẫn lớn hơn các version cũ, không bao giờ "quay lại" một key cũ.
+    # (Evict rồi đọc lại trả về MISSING_VERSION: store version nên không evict,
+    # xem CACHE_VERSIONS_BACKEND trong settings.)
+    return int(time.time() * 1000)
+
+
+def _cache(alias):
+    # Mặc định: alias dùng chung giữa các process (CACHE_VERSIONS_ALIAS),
+    # để bump_version ở một worker có hiệu lực ở mọi worker
+    return caches[alias or getattr(settings, 'CACHE_VERSIONS_ALIAS', 'default')]
+
+
+def get_version(name, alias=None, create=False):
+    """
+    Trả về version hiện tại của `name` (MISSING_VERSION nếu chưa từng bump).
+
+    create=True: tạo key khi chưa có, chỉ dùng cho số ít key cố định (cây
+    category, facet, catalog...): version tạo theo thời gian nên sau khi
+    store bị xóa, dữ liệu đã load theo version cũ không bị coi là mới nhất.
+    """
+    cache = _cache(alias)
+    version = cache.get(f"version:{name}")
+    if version is None:
+        if not create:
+            return MISSING_VERSION
+        cache.add(f"version:{name}", _initial_version(), timeout=None)
+        version = cache.get(f"version:{name}")
+    return version
+
+
+def get_versions(names, alias=None):
+    """
+    Lấy version của nhiều key trong một lần gọi cache.
+    Trả về dict {name: version}.
+    """
+    names = list(names)
+    cache = _cache(alias)
+    found = cache.get_many([f"version:{name}" for name in names])
+    return {name: found.get(f"version:{name}", MISSING_VERSION) for name in names}
+
+
+def bump_version(name, alias=None):
+    """
+    Tăng version của `name`; mọi key cache được dựng từ version cũ sẽ không
+    còn được đọc tới nữa và tự hết hạn theo timeout.
+    """
+    cache = _cache(alias)
+    try:
+        return cache.incr(f"version:{name}")
+    except ValueError:
+        # Key chưa tồn tại (hoặc đã bị evict)
+        cache.add(f"version:{name}", _initial_version(), timeout=None)
+        return cache.incr(f"version:{name}")
+
+
+def bump_versions(names, alias=None):
+    for name in set(names):
+        bump_version(name, alias=alias)
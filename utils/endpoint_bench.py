@@ -0,0 +1,231 @@
+# utils/endpoint_bench.py
+
+import asyncio
+import json
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from django.db import connection
+
+
+# ==========================
+# Khai báo endpoint
+# ==========================
+@dataclass
+class EndpointCase:
+    name: str
+    build: object  # callable(ctx, i) -> (path, data): request thứ i
+    method: str = 'get'
+    expected_status: tuple = (200,)
+    # Chuẩn bị dữ liệu riêng cho case (không tính thời gian), vd user / OTP
+    setup: object = None  # callable(ctx, count) hoặc None
+
+
+def percentile(sorted_values, p):
+    """
+    Percentile kiểu nearest-rank (luôn là một mẫu thật, ổn định giữa các lần chạy).
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class QueryCounter:
+    """
+    Đếm số query SQL bằng execute_wrapper (không bật debug cursor như
+    CaptureQueriesContext nên gần như không ảnh hưởng tới latency).
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+# ==========================
+# Chạy + tổng hợp
+# ==========================
+def _send(client, case, ctx, i):
+    path, data = case.build(ctx, i)
+    if case.method == 'get':
+        return client.get(path, data)
+    return getattr(client, case.method)(path, data, content_type='application/json')
+
+
+def run_case(client, case, ctx, iterations, warmup=0):
+    """
+    Gửi `warmup` + `iterations` request qua Django test client (đủ URL
+    resolver + middleware + view + render), chỉ đo các request sau warmup.
+    """
+    if case.setup is not None:
+        case.setup(ctx, warmup + iterations)
+    for i in range(warmup):
+        _send(client, case, ctx, i)
+
+    latencies, queries, sizes = [], [], []
+    statuses = Counter()
+    for i in range(warmup, warmup + iterations):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            response = _send(client, case, ctx, i)
+            elapsed = time.perf_counter() - started
+        latencies.append(elapsed * 1000)
+        queries.append(counter.count)
+        sizes.append(len(response.content))
+        statuses[response.status_code] += 1
+    return summarize(latencies, queries, sizes, statuses, case.expected_status)
+
+
+def summarize(latencies, queries, sizes, statuses, expected_status=(200,)):
+    ordered = sorted(latencies)
+    n = len(ordered)
+    return {
+        'requests': n,
+        'p50_ms': round(percentile(ordered, 50), 3),
+        'p95_ms': round(percentile(ordered, 95), 3),
+        'p99_ms': round(percentile(ordered, 99), 3),
+        'mean_ms': round(sum(ordered) / n, 3),
+        'max_ms': round(ordered[-1], 3),
+        'queries_avg': round(sum(queries) / n, 2),
+        'queries_max': max(queries),
+        'bytes_avg': round(sum(sizes) / n),
+        'bytes_max': max(sizes),
+        'status': {str(code): count for code, count in sorted(statuses.items())},
+        'errors': sum(count for code, count in statuses.items() if code not in expected_status),
+    }
+
+
+# ==========================
+# Lưu / so sánh kết quả
+# ==========================
+def save_results(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(baseline, current, threshold=0.2, min_delta_ms=1.0):
+    """
+    So sánh 2 lần chạy ({"meta": ..., "endpoints": {name: summary}}).
+    Trả về list thông báo regression:
+    - p95 chậm hơn quá `threshold` (tỉ lệ) và quá `min_delta_ms` (bỏ nhiễu ở endpoint rất nhanh)
+    - số query tối đa tăng
+    - bytes trung bình tăng quá `threshold`
+    - có request lỗi mà baseline không có
+    """
+    regressions = []
+    for name, now in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            continue
+        if now['p95_ms'] > before['p95_ms'] * (1 + threshold) and now['p95_ms'] - before['p95_ms'] > min_delta_ms:
+            regressions.append(f"{name}: p95 {before['p95_ms']:.2f}ms -> {now['p95_ms']:.2f}ms")
+        if now['queries_max'] > before['queries_max']:
+            regressions.append(f"{name}: queries {before['queries_max']} -> {now['queries_max']}")
+        if now['bytes_avg'] > before['bytes_avg'] * (1 + threshold):
+            regressions.append(f"{name}: bytes {before['bytes_avg']} -> {now['bytes_avg']}")
+        if now['errors'] and not before['errors']:
+            regressions.append(f"{name}: {now['errors']} error response(s) {now['status']}")
+    return regressions
+
+
+# ==========================
+# Load test qua HTTP (so sánh triển khai WSGI / ASGI)
+# ==========================
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        size = 0
+        while True:
+            length = int((await reader.readline()).split(b';')[0], 16)
+            if length == 0:
+                await reader.readline()
+                break
+            size += len(await reader.readexactly(length))
+            await reader.readline()
+    else:
+        size = len(await reader.readexactly(int(headers.get('content-length', 0))))
+    keep_alive = headers.get('connection', '').lower() != 'close'
+    return status, size, keep_alive
+
+
+async def run_load(base_url, paths, concurrency=50, duration=10.0, headers=None):
+    """
+    `concurrency` kết nối keep-alive gửi GET liên tục (xoay vòng `paths`)
+    trong `duration` giây. Trả về summary như run_case + requests_per_sec.
+    """
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    extra = ''.join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+    requests = [
+        f"GET {url.path.rstrip('/')}{path} HTTP/1.1\r\nHost: {url.netloc}\r\n{extra}\r\n".encode()
+        for path in paths
+    ]
+    latencies, sizes = [], []
+    statuses = Counter()
+    failures = Counter()  # lỗi kết nối / timeout
+    deadline = time.perf_counter() + duration
+
+    async def worker(offset):
+        connection = None
+        i = offset
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = await asyncio.open_connection(host, port)
+                reader, writer = connection
+                writer.write(requests[i % len(requests)])
+                await writer.drain()
+                status, size, keep_alive = await _read_response(reader)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+                failures['transport'] += 1
+                if connection is not None:
+                    connection[1].close()
+                connection = None
+                await asyncio.sleep(0.01)
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            sizes.append(size)
+            statuses[status] += 1
+            if not keep_alive:
+                writer.close()
+                connection = None
+            i += 1
+        if connection is not None:
+            connection[1].close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    if not latencies:
+        return {'requests': 0, 'requests_per_sec': 0, 'errors': failures['transport'], 'status': {}}
+    summary = summarize(latencies, [0] * len(latencies), sizes, statuses)
+    del summary['queries_avg'], summary['queries_max']
+    summary['errors'] += failures['transport']
+    summary['transport_errors'] = failures['transport']
+    summary['requests_per_sec'] = round(len(latencies) / elapsed, 1)
+    summary['concurrency'] = concurrency
+    return summary
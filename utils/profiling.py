@@ -0,0 +1,216 @@
+# utils/profiling.py
+
+import functools
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+_SLUG_RE = re.compile(r'[^a-zA-Z0-9]+')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==========================
+# Sampler
+# ==========================
+# Nhãn theo code object: mỗi hàm chỉ tính nhãn một lần, không lặp qua
+# sys.path ở mỗi frame của mỗi mẫu
+_labels = {}
+_MAX_LABELS = 50000
+
+
+@functools.lru_cache(maxsize=4)
+def _path_prefixes(path):
+    # Prefix dài nhất trước; tính lại chỉ khi sys.path thay đổi
+    return sorted((p for p in path if p), key=len, reverse=True)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for prefix in _path_prefixes(tuple(sys.path)):
+            if filename.startswith(prefix):
+                filename = filename[len(prefix):].lstrip(os.sep)
+                break
+        # ";" là ký tự phân tách frame của định dạng collapsed
+        label = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+        if len(_labels) >= _MAX_LABELS:
+            _labels.clear()
+        _labels[code] = label
+    return label
+
+
+class StackSampler:
+    """
+    Lấy mẫu stack của một thread sau mỗi `interval` giây (sys._current_frames),
+    gom thành collapsed stack: "root;...;leaf count" (flamegraph.pl, speedscope).
+    Chi phí chỉ phụ thuộc tần số lấy mẫu, không phụ thuộc số lời gọi hàm như cProfile.
+    """
+
+    def __init__(self, thread_id, interval=0.005, max_samples=10000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_samples = max_samples
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval) and self.samples < self.max_samples:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(labels))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+# ==========================
+# Middleware
+# ==========================
+class SamplingProfilerMiddleware:
+    """
+    Profile từng request bằng StackSampler, ghi file .collapsed vào PROFILER_DIR
+    và trả tên file trong header X-Profile-File.
+
+    Request được profile khi:
+    - có header "X-Profile: <PROFILER_SECRET>", hoặc
+    - có header X-Profile và JWT (Authorization: Bearer) của user staff, hoặc
+    - được chọn ngẫu nhiên theo PROFILER_SAMPLE_RATE (0..1).
+
+    Giới hạn chi phí: tối đa PROFILER_MAX_CONCURRENT request được profile cùng
+    lúc (request còn lại chạy bình thường), tối đa PROFILER_MAX_SECONDS giây
+    lấy mẫu mỗi request, chu kỳ lấy mẫu PROFILER_INTERVAL_MS; PROFILER_DIR
+    chỉ giữ PROFILER_MAX_FILES file mới nhất.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._slots = threading.BoundedSemaphore(_setting('PROFILER_MAX_CONCURRENT', 2))
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.should_profile(request) or not self._slots.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            sampler = self.start_sampler()
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.stop()
+            response.headers['X-Profile-File'] = self.write_profile(request, sampler)
+            return response
+        finally:
+            self._slots.release()
+
+    async def __acall__(self, request):
+        # Dưới ASGI, thread được lấy mẫu là event loop: stack gồm coroutine
+        # đang chạy của mọi request, không chỉ request này
+        if self._secret_matches(request) is False:
+            wanted = await sync_to_async(self._is_staff)(request)
+        else:
+            wanted = self.should_profile(request)
+        if not wanted or not self._slots.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            sampler = self.start_sampler()
+            try:
+                response = await self.get_response(request)
+            finally:
+                sampler.stop()
+            response.headers['X-Profile-File'] = await sync_to_async(self.write_profile)(request, sampler)
+            return response
+        finally:
+            self._slots.release()
+
+    def start_sampler(self):
+        interval = _setting('PROFILER_INTERVAL_MS', 5) / 1000
+        max_samples = int(_setting('PROFILER_MAX_SECONDS', 30) / interval)
+        return StackSampler(threading.get_ident(), interval, max_samples).start()
+
+    def _secret_matches(self, request):
+        """
+        None: không có header X-Profile; True / False: header có khớp PROFILER_SECRET không.
+        """
+        header = request.META.get(PROFILE_HEADER)
+        if header is None:
+            return None
+        secret = _setting('PROFILER_SECRET', None)
+        return bool(secret) and hmac.compare_digest(header.encode(), secret.encode())
+
+    def should_profile(self, request):
+        matches = self._secret_matches(request)
+        if matches is not None:
+            # Header không khớp secret: chỉ profile cho staff (JWT)
+            return matches or self._is_staff(request)
+        rate = _setting('PROFILER_SAMPLE_RATE', 0)
+        return rate > 0 and random.random() < rate
+
+    def _is_staff(self, request):
+        from api.accounts.authentication import CachedJWTAuthentication
+        from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+        try:
+            result = CachedJWTAuthentication().authenticate(request)
+        except (InvalidToken, AuthenticationFailed):
+            return False
+        return bool(result and result[0].is_staff)
+
+    def write_profile(self, request, sampler):
+        directory = _setting('PROFILER_DIR', os.path.join(settings.BASE_DIR, 'var', 'profiles'))
+        os.makedirs(directory, exist_ok=True)
+        slug = _SLUG_RE.sub('-', request.path).strip('-')[:80] or 'root'
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method.lower()}-{slug}-{uuid.uuid4().hex[:6]}.collapsed"
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            f.write(sampler.collapsed())
+        self._rotate(directory)
+        return name
+
+    def _rotate(self, directory):
+        # Tên file bắt đầu bằng thời điểm ghi: xóa các file cũ nhất
+        limit = _setting('PROFILER_MAX_FILES', 200)
+        if not limit:
+            return
+        names = sorted(name for name in os.listdir(directory) if name.endswith('.collapsed'))
+        for name in names[:-limit]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                # Process khác vừa xóa
+                pass
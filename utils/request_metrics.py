@@ -0,0 +1,204 @@
+# utils/request_metrics.py
+
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+slow_logger = logging.getLogger('slow_requests')
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    Dạng chuẩn hóa của câu SQL để gom các query cùng kiểu:
+    bỏ giá trị literal, gộp IN (%s, %s, ...) thành IN (...).
+    'SELECT ... WHERE id = 12 LIMIT 21' -> 'SELECT ... WHERE id = ? LIMIT ?'
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==========================
+# Số liệu của một request
+# ==========================
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.fingerprints = {}  # fingerprint -> [số lần, tổng thời gian]
+        self._render_started = None
+        # View async có thể chạy nhiều query song song ở nhiều thread
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            key = fingerprint(sql)
+            with self._lock:
+                self.queries += 1
+                self.db_time += elapsed
+                stats = self.fingerprints.setdefault(key, [0, 0.0])
+                stats[0] += 1
+                stats[1] += elapsed
+
+    def start_render(self):
+        self._render_started = time.perf_counter()
+
+    def end_render(self, response=None):
+        if self._render_started is not None:
+            self.render_time += time.perf_counter() - self._render_started
+            self._render_started = None
+
+    @property
+    def duplicates(self):
+        # Cùng fingerprint chạy nhiều lần trong một request: dấu hiệu N+1
+        return {sql: stats for sql, stats in self.fingerprints.items() if stats[0] > 1}
+
+    def top_queries(self, limit):
+        ranked = sorted(self.fingerprints.items(), key=lambda item: (-item[1][1], -item[1][0]))
+        return [
+            {'sql': sql, 'count': count, 'ms': round(total * 1000, 2)}
+            for sql, (count, total) in ranked[:limit]
+        ]
+
+    def server_timing(self, total):
+        app = max(total - self.db_time - self.render_time, 0)
+        parts = [
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"',
+            f'render;dur={self.render_time * 1000:.2f}',
+            f'app;dur={app * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ]
+        duplicated = sum(count - 1 for count, _ in self.duplicates.values())
+        if duplicated:
+            parts.append(f'dup;desc="{duplicated} duplicate queries"')
+        return ', '.join(parts)
+
+
+# ==========================
+# execute_wrapper cố định trên mọi connection
+# ==========================
+# Request hiện tại nằm trong contextvar: sync_to_async mang context sang
+# thread chạy query, nên query của view async (kể cả chạy song song ở
+# nhiều thread / connection) vẫn được tính cho đúng request.
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    install(connection)
+
+
+connection_created.connect(_on_connection_created, dispatch_uid='request_metrics')
+
+
+# ==========================
+# Middleware
+# ==========================
+class RequestMetricsMiddleware:
+    """
+    Đo mỗi request: số query, tổng thời gian DB, query trùng fingerprint
+    (N+1), thời gian render (serialize JSON) và tổng thời gian.
+
+    - Gắn header Server-Timing (REQUEST_METRICS_SERVER_TIMING).
+    - Request chậm hơn REQUEST_METRICS_SLOW_MS được ghi vào logger
+      "slow_requests" (1 dòng JSON) kèm các fingerprint tốn thời gian nhất.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        request._request_metrics = metrics
+        token = _current.set(metrics)
+        try:
+            # Connection đã mở trước khi middleware được load
+            for connection in connections.all():
+                install(connection)
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        request._request_metrics = metrics
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        if _setting('REQUEST_METRICS_SERVER_TIMING', True):
+            response.headers['Server-Timing'] = metrics.server_timing(total)
+        if total * 1000 >= _setting('REQUEST_METRICS_SLOW_MS', 500):
+            self.log_slow_request(request, response, metrics, total)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF Response là SimpleTemplateResponse: render() chạy ngay sau hook này
+        metrics = getattr(request, '_request_metrics', None)
+        if metrics is not None:
+            metrics.start_render()
+            response.add_post_render_callback(metrics.end_render)
+        return response
+
+    def log_slow_request(self, request, response, metrics, total):
+        record = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'render_ms': round(metrics.render_time * 1000, 2),
+            'queries': metrics.queries,
+            'duplicates': {sql: count for sql, (count, _) in metrics.duplicates.items()},
+            'top_queries': metrics.top_queries(_setting('REQUEST_METRICS_TOP_QUERIES', 5)),
+        }
+        slow_logger.warning(json.dumps(record, ensure_ascii=False), extra={'request_metrics': record})
@@ -0,0 +1,237 @@
+# utils/response_cache.py
+
+import asyncio
+import hashlib
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+# Header được lưu lại cùng body và trả về khi HIT
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _tags_cache():
+    # Mốc invalidate của tag phải dùng chung giữa các process (entry thì có
+    # thể riêng từng process): invalidate ở một worker bỏ entry ở mọi worker
+    return caches[getattr(settings, 'RESPONSE_CACHE_TAGS_ALIAS', None)
+                  or getattr(settings, 'CACHE_VERSIONS_ALIAS', 'default')]
+
+
+# ==========================
+# Tag
+# ==========================
+# Mỗi tag lưu thời điểm bị invalidate gần nhất. Entry được tạo lúc T (trước
+# khi view đọc database) còn dùng được nếu mọi tag của nó bị invalidate
+# trước T: ghi đè diễn ra trong lúc view đang chạy cũng làm entry đó hết hạn.
+def _tag_key(tag):
+    return f"response-tag:{tag}"
+
+
+def invalidate_tags(tags):
+    tags = set(tags)
+    if tags:
+        now = time.time()
+        _tags_cache().set_many({_tag_key(tag): now for tag in tags}, timeout=None)
+
+
+def invalidate_tags_on_commit(tags):
+    tags = [tag for tag in tags if tag]
+    if tags:
+        transaction.on_commit(lambda: invalidate_tags(tags))
+
+
+def _tags_invalidated_at(tags):
+    cache = _tags_cache()
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # Không biết lần invalidate gần nhất (cache mới / bị evict): coi như vừa xảy ra
+        now = time.time()
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        found.update(cache.get_many(missing))
+    return max(found.values(), default=0)
+
+
+def _register_tags(tags):
+    # Tag chưa từng bị invalidate: ghi mốc 0 để entry vừa lưu được dùng ngay
+    cache = _tags_cache()
+    for tag in tags:
+        cache.add(_tag_key(tag), 0, timeout=None)
+
+
+def tag_response(response, *tags):
+    """
+    Gắn tag (vd "product:12", "category:3") cho response để middleware lưu cache.
+    """
+    existing = getattr(response, 'cache_tags', None) or set()
+    response.cache_tags = existing | {tag for tag in tags if tag}
+    return response
+
+
+# ==========================
+# Middleware
+# ==========================
+class ResponseCacheMiddleware:
+    """
+    Cache response GET ẩn danh của các view có `response_cache_timeout`
+    (TTL riêng từng endpoint, giây). Backend là một cache alias của Django
+    (RESPONSE_CACHE_ALIAS): LocMem, FileBased, Redis,...; mốc invalidate của
+    tag nằm trong RESPONSE_CACHE_TAGS_ALIAS (mặc định CACHE_VERSIONS_ALIAS,
+    dùng chung giữa các process).
+
+    - Entry bị bỏ khi một tag của nó bị invalidate (invalidate_tags).
+    - Nhiều request cùng miss một key: chỉ 1 request chạy view (lock bằng
+      cache.add), các request còn lại chờ entry mới trong tối đa
+      RESPONSE_CACHE_LOCK_WAIT giây rồi mới tự chạy view.
+    """
+
+    poll_interval = 0.02
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django lấy process_view sau khi tạo middleware
+            self.process_view = self.aprocess_view
+
+    @property
+    def lock_timeout(self):
+        return getattr(settings, 'RESPONSE_CACHE_LOCK_TIMEOUT', 10)
+
+    @property
+    def lock_wait(self):
+        return getattr(settings, 'RESPONSE_CACHE_LOCK_WAIT', 2)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.finish(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if getattr(request, '_response_cache', None) is not None:
+            await sync_to_async(self.finish)(request, response)
+        return response
+
+    def finish(self, request, response):
+        state = getattr(request, '_response_cache', None)
+        if state is not None:
+            key, timeout, created, locked = state
+            try:
+                self._store(key, timeout, created, response)
+            finally:
+                if locked:
+                    _cache().delete(f"{key}:lock")
+
+    def _lookup(self, request, view_func):
+        """
+        Trả về (response HIT hoặc None, key, timeout, locked); key None: view
+        không được cache.
+        """
+        view_class = getattr(view_func, 'view_class', None)
+        timeout = getattr(view_class, 'response_cache_timeout', None)
+        if not timeout or request.method not in ('GET', 'HEAD') or 'HTTP_AUTHORIZATION' in request.META:
+            return None, None, None, False
+
+        key = self._key(request)
+        entry = self._fresh_entry(key)
+        if entry is not None:
+            return self._serve(request, entry), key, timeout, False
+        locked = _cache().add(f"{key}:lock", time.time(), timeout=self.lock_timeout)
+        return None, key, timeout, locked
+
+    def _serve_fresh(self, request, key):
+        entry = self._fresh_entry(key)
+        return None if entry is None else self._serve(request, entry)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        response, key, timeout, locked = self._lookup(request, view_func)
+        if response is not None or key is None:
+            return response
+        if not locked:
+            # Request khác đang build: chờ kết quả thay vì cùng query database
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                response = self._serve_fresh(request, key)
+                if response is not None:
+                    return response
+        # Mốc tạo entry: trước khi view đọc database
+        request._response_cache = (key, timeout, time.time(), locked)
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        # Như process_view nhưng chờ bằng asyncio.sleep: request đang chờ lock
+        # không chiếm thread sync (thread-sensitive) của các request khác
+        response, key, timeout, locked = await sync_to_async(self._lookup)(request, view_func)
+        if response is not None or key is None:
+            return response
+        if not locked:
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                response = await sync_to_async(self._serve_fresh)(request, key)
+                if response is not None:
+                    return response
+        request._response_cache = (key, timeout, time.time(), locked)
+        return None
+
+    # ==========================
+    # Entry
+    # ==========================
+    def _key(self, request):
+        # Body có URL tuyệt đối theo host; Accept phân biệt JSON / browsable API
+        raw = '|'.join([
+            request.scheme, request.get_host(), request.get_full_path(), request.META.get('HTTP_ACCEPT', ''),
+        ])
+        return f"response:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    def _fresh_entry(self, key):
+        entry = _cache().get(key)
+        if entry is None:
+            return None
+        if entry['tags'] and _tags_invalidated_at(entry['tags']) >= entry['created']:
+            return None
+        return entry
+
+    def _store(self, key, timeout, created, response):
+        if response.status_code != 200 or response.streaming or response.has_header('Set-Cookie'):
+            return
+        entry = {
+            'created': created,
+            'tags': sorted(getattr(response, 'cache_tags', None) or ()),
+            'content': response.content,
+            'headers': {name: response[name] for name in STORED_HEADERS if response.has_header(name)},
+        }
+        _register_tags(entry['tags'])
+        _cache().set(key, entry, timeout=timeout)
+        response.headers['X-Cache'] = 'MISS'
+
+    def _serve(self, request, entry):
+        headers = entry['headers']
+        last_modified = parse_http_date_safe(headers['Last-Modified']) if 'Last-Modified' in headers else None
+        not_modified = get_conditional_response(request, etag=headers.get('ETag'), last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = HttpResponse(entry['content'])
+        for name, value in headers.items():
+            response.headers[name] = value
+        response.headers['X-Cache'] = 'HIT'
+        return response
@@ -0,0 +1,293 @@
+# utils/smtp_pool.py
+
+import logging
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail.backends.smtp import EmailBackend
+from django.core.mail.message import sanitize_address
+from django.core.mail.utils import DNS_NAME
+
+logger = logging.getLogger(__name__)
+
+# Lỗi kết nối: mở kết nối mới rồi gửi lại message
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==========================
+# Pool kết nối
+# ==========================
+class PooledConnection:
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.opened_at = time.monotonic()
+        self.last_used = self.opened_at
+        self.sent = 0
+
+
+class SMTPConnectionPool:
+    """
+    Giữ tối đa `size` kết nối SMTP đã EHLO / STARTTLS / login để dùng lại
+    giữa các lần gửi (mỗi lần bắt tay TLS + AUTH tốn vài round-trip).
+
+    - Kết nối rảnh quá `max_idle` giây bị đóng (server thường tự ngắt).
+    - Kết nối rảnh quá `check_idle` giây được kiểm tra bằng NOOP trước khi dùng.
+    - Sau `max_messages` message, kết nối được mở lại (giới hạn của provider).
+    """
+
+    def __init__(self, connect, size=4, max_idle=120, check_idle=15, max_messages=100):
+        self.connect = connect
+        self.size = size
+        self.max_idle = max_idle
+        self.check_idle = check_idle
+        self.max_messages = max_messages
+        self._idle = queue.LifoQueue()
+        # Giới hạn số kết nối đang mở (rảnh + đang dùng)
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.counters = {
+            'connections_opened': 0,
+            'connections_closed': 0,
+            'reconnects': 0,
+            'messages_sent': 0,
+            'messages_failed': 0,
+            'batches': 0,
+            'send_seconds': 0.0,
+        }
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['idle_connections'] = self._idle.qsize()
+        stats['messages_per_sec'] = (
+            round(stats['messages_sent'] / stats['send_seconds'], 2) if stats['send_seconds'] else 0.0
+        )
+        return stats
+
+    def _open(self):
+        conn = PooledConnection(self.connect())
+        self.count('connections_opened')
+        return conn
+
+    def _discard(self, conn):
+        if conn.smtp is None:
+            return
+        try:
+            conn.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.smtp.close()
+        conn.smtp = None
+        self.count('connections_closed')
+
+    def _usable(self, conn):
+        if conn.smtp is None:
+            return False
+        idle = time.monotonic() - conn.last_used
+        if idle > self.max_idle or conn.sent >= self.max_messages:
+            return False
+        if idle > self.check_idle:
+            try:
+                return conn.smtp.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                return False
+        return True
+
+    def acquire(self, timeout=None):
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError('No SMTP connection available')
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._open()
+                if self._usable(conn):
+                    return conn
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, broken=False):
+        # smtp None: kết nối đã bị bỏ (vd reconnect thất bại), không trả về pool
+        if broken or conn.smtp is None:
+            self._discard(conn)
+        else:
+            conn.last_used = time.monotonic()
+            self._idle.put(conn)
+        self._slots.release()
+
+    def reconnect(self, conn):
+        self._discard(conn)
+        self.count('reconnects')
+        return self._open()
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, connect):
+    # Một pool cho mỗi cấu hình (host, port, user, ...) trong process
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = SMTPConnectionPool(
+                connect,
+                size=_setting('EMAIL_POOL_SIZE', 4),
+                max_idle=_setting('EMAIL_POOL_MAX_IDLE', 120),
+                check_idle=_setting('EMAIL_POOL_CHECK_IDLE', 15),
+                max_messages=_setting('EMAIL_POOL_MAX_MESSAGES', 100),
+            )
+        return pool
+
+
+def pool_stats():
+    """
+    Bộ đếm của mọi pool trong process: {"host:port": {...}}.
+    """
+    with _pools_lock:
+        pools = dict(_pools)
+    return {f"{key[0]}:{key[1]}": pool.stats() for key, pool in pools.items()}
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+# ==========================
+# Email backend
+# ==========================
+class PooledEmailBackend(EmailBackend):
+    """
+    EMAIL_BACKEND = 'utils.smtp_pool.PooledEmailBackend'
+
+    Cùng cấu hình với backend SMTP của Django (EMAIL_HOST, EMAIL_USE_TLS, ...)
+    nhưng kết nối lấy từ SMTPConnectionPool dùng chung trong process:
+    send_mail() không mở / đóng kết nối mỗi lần gọi. Danh sách message được
+    chia thành batch EMAIL_POOL_BATCH_SIZE, các batch gửi song song trên các
+    kết nối khác nhau của pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_size = _setting('EMAIL_POOL_BATCH_SIZE', 50)
+        self.pool = get_pool(
+            (self.host, self.port, self.username, self.use_tls, self.use_ssl),
+            self._connect,
+        )
+
+    def _connect(self):
+        params = {'local_hostname': DNS_NAME.get_fqdn()}
+        if self.timeout is not None:
+            params['timeout'] = self.timeout
+        if self.use_ssl:
+            params['context'] = self.ssl_context
+        smtp = self.connection_class(self.host, self.port, **params)
+        if not self.use_ssl and self.use_tls:
+            smtp.starttls(context=self.ssl_context)
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        return smtp
+
+    def open(self):
+        # Kết nối do pool quản lý
+        return False
+
+    def close(self):
+        pass
+
+    def send_messages(self, email_messages):
+        messages = [message for message in email_messages if message.recipients()]
+        if not messages:
+            return 0
+        batches = [messages[i:i + self.batch_size] for i in range(0, len(messages), self.batch_size)]
+        if len(batches) == 1:
+            return self._send_batch(batches[0])
+        with ThreadPoolExecutor(max_workers=min(len(batches), self.pool.size)) as executor:
+            return sum(executor.map(self._send_batch, batches))
+
+    def _send_batch(self, messages):
+        started = time.perf_counter()
+        sent = 0
+        try:
+            conn = self.pool.acquire(timeout=self.timeout)
+        except (smtplib.SMTPException, OSError):
+            self.pool.count('messages_failed', len(messages))
+            if not self.fail_silently:
+                raise
+            return 0
+        broken = False
+        try:
+            for message in messages:
+                conn, ok = self._send_one(conn, message)
+                sent += ok
+        except (smtplib.SMTPException, OSError) as exc:
+            # Lỗi kết nối / reconnect thất bại: bỏ kết nối;
+            # lỗi SMTP khác (người nhận bị từ chối...): trả về pool
+            broken = isinstance(exc, RECONNECT_ERRORS) or conn.smtp is None
+            if not self.fail_silently:
+                raise
+        finally:
+            self.pool.release(conn, broken=broken)
+            self.pool.count('batches')
+            self.pool.count('send_seconds', time.perf_counter() - started)
+        return sent
+
+    def _send_one(self, conn, message):
+        """
+        Gửi một message; kết nối bị ngắt giữa chừng thì mở kết nối mới và gửi lại
+        đúng một lần. Trả về (kết nối đang dùng, 1 nếu gửi được).
+        """
+        encoding = message.encoding or settings.DEFAULT_CHARSET
+        from_email = sanitize_address(message.from_email, encoding)
+        recipients = [sanitize_address(addr, encoding) for addr in message.recipients()]
+        body = message.message().as_bytes(linesep='\r\n')
+        for attempt in range(2):
+            try:
+                conn.smtp.sendmail(from_email, recipients, body)
+                break
+            except RECONNECT_ERRORS:
+                if attempt:
+                    self.pool.count('messages_failed')
+                    raise
+                logger.info("SMTP connection dropped, reconnecting")
+                try:
+                    conn = self.pool.reconnect(conn)
+                except Exception:
+                    # Mở lại thất bại (421 lúc chào, sai mật khẩu...): kết nối cũ
+                    # đã bị bỏ (smtp None), _send_batch không trả nó về pool
+                    self.pool.count('messages_failed')
+                    raise
+            except smtplib.SMTPException:
+                # Người nhận / người gửi bị từ chối: kết nối vẫn dùng được
+                self.pool.count('messages_failed')
+                if not self.fail_silently:
+                    raise
+                return conn, 0
+        conn.sent += 1
+        self.pool.count('messages_sent')
+        return conn, 1